@@ -0,0 +1,243 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from common.log import logger
+
+from .url_router import canonicalize
+
+# 连续的中日韩字符切分为二元组，字母数字按词，其余字符作为分隔
+CJK_RUN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+')
+TOKEN_RE = re.compile(r'[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+|[0-9a-z]+')
+
+
+def segment(text):
+    """
+    返回用空格分隔的索引词：中文按相邻二字切分，英文和数字按词，均转为小写；
+    FTS5的unicode61分词器再按空格切分，二字词即可检索任意长度不少于两字的中文关键词
+    """
+    tokens = []
+    for run in TOKEN_RE.findall((text or "").lower()):
+        if CJK_RUN_RE.match(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return " ".join(tokens)
+
+
+def parse_query(text):
+    """把用户输入切分为检索词列表[(只匹配标签, 索引词元组)]，#开头的关键词只匹配标签"""
+    terms = []
+    for term in text.split():
+        tags_only = term.startswith("#")
+        if tags_only:
+            term = term[1:]
+        tokens = segment(term).split()
+        if tokens:
+            terms.append((tags_only, tuple(tokens)))
+    return terms
+
+
+def build_query(text):
+    """
+    把用户输入转换为FTS5查询：空格分隔的多个关键词需同时匹配，#开头的关键词只匹配标签；
+    关键词切分后按短语匹配，只有一个词时按前缀匹配。没有可检索的内容时返回None
+    """
+    parts = []
+    for tags_only, tokens in parse_query(text):
+        column = "tags : " if tags_only else ""
+        if len(tokens) == 1:
+            parts.append(f'{column}"{tokens[0]}"*')
+        else:
+            parts.append(f'{column}"{" ".join(tokens)}"')
+    return " AND ".join(parts) or None
+
+
+def match_query(terms, summary_data):
+    """按与build_query相同的规则在内存中匹配一条摘要，用于检索尚未写入的摘要"""
+    title, tags, body = (column.split() for column in _index_columns(summary_data))
+    for tags_only, tokens in terms:
+        columns = [tags] if tags_only else [title, tags, body]
+        if len(tokens) == 1:
+            found = any(word.startswith(tokens[0]) for column in columns for word in column)
+        else:
+            n = len(tokens)
+            found = any(tuple(column[i:i + n]) == tokens for column in columns for i in range(len(column) - n + 1))
+        if not found:
+            return False
+    return True
+
+
+def _index_columns(summary_data):
+    """索引的三列：标题、标签、正文（一句话总结、要点、点评和来源）"""
+    body = "\n".join([summary_data.get("summary", ""), *summary_data.get("key_points", []),
+                      summary_data.get("comment", ""), summary_data.get("source", "")])
+    return segment(summary_data.get("title", "")), segment(summary_data.get("tags", "")), segment(body)
+
+
+class ArchivedSummary:
+    """归档中的一条摘要"""
+
+    __slots__ = ("url", "summary_data", "created_at")
+
+    def __init__(self, url, summary_data, created_at):
+        self.url = url
+        self.summary_data = summary_data
+        self.created_at = created_at
+
+
+class SummaryArchive:
+    """
+    摘要归档：长期保存生成过的摘要，支持按关键词和标签全文检索
+
+    - archive表保存规范化链接、标题、来源、标签和summary_data，archive_fts为不保存原文的FTS5索引，
+      中文按二字切分，数十万条记录时检索仍只需几毫秒
+    - add只把摘要放入队列，由后台线程每flush_interval秒或攒够batch_size条后在一个事务中写入，不阻塞回复；
+      查询时在内存中匹配队列中的摘要，刚生成的摘要无需等待写入即可查到
+    - 同一链接重复归档时以最新的摘要为准
+    - 每条摘要记录生成时的配置哈希（提示词、模型和服务），get只返回配置相同且未超过max_age的摘要
+    """
+
+    def __init__(self, path, flush_interval=2.0, batch_size=200):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue = []
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS archive ("
+            "id INTEGER PRIMARY KEY, url TEXT UNIQUE, title TEXT, source TEXT, tags TEXT, "
+            "summary TEXT, created_at REAL, config_hash TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(archive)")]
+        if "config_hash" not in columns:
+            # 旧版本的归档没有配置哈希，这些摘要只用于检索，不再复用
+            self._conn.execute("ALTER TABLE archive ADD COLUMN config_hash TEXT")
+        # 不保存原文的索引，原文在archive表中，按rowid关联
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS archive_fts USING fts5("
+            "title, tags, body, content='', tokenize='unicode61 remove_diacritics 2')"
+        )
+        self._conn.commit()
+        self.stats = {"written": 0, "searches": 0, "lookups": 0, "lookup_hits": 0}
+        self._thread = threading.Thread(target=self._run, name="readbrief-archive", daemon=True)
+        self._thread.start()
+
+    def add(self, url, summary_data, config_hash=None):
+        """加入写入队列，config_hash为生成摘要时的配置哈希"""
+        with self._lock:
+            self._queue.append((canonicalize(url), summary_data, time.time(), config_hash))
+            if len(self._queue) >= self.batch_size:
+                self._wakeup.set()
+
+    def _run(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"[ReadBrief] 写入摘要归档失败: {e}")
+
+    def flush(self):
+        """
+        在一个事务中写入队列中的所有摘要；先取得写锁再取出队列，get和search在写锁内读取队列，
+        摘要要么还在队列中，要么已提交，不会出现两处都查不到的间隙
+        """
+        with self._write_lock:
+            with self._lock:
+                batch, self._queue = self._queue, []
+            if not batch:
+                return
+            conn = self._conn
+            with conn:
+                for url, data, created_at, config_hash in batch:
+                    row = conn.execute("SELECT id, summary FROM archive WHERE url = ?", (url,)).fetchone()
+                    if row is not None:
+                        # 不保存原文的索引需要用原来的索引词删除
+                        conn.execute("INSERT INTO archive_fts(archive_fts, rowid, title, tags, body) "
+                                     "VALUES('delete', ?, ?, ?, ?)", (row[0], *_index_columns(json.loads(row[1]))))
+                        conn.execute("DELETE FROM archive WHERE id = ?", (row[0],))
+                    cursor = conn.execute(
+                        "INSERT INTO archive (url, title, source, tags, summary, created_at, config_hash) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (url, data.get("title", ""), data.get("source", ""), data.get("tags", ""),
+                         json.dumps(data, ensure_ascii=False), created_at, config_hash)
+                    )
+                    conn.execute("INSERT INTO archive_fts(rowid, title, tags, body) VALUES (?, ?, ?, ?)",
+                                 (cursor.lastrowid, *_index_columns(data)))
+            self.stats["written"] += len(batch)
+
+    def _pending(self):
+        """队列中尚未写入的摘要，同一链接只保留最新的一条，按归档时间从新到旧排列"""
+        with self._lock:
+            queue = list(self._queue)
+        pending = {}
+        for url, data, created_at, config_hash in reversed(queue):
+            pending.setdefault(url, (data, created_at, config_hash))
+        return pending
+
+    def search(self, text, limit=5):
+        """
+        按关键词或#标签检索，返回最近归档的limit条ArchivedSummary；
+        按rowid倒序时FTS5找到足够的结果即可停止，不必像按相关度排序那样为所有匹配的记录打分
+        """
+        query = build_query(text)
+        if query is None:
+            return []
+        terms = parse_query(text)
+        with self._write_lock:
+            pending = self._pending()
+            self.stats["searches"] += 1
+            # 多取出队列中的链接数，队列中有更新的摘要时以队列为准
+            rows = self._conn.execute(
+                "SELECT a.url, a.summary, a.created_at FROM "
+                "(SELECT rowid FROM archive_fts WHERE archive_fts MATCH ? ORDER BY rowid DESC LIMIT ?) AS f "
+                "JOIN archive AS a ON a.id = f.rowid ORDER BY a.id DESC",
+                (query, limit + len(pending))
+            ).fetchall()
+        results = [ArchivedSummary(url, data, created_at) for url, (data, created_at, _) in pending.items()
+                   if match_query(terms, data)][:limit]
+        results.extend(ArchivedSummary(url, json.loads(data), created_at)
+                       for url, data, created_at in rows if url not in pending)
+        return results[:limit]
+
+    def get(self, url, config_hash, max_age):
+        """按链接读取配置哈希相同、归档不超过max_age秒的摘要，没有时返回None"""
+        url = canonicalize(url)
+        min_created_at = time.time() - max_age
+        with self._write_lock:
+            pending = self._pending().get(url)
+            self.stats["lookups"] += 1
+            if pending is not None:
+                # 队列中的摘要比已写入的更新，以队列为准
+                data, created_at, pending_hash = pending
+                if pending_hash != config_hash or created_at < min_created_at:
+                    return None
+                self.stats["lookup_hits"] += 1
+                return ArchivedSummary(url, data, created_at)
+            row = self._conn.execute(
+                "SELECT summary, created_at FROM archive WHERE url = ? AND config_hash = ? AND created_at >= ?",
+                (url, config_hash, min_created_at)
+            ).fetchone()
+            if row is None:
+                return None
+            self.stats["lookup_hits"] += 1
+        return ArchivedSummary(url, json.loads(row[0]), row[1])
+
+    def close(self):
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join(timeout=5)
+        self.flush()
+        with self._write_lock:
+            self._conn.close()
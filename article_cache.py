@@ -0,0 +1,152 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from common.log import logger
+
+from .url_router import canonicalize
+
+
+class CachedArticle:
+    """缓存的正文：提取结果url_data及重新验证所需的ETag/Last-Modified"""
+
+    __slots__ = ("url", "data", "etag", "last_modified", "fetched_at", "validated_at")
+
+    def __init__(self, url, data, etag="", last_modified="", fetched_at=0.0, validated_at=0.0):
+        self.url = url
+        self.data = data
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+        self.validated_at = validated_at
+
+    def is_fresh(self, fresh_ttl, now=None):
+        """距上次下载或验证不超过fresh_ttl秒时可直接使用，无需请求源站"""
+        return (now or time.time()) - self.validated_at <= fresh_ttl
+
+    def conditional_headers(self):
+        """条件请求头，源站内容未变化时返回304"""
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class ArticleCache:
+    """
+    正文缓存：以SQLite持久化保存提取后的正文和元数据，与摘要缓存分开
+
+    - 以规范化URL为键，修改提示词或模型后重新摘要不需要重新下载
+    - fresh_ttl内直接使用；之后带ETag/Last-Modified向源站重新验证，未变化时只刷新验证时间
+    - 超过ttl的条目删除，超出条目数或容量上限时按最近访问时间(LRU)淘汰
+    """
+
+    def __init__(self, path, fresh_ttl=3600, ttl=7 * 86400, max_entries=5000, max_bytes=300 * 1024 * 1024):
+        self.path = path
+        self.fresh_ttl = fresh_ttl
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "url TEXT PRIMARY KEY, data TEXT, etag TEXT, last_modified TEXT, "
+            "size INTEGER, fetched_at REAL, validated_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_accessed ON articles(accessed_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def get(self, url):
+        """读取缓存，返回CachedArticle（可能需要重新验证），未命中或已过期时返回None"""
+        url = canonicalize(url)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, etag, last_modified, fetched_at, validated_at FROM articles WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None or now - row[3] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM articles WHERE url = ?", (url,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE articles SET accessed_at = ? WHERE url = ?", (now, url))
+            self._conn.commit()
+            # 需要重新验证的条目不计入命中，验证结果由mark_valid统计
+            if now - row[4] <= self.fresh_ttl:
+                self.hits += 1
+        return CachedArticle(url, json.loads(row[0]), row[1] or "", row[2] or "", row[3], row[4])
+
+    def peek(self, url):
+        """读取缓存的url_data，不更新访问时间和命中统计，已过期时返回None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data, fetched_at FROM articles WHERE url = ?", (canonicalize(url),)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def is_fresh(self, url):
+        """是否有无需重新验证即可使用的缓存，不更新访问时间"""
+        with self._lock:
+            row = self._conn.execute("SELECT validated_at FROM articles WHERE url = ?", (canonicalize(url),)).fetchone()
+        return row is not None and time.time() - row[0] <= self.fresh_ttl
+
+    def put(self, url, url_data, etag="", last_modified=""):
+        """写入提取结果并执行淘汰"""
+        url = canonicalize(url)
+        data = json.dumps(url_data, ensure_ascii=False)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            logger.warning(f"[ReadBrief] 正文缓存条目过大，跳过写入: {size} bytes")
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles "
+                "(url, data, etag, last_modified, size, fetched_at, validated_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, data, etag or "", last_modified or "", size, now, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def mark_valid(self, url):
+        """源站返回304，内容未变化：刷新验证时间，过期时间也从此时重新计算"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE articles SET fetched_at = ?, validated_at = ? WHERE url = ?", (now, now, canonicalize(url))
+            )
+            self._conn.commit()
+            self.revalidated += 1
+
+    def _evict(self, now):
+        """删除过期条目，并按LRU淘汰直到满足条目数和容量上限"""
+        self._conn.execute("DELETE FROM articles WHERE fetched_at < ?", (now - self.ttl,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM articles").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT url, size FROM articles ORDER BY accessed_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM articles WHERE url = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
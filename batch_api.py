@@ -0,0 +1,105 @@
+import json
+
+from common.log import logger
+
+# Azure OpenAI的Batch API需要较新的api-version
+AZURE_BATCH_API_VERSION = "2024-10-21"
+# 已结束的批处理状态
+BATCH_FINAL_STATUS = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchError(Exception):
+    """批处理提交或查询失败"""
+
+
+class BatchClient:
+    """
+    OpenAI/Azure OpenAI Batch API
+
+    把多条对话请求写成JSONL上传后创建批处理，之后轮询状态，完成后下载结果文件；
+    请求体由对应provider的build_request构造，与实时调用保持一致。
+    """
+
+    def __init__(self, http, provider, api_version=AZURE_BATCH_API_VERSION, completion_window="24h"):
+        if not self.supports(provider):
+            raise BatchError(f"{provider.name}不支持Batch API")
+        self.http = http
+        self.provider = provider
+        self.api_version = api_version
+        self.completion_window = completion_window
+
+    @staticmethod
+    def supports(provider):
+        return provider.name in ("openai", "azure")
+
+    def _url(self, path):
+        if self.provider.name == "azure":
+            return f"{self.provider.api_base}/openai{path}?api-version={self.api_version}"
+        return f"{self.provider.api_base}{path}"
+
+    def _endpoint(self):
+        """JSONL中每条请求的url"""
+        return "/chat/completions" if self.provider.name == "azure" else "/v1/chat/completions"
+
+    def _request(self, method, path, **kwargs):
+        response = self.http.request(method, self._url(path), "batch", **kwargs)
+        if response.status_code >= 400:
+            raise BatchError(f"批处理接口{path}返回{response.status_code}: {response.text[:200]}")
+        return response
+
+    def request_line(self, custom_id, messages, max_tokens=1000, temperature=0.7, json_mode=False):
+        """返回一条批处理请求"""
+        _, _, body = self.provider.build_request(messages, max_tokens, temperature, False, json_mode)
+        # Azure的请求体不含模型，批处理中按部署名指定
+        body.setdefault("model", self.provider.model)
+        return {"custom_id": custom_id, "method": "POST", "url": self._endpoint(), "body": body}
+
+    def submit(self, lines):
+        """上传请求文件并创建批处理，返回批处理ID"""
+        content = "".join(json.dumps(line, ensure_ascii=False) + "\n" for line in lines).encode("utf-8")
+        # 上传文件使用multipart，不能沿用JSON的Content-Type
+        headers = {k: v for k, v in self.provider.headers().items() if k != "Content-Type"}
+        response = self._request("POST", "/files", headers=headers, data={"purpose": "batch"},
+                                 files={"file": ("readbrief-batch.jsonl", content, "application/jsonl")})
+        file_id = response.json()["id"]
+        response = self._request("POST", "/batches", headers=self.provider.headers(), json={
+            "input_file_id": file_id,
+            "endpoint": self._endpoint(),
+            "completion_window": self.completion_window,
+        })
+        batch_id = response.json()["id"]
+        logger.info(f"[ReadBrief] 已提交批处理{batch_id}，共{len(lines)}条请求")
+        return batch_id
+
+    def status(self, batch_id):
+        """返回批处理对象，status为validating、in_progress、finalizing或BATCH_FINAL_STATUS之一"""
+        return self._request("GET", f"/batches/{batch_id}", headers=self.provider.headers()).json()
+
+    def results(self, batch):
+        """
+        下载已结束批处理的结果，返回{custom_id: (文本, 用量, 错误)}；
+        成功时错误为None，失败时文本为None。未出现在结果中的请求视为失败，由调用方处理
+        """
+        results = {}
+        for key in ("output_file_id", "error_file_id"):
+            file_id = batch.get(key)
+            if not file_id:
+                continue
+            response = self._request("GET", f"/files/{file_id}/content", headers=self.provider.headers())
+            for line in response.content.decode("utf-8").splitlines():
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                results[item["custom_id"]] = self._parse_line(item)
+        return results
+
+    def _parse_line(self, item):
+        response = item.get("response") or {}
+        if item.get("error") or response.get("status_code") != 200:
+            error = item.get("error") or (response.get("body") or {}).get("error") or response.get("status_code")
+            return None, {}, str(error)
+        try:
+            text, usage = self.provider.parse_response(response["body"])
+        except (KeyError, IndexError, TypeError) as e:
+            return None, {}, f"无法解析结果: {e}"
+        return text, usage, None
@@ -0,0 +1,117 @@
+"""
+批量摘要端到端演练
+
+在chatgpt-on-wechat根目录下运行：
+
+    python -m plugins.readbrief.bench.bulk_run --links 30 --mode batch --cards
+
+启动文章、大模型（含Batch API）和卡片的本地桩服务，生成链接列表和临时配置后分三次运行批量摘要：
+第一次只提交批处理不等待，第二次收取已提交批处理的结果，第三次确认检查点跳过全部已完成的链接且不再调用大模型。
+结果与预期不符时以非零状态码退出。
+"""
+import argparse
+import json
+import os
+import tempfile
+
+from ..bulk import BulkRunner, load_plugin, read_input
+from .run import CORPUS_DIR
+from .stubs import ArticleStub, CardStub, LLMStub
+
+
+def build_config(article, llm, card, cache_dir, retries):
+    return {
+        "readbrief": {
+            "enabled": True,
+            "service": "openai",
+            "prompt": "请总结这篇文章，按JSON格式输出",
+            "card_renderer": "api",
+            "card_api_url": f"{card.base_url}/api/saveImg",
+            "cache_dir": cache_dir,
+            "http_max_retries": retries,
+        },
+        "keys": {
+            "open_ai_api_key": "bench",
+            "open_ai_api_base": f"{llm.base_url}/v1",
+            "model": "gpt-4o-mini",
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReadBrief批量摘要端到端演练")
+    parser.add_argument("--links", type=int, default=20, help="有效链接数，另加一个无法抓取的链接")
+    parser.add_argument("--mode", choices=["batch", "concurrent"], default="batch")
+    parser.add_argument("--cards", action="store_true")
+    parser.add_argument("--rpm", type=int, default=0)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--batch-latency", type=float, default=1.0, help="批处理从创建到完成的时间")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="各接口返回503以及批处理中单条请求失败的概率")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--output", help="输出目录，默认使用临时目录")
+    args = parser.parse_args()
+
+    seed = 42
+    article = ArticleStub(CORPUS_DIR, error_rate=args.error_rate, seed=seed)
+    llm = LLMStub(latency=args.llm_latency, batch_latency=args.batch_latency, error_rate=args.error_rate, seed=seed + 1)
+    card = CardStub(540, 800, error_rate=args.error_rate, seed=seed + 2)
+    for stub in (article, llm, card):
+        stub.start()
+
+    workdir = tempfile.mkdtemp(prefix="readbrief-bulk-")
+    output_dir = args.output or os.path.join(workdir, "output")
+    input_path = os.path.join(workdir, "links.txt")
+    urls = article.urls()
+    with open(input_path, "w", encoding="utf-8") as f:
+        for i in range(args.links):
+            f.write(f"{urls[i % len(urls)]}?n={i}\n")
+        f.write(f"{article.base_url}/article/missing.html\n")
+    config_path = os.path.join(workdir, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(build_config(article, llm, card, os.path.join(workdir, "cache"), args.retries), f, ensure_ascii=False)
+
+    items = read_input(input_path)
+    plugin = load_plugin(config_path, cards=args.cards)
+    rounds = []
+    for wait in (False, True, True):
+        llm.reset()
+        runner = BulkRunner(plugin, output_dir, batch=args.mode == "batch", concurrency=4, per_minute=args.rpm,
+                            cards=args.cards, batch_size=args.batch_size, poll_interval=0.2)
+        try:
+            stats = dict(runner.run(items, wait=wait))
+        finally:
+            runner.close()
+        stats["llm_requests"] = llm.total_calls()
+        rounds.append(stats)
+        print(f"第{len(rounds)}次运行: {stats}")
+
+    for stub in (article, llm, card):
+        stub.stop()
+
+    summaries = os.listdir(os.path.join(output_dir, "summaries"))
+    done = sum(r["done"] for r in rounds)
+    problems = []
+    if len(summaries) != done:
+        problems.append(f"结果文件{len(summaries)}个，完成{done}个")
+    if args.cards and len(os.listdir(os.path.join(output_dir, "cards"))) != done:
+        problems.append("卡片数与完成数不一致")
+    if args.mode == "batch" and rounds[1]["submitted"]:
+        problems.append("恢复运行时重复提交了批处理")
+    if rounds[2]["skipped"] != rounds[0]["done"] + rounds[1]["done"]:
+        problems.append(f"第3次运行跳过{rounds[2]['skipped']}个，应为前两次完成的{rounds[0]['done'] + rounds[1]['done']}个")
+    if not args.error_rate:
+        if done != args.links:
+            problems.append(f"完成{done}个，应为{args.links}个")
+        if rounds[2]["llm_requests"]:
+            problems.append("全部完成后重新运行仍调用了大模型")
+    with open(os.path.join(output_dir, "summaries", summaries[0]), "r", encoding="utf-8") as f:
+        sample = json.load(f)
+    print(f"输出目录: {output_dir}，示例: {json.dumps(sample, ensure_ascii=False)[:200]}")
+    if problems:
+        print("不符合预期: " + "; ".join(problems))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+ReadBrief离线压测
+
+在chatgpt-on-wechat根目录下运行：
+
+    python -m plugins.readbrief.bench.run --messages 100 --concurrency 1,4,16
+
+抓取、大模型和卡片接口全部由本地桩服务代替，可配置延迟、错误率和响应大小；
+用构造的EventContext驱动ReadBrief.on_handle_context，报告各并发度下的p50/p95/p99延迟、吞吐量、
+内存增长和每条消息的接口调用次数。指定--max-p95或--min-throughput时，不达标以非零状态码退出，可用于发布前检查。
+"""
+import argparse
+import json
+import math
+import os
+import resource
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from bridge.context import Context, ContextType
+from bridge.reply import Reply, ReplyType
+from channel.chat_message import ChatMessage
+from plugins import Event, EventContext
+
+from .stubs import ArticleStub, CardStub, LLMStub
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+class BenchChannel:
+    """记录异步模式下发送的回复，以及同步模式下渐进式回复的首条消息时间"""
+
+    def __init__(self):
+        self._events = {}
+        self.first_sent = {}
+        self._lock = threading.Lock()
+
+    def expect(self, context):
+        event = threading.Event()
+        with self._lock:
+            self._events[id(context)] = event
+        return event
+
+    def send(self, reply, context):
+        with self._lock:
+            self.first_sent.setdefault(id(context), time.monotonic())
+            event = self._events.pop(id(context), None)
+        if event:
+            event.reply = reply
+            event.set()
+
+
+def make_event(channel, content, user_id, group_id=None):
+    msg = ChatMessage({})
+    msg.from_user_id = group_id or user_id
+    msg.actual_user_id = user_id
+    msg.other_user_id = group_id or user_id
+    context = Context(ContextType.TEXT, content, {"isgroup": bool(group_id), "msg": msg})
+    return EventContext(Event.ON_HANDLE_CONTEXT, {"channel": channel, "context": context, "reply": Reply()})
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, math.ceil(p / 100.0 * len(values)) - 1))
+    return values[index]
+
+
+def build_config(args, article, llm, card):
+    return {
+        "readbrief": {
+            "enabled": True,
+            "service": "openai",
+            "group": True,
+            "prompt": "请总结这篇文章，按JSON格式输出",
+            "card_enabled": args.card != "off",
+            "card_renderer": "local" if args.card == "local" else "api",
+            "card_api_url": f"{card.base_url}/api/saveImg",
+            "cache_enabled": args.repeat > 0,
+            "cache_dir": args.cache_dir,
+            "async_enabled": args.async_mode,
+            "async_workers": args.workers,
+            "async_queue_size": args.messages,
+            "http_max_retries": args.retries,
+            "llm_stream": args.stream,
+            "progressive_enabled": args.progressive,
+            "progressive_min_interval": args.progressive_interval,
+        },
+        "keys": {
+            "open_ai_api_key": "bench",
+            "open_ai_api_base": f"{llm.base_url}/v1",
+            "model": "gpt-4o-mini",
+        },
+    }
+
+
+def run_level(plugin, channel, urls, args, concurrency):
+    """以指定并发度发送args.messages条消息，返回每条消息的延迟、首条回复延迟和失败数"""
+    latencies = []
+    first_latencies = []
+    failures = [0]
+    lock = threading.Lock()
+
+    def one(i):
+        # repeat比例的消息使用重复的链接，用于测量缓存命中和并发合并路径
+        if int(i * args.repeat) != int((i + 1) * args.repeat):
+            url = f"{urls[i % len(urls)]}?n=repeat"
+        else:
+            url = f"{urls[i % len(urls)]}?n={i}-{time.monotonic_ns()}"
+        e_context = make_event(channel, url, f"user{i % args.users}", f"group{i % args.groups}" if args.groups else None)
+        event = channel.expect(e_context["context"]) if args.async_mode else None
+        start = time.monotonic()
+        plugin.on_handle_context(e_context)
+        reply = e_context["reply"]
+        if event:
+            if not event.wait(args.timeout):
+                reply = None
+            else:
+                reply = event.reply
+        end = time.monotonic()
+        elapsed = end - start
+        with lock:
+            first_sent = channel.first_sent.pop(id(e_context["context"]), None)
+            latencies.append(elapsed)
+            first_latencies.append(min(first_sent or end, end) - start)
+            if reply is None or reply.type in (None, ReplyType.ERROR):
+                failures[0] += 1
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(args.messages)))
+    return latencies, first_latencies, failures[0], time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReadBrief离线压测")
+    parser.add_argument("--messages", type=int, default=50, help="每个并发度发送的消息数")
+    parser.add_argument("--concurrency", default="1,4,16", help="逗号分隔的并发度")
+    parser.add_argument("--users", type=int, default=20, help="模拟的用户数")
+    parser.add_argument("--groups", type=int, default=0, help="模拟的群聊数，0表示全部为私聊")
+    parser.add_argument("--fetch-latency", type=float, default=0.1)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="大模型首个token延迟")
+    parser.add_argument("--llm-chunk-delay", type=float, default=0.01, help="流式输出每块间隔")
+    parser.add_argument("--llm-output-chars", type=int, default=600)
+    parser.add_argument("--card-latency", type=float, default=0.3)
+    parser.add_argument("--card-size", default="1080x1600", help="卡片API返回的图片尺寸")
+    parser.add_argument("--jitter", type=float, default=0.0, help="各接口延迟的随机抖动（秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="各接口返回503的概率")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--card", choices=["api", "local", "off"], default="api")
+    parser.add_argument("--no-stream", dest="stream", action="store_false")
+    parser.add_argument("--async", dest="async_mode", action="store_true", help="启用异步模式")
+    parser.add_argument("--progressive", action="store_true", help="启用渐进式回复，额外报告首条回复的延迟（仅同步模式）")
+    parser.add_argument("--progressive-interval", type=float, default=0.5, help="渐进式回复相邻消息的最小间隔")
+    parser.add_argument("--workers", type=int, default=8, help="异步模式的工作线程数")
+    parser.add_argument("--repeat", type=float, default=0.0, help="重复链接的比例（0~1），大于0时启用摘要缓存")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--cache-dir", default=None)
+    parser.add_argument("--output", help="把结果写入JSON文件")
+    parser.add_argument("--max-p95", type=float, help="任一并发度p95延迟超过该值（秒）时失败")
+    parser.add_argument("--min-throughput", type=float, help="最高并发度的吞吐量（条/秒）低于该值时失败")
+    args = parser.parse_args()
+    if args.progressive and args.async_mode:
+        parser.error("--progressive只能在同步模式下测量")
+
+    seed = 42
+    article = ArticleStub(CORPUS_DIR, latency=args.fetch_latency, jitter=args.jitter, error_rate=args.error_rate, seed=seed)
+    llm = LLMStub(output_chars=args.llm_output_chars, chunk_delay=args.llm_chunk_delay, latency=args.llm_latency,
+                  jitter=args.jitter, error_rate=args.error_rate, seed=seed + 1)
+    width, height = (int(v) for v in args.card_size.split("x"))
+    card = CardStub(width, height, latency=args.card_latency, jitter=args.jitter, error_rate=args.error_rate, seed=seed + 2)
+    for stub in (article, llm, card):
+        stub.start()
+
+    workdir = tempfile.mkdtemp(prefix="readbrief-bench-")
+    args.cache_dir = args.cache_dir or os.path.join(workdir, "cache")
+    config_path = os.path.join(workdir, "config.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(build_config(args, article, llm, card), f, ensure_ascii=False)
+    os.environ["READBRIEF_CONFIG"] = config_path
+
+    tracemalloc.start()
+    from ..readbrief import ReadBrief
+    plugin = ReadBrief()
+    channel = BenchChannel()
+    baseline_memory = tracemalloc.get_traced_memory()[0]
+
+    results = []
+    for concurrency in [int(c) for c in args.concurrency.split(",")]:
+        for stub in (article, llm, card):
+            stub.reset()
+        latencies, first_latencies, failures, wall = run_level(plugin, channel, article.urls(), args, concurrency)
+        current, peak = tracemalloc.get_traced_memory()
+        result = {
+            "concurrency": concurrency,
+            "messages": args.messages,
+            "failures": failures,
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "first_reply_p50": round(percentile(first_latencies, 50), 3),
+            "first_reply_p95": round(percentile(first_latencies, 95), 3),
+            "throughput": round(args.messages / wall, 2) if wall else 0.0,
+            "memory_growth_mb": round((current - baseline_memory) / 1048576, 2),
+            "memory_peak_mb": round(peak / 1048576, 2),
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "calls_per_message": {
+                stub.name: round(stub.total_calls() / args.messages, 2) for stub in (article, llm, card)
+            },
+            "stub_errors": {stub.name: stub.errors for stub in (article, llm, card)},
+        }
+        results.append(result)
+        first_reply = f"首条回复p50={result['first_reply_p50']:.3f}s p95={result['first_reply_p95']:.3f}s " if args.progressive else ""
+        print(f"并发{concurrency:>3}: p50={result['p50']:.3f}s p95={result['p95']:.3f}s p99={result['p99']:.3f}s "
+              f"{first_reply}吞吐={result['throughput']}条/s 失败={failures} 内存增长={result['memory_growth_mb']}MB "
+              f"调用/条={result['calls_per_message']}")
+
+    for stub in (article, llm, card):
+        stub.stop()
+    if plugin.worker_pool:
+        plugin.worker_pool.shutdown()
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, ensure_ascii=False, indent=2)
+
+    failed = []
+    if args.max_p95 is not None:
+        failed += [f"并发{r['concurrency']} p95={r['p95']}s > {args.max_p95}s" for r in results if r["p95"] > args.max_p95]
+    if args.min_throughput is not None and results and results[-1]["throughput"] < args.min_throughput:
+        failed.append(f"吞吐{results[-1]['throughput']}条/s < {args.min_throughput}条/s")
+    if failed:
+        print("未达标: " + "; ".join(failed))
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
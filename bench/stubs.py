@@ -0,0 +1,269 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from email import policy
+from email.parser import BytesParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+
+from PIL import Image
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.stub.handle(self, "GET")
+
+    def do_POST(self):
+        self.server.stub.handle(self, "POST")
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端重试或关闭空闲连接时会重置连接，不影响压测结果
+        pass
+
+
+class StubServer:
+    """
+    压测用的本地HTTP服务
+
+    每个请求先按latency±jitter延迟，再按error_rate概率返回503，其余交给respond处理，并按路径统计调用次数。
+    """
+
+    name = "stub"
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.errors = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def start(self):
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, name=f"bench-{self.name}", daemon=True).start()
+        return self.base_url
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.calls.clear()
+            self.errors = 0
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def handle(self, handler, method):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        path = handler.path.split("?")[0]
+        with self._lock:
+            self.calls[path] += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            failed = self.random.random() < self.error_rate
+            if failed:
+                self.errors += 1
+        time.sleep(delay)
+        if failed:
+            self.send(handler, 503, b"stub error", "text/plain")
+            return
+        self.respond(handler, method, path, body)
+
+    def respond(self, handler, method, path, body):
+        raise NotImplementedError
+
+    @staticmethod
+    def send(handler, status, body, content_type):
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+class ArticleStub(StubServer):
+    """提供语料目录中保存的文章HTML，路径为/article/<文件名>，查询参数仅用于区分链接"""
+
+    name = "article"
+
+    def __init__(self, corpus_dir, **kwargs):
+        super().__init__(**kwargs)
+        self.pages = {}
+        for filename in sorted(os.listdir(corpus_dir)):
+            if filename.endswith(".html"):
+                with open(os.path.join(corpus_dir, filename), "rb") as f:
+                    self.pages[filename] = f.read()
+
+    def urls(self):
+        return [f"{self.base_url}/article/{name}" for name in self.pages]
+
+    def respond(self, handler, method, path, body):
+        page = self.pages.get(path.rsplit("/", 1)[-1])
+        if page is None:
+            self.send(handler, 404, b"not found", "text/plain")
+            return
+        self.send(handler, 200, page, "text/html; charset=utf-8")
+
+
+class LLMStub(StubServer):
+    """
+    OpenAI兼容的/chat/completions接口和Batch API（/files、/batches）
+
+    返回固定结构的摘要JSON；流式请求按chunk_chars分块，每块间隔chunk_delay秒，latency即首个token延迟。
+    批处理创建batch_latency秒后查询时完成，其中每条请求按error_rate概率失败并写入错误文件。
+    """
+
+    name = "llm"
+
+    def __init__(self, output_chars=600, chunk_chars=20, chunk_delay=0.0, batch_latency=1.0, **kwargs):
+        super().__init__(**kwargs)
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.batch_latency = batch_latency
+        self.files = {}
+        self.batches = {}
+        points = ["要点" + "内容" * (output_chars // 40) for _ in range(3)]
+        self.output = json.dumps({
+            "title": "压测文章标题",
+            "summary": "这是一段用于压测的一句话总结。" * max(1, output_chars // 60),
+            "key_points": points,
+            "comment": "压测点评。",
+            "tags": "#压测 #基准",
+            "read_time": "3分钟",
+            "source": "压测来源",
+        }, ensure_ascii=False)
+
+    def respond(self, handler, method, path, body):
+        if path.endswith("/files") or "/files/" in path or "/batches" in path:
+            self.respond_batch(handler, method, path, body)
+            return
+        request = json.loads(body or b"{}")
+        usage = self.usage(request)
+        if not request.get("stream"):
+            self.send(handler, 200, json.dumps(self.completion(request), ensure_ascii=False).encode("utf-8"), "application/json")
+            return
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        for i in range(0, len(self.output), self.chunk_chars):
+            chunk = {"choices": [{"delta": {"content": self.output[i:i + self.chunk_chars]}}]}
+            handler.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+            handler.wfile.flush()
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+        handler.wfile.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode("utf-8"))
+        handler.wfile.write(b"data: [DONE]\n\n")
+        handler.wfile.flush()
+        handler.close_connection = True
+
+    def usage(self, request):
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in request.get("messages", []))
+        return {"prompt_tokens": prompt_chars * 2 // 3, "completion_tokens": len(self.output) * 2 // 3}
+
+    def completion(self, request):
+        return {"choices": [{"message": {"role": "assistant", "content": self.output}}], "usage": self.usage(request)}
+
+    def respond_batch(self, handler, method, path, body):
+        with self._lock:
+            if method == "POST" and path.endswith("/files"):
+                content_type = handler.headers.get("Content-Type", "")
+                message = BytesParser(policy=policy.default).parsebytes(
+                    f"Content-Type: {content_type}\r\n\r\n".encode("utf-8") + body)
+                content = b"".join(part.get_payload(decode=True) for part in message.iter_parts()
+                                   if part.get_param("name", header="content-disposition") == "file")
+                file_id = f"file-{len(self.files) + 1}"
+                self.files[file_id] = content
+                data = {"id": file_id, "object": "file", "bytes": len(content), "purpose": "batch"}
+            elif method == "POST" and path.endswith("/batches"):
+                request = json.loads(body)
+                batch_id = f"batch-{len(self.batches) + 1}"
+                total = len(self.files[request["input_file_id"]].splitlines())
+                self.batches[batch_id] = {"id": batch_id, "object": "batch", "status": "in_progress",
+                                          "input_file_id": request["input_file_id"], "created": time.monotonic(),
+                                          "request_counts": {"total": total, "completed": 0, "failed": 0}}
+                data = self._batch_view(self.batches[batch_id])
+            elif method == "GET" and "/batches/" in path:
+                batch = self.batches.get(path.rsplit("/", 1)[-1])
+                if batch is None:
+                    self.send(handler, 404, b"not found", "text/plain")
+                    return
+                if batch["status"] == "in_progress" and time.monotonic() - batch["created"] >= self.batch_latency:
+                    self._finish_batch(batch)
+                data = self._batch_view(batch)
+            elif method == "GET" and path.endswith("/content"):
+                content = self.files.get(path.split("/")[-2])
+                if content is None:
+                    self.send(handler, 404, b"not found", "text/plain")
+                    return
+                self.send(handler, 200, content, "application/jsonl")
+                return
+            else:
+                self.send(handler, 404, b"not found", "text/plain")
+                return
+        self.send(handler, 200, json.dumps(data).encode("utf-8"), "application/json")
+
+    @staticmethod
+    def _batch_view(batch):
+        return {k: v for k, v in batch.items() if k != "created"}
+
+    def _finish_batch(self, batch):
+        """生成批处理的结果文件和错误文件，调用时需持有锁"""
+        output = []
+        errors = []
+        for line in self.files[batch["input_file_id"]].decode("utf-8").splitlines():
+            request = json.loads(line)
+            if self.random.random() < self.error_rate:
+                errors.append({"custom_id": request["custom_id"], "response": None,
+                               "error": {"code": "server_error", "message": "stub error"}})
+                continue
+            output.append({"custom_id": request["custom_id"], "error": None,
+                           "response": {"status_code": 200, "body": self.completion(request["body"])}})
+        for key, lines in (("output_file_id", output), ("error_file_id", errors)):
+            if lines:
+                file_id = f"file-{len(self.files) + 1}"
+                self.files[file_id] = "".join(json.dumps(l, ensure_ascii=False) + "\n" for l in lines).encode("utf-8")
+                batch[key] = file_id
+        batch["status"] = "completed"
+        batch["request_counts"] = {"total": len(output) + len(errors), "completed": len(output), "failed": len(errors)}
+
+
+class CardStub(StubServer):
+    """卡片API，返回指定尺寸的PNG图片"""
+
+    name = "card"
+
+    def __init__(self, width=1080, height=1600, **kwargs):
+        super().__init__(**kwargs)
+        image = Image.effect_noise((width, height), 32).convert("RGB")
+        output = BytesIO()
+        image.save(output, format="PNG")
+        self.image = output.getvalue()
+
+    def respond(self, handler, method, path, body):
+        self.send(handler, 200, self.image, "image/png")
@@ -0,0 +1,483 @@
+"""
+ReadBrief批量摘要
+
+在chatgpt-on-wechat根目录下运行：
+
+    python -m plugins.readbrief.bulk --input links.txt --output out/ --cards
+
+输入为每行一个链接的文本文件，或每行一个{"url": ..., "id": ..., "prompt": ...}的JSONL（id和prompt可省略）。
+按有限并发抓取正文后，首选服务为OpenAI/Azure时通过Batch API提交；其他服务、需要分块的长文章或--mode concurrent时
+改为限速的并发调用。进度逐条写入输出目录的检查点，中断后以相同参数重新运行会跳过已完成的链接，并继续等待已提交的批处理。
+每篇文章的summary_data写入summaries/<id>.json，卡片写入cards/<id>.<格式>，同时写入摘要缓存和摘要归档，之后在聊天中分享时直接命中，也可以检索。
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from common.log import logger
+
+from .batch_api import AZURE_BATCH_API_VERSION, BATCH_FINAL_STATUS, BatchClient, BatchError
+from .chunking import ArticleSummarizer, mark_partial
+from .rate_limiter import TokenBucket
+from .summary_cache import make_cache_key
+from .summary_model import Summary
+from .url_router import canonicalize
+
+# 批量运行时关闭的功能：不与正在运行的机器人争用指标端口，也不启动后台任务
+BULK_OVERRIDES = {
+    "metrics_port": 0,
+    "metrics_dump_interval": 0,
+    "prefetch_feeds": [],
+    "prefetch_urls_file": "",
+    "async_enabled": False,
+    "warmup_enabled": False,
+    "progressive_enabled": False,
+}
+# 卡片文件的扩展名
+CARD_EXTENSIONS = ((b"\x89PNG", "png"), (b"\xff\xd8", "jpg"), (b"RIFF", "webp"))
+
+
+def item_id(url):
+    """链接的输出文件名，跟踪参数不同的链接视为同一篇"""
+    return hashlib.sha1(canonicalize(url).encode("utf-8")).hexdigest()[:16]
+
+
+def read_input(path):
+    """读取链接列表，返回[{"id", "url", "prompt"}]，重复的链接只保留第一个"""
+    items = []
+    seen = set()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            record = json.loads(line) if line.startswith("{") else {"url": line}
+            url = record.get("url")
+            if not url or not url.startswith(("http://", "https://")):
+                logger.warning(f"[ReadBrief] 跳过无效的输入: {line[:100]}")
+                continue
+            key = str(record.get("id") or item_id(url))
+            if key in seen:
+                continue
+            seen.add(key)
+            items.append({"id": key, "url": url, "prompt": record.get("prompt")})
+    return items
+
+
+class Checkpoint:
+    """
+    批量摘要的检查点
+
+    progress.jsonl逐行追加每个链接的状态（submitted、done、failed），重新运行时以最后一条为准；
+    batches.jsonl记录已提交的批处理及其中每个请求对应的链接、提示词和正文元数据，恢复后据此处理下载的结果。
+    """
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.status = {}
+        self.batches = {}
+        self._lock = threading.Lock()
+        self._progress = self._open(os.path.join(directory, "progress.jsonl"), self.status, "id")
+        self._batches = self._open(os.path.join(directory, "batches.jsonl"), self.batches, "batch_id")
+
+    @staticmethod
+    def _open(path, records, key):
+        """读取已有记录后以追加方式打开；进程被中断时最后一行可能不完整，忽略即可"""
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    records[record[key]] = record
+        return open(path, "a", encoding="utf-8")
+
+    def _append(self, f, record):
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        f.flush()
+
+    def get(self, key):
+        with self._lock:
+            return self.status.get(key)
+
+    def record(self, key, url, status, **fields):
+        record = dict(fields, id=key, url=url, status=status, time=round(time.time(), 3))
+        with self._lock:
+            self.status[key] = record
+            self._append(self._progress, record)
+
+    def add_batch(self, batch_id, provider, items):
+        """记录已提交的批处理，items为{id: 元数据}，并把其中的链接标记为submitted"""
+        record = {"batch_id": batch_id, "provider": provider, "items": items, "time": round(time.time(), 3)}
+        with self._lock:
+            self.batches[batch_id] = record
+            self._append(self._batches, record)
+        for key, meta in items.items():
+            self.record(key, meta["url"], "submitted", batch_id=batch_id)
+
+    def pending_batches(self):
+        """仍有链接在等待结果的批处理ID"""
+        with self._lock:
+            return sorted({r["batch_id"] for r in self.status.values() if r["status"] == "submitted"})
+
+    def close(self):
+        with self._lock:
+            self._progress.close()
+            self._batches.close()
+
+
+class RequestThrottle:
+    """限制每分钟发起的大模型调用数，per_minute为0时不限制"""
+
+    def __init__(self, per_minute):
+        self._bucket = TokenBucket(per_minute / 60.0, max(1, per_minute)) if per_minute else None
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if self._bucket is None:
+            return
+        with self._lock:
+            delay = self._bucket.delay(time.monotonic())
+            self._bucket.take()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ThrottledLLM:
+    """调用大模型服务路由前先经过限速，供ArticleSummarizer使用"""
+
+    def __init__(self, llm, throttle):
+        self.llm = llm
+        self.throttle = throttle
+
+    @property
+    def primary(self):
+        return self.llm.primary
+
+    def complete(self, *args, **kwargs):
+        self.throttle.wait()
+        return self.llm.complete(*args, **kwargs)
+
+
+class BulkRunner:
+    """
+    批量生成摘要
+
+    抓取、解析、卡片和摘要缓存复用插件的实现；batch为True时单次即可完成的文章通过Batch API提交，
+    其余文章以concurrency个并发、每分钟不超过per_minute次调用的速度直接生成。
+    """
+
+    def __init__(self, plugin, output_dir, batch=False, fetch_concurrency=8, concurrency=4, per_minute=60,
+                 cards=False, batch_size=500, poll_interval=30, batch_api_version=AZURE_BATCH_API_VERSION):
+        self.plugin = plugin
+        self.output_dir = output_dir
+        self.fetch_concurrency = fetch_concurrency
+        self.concurrency = concurrency
+        self.cards = cards and plugin.settings.card_enabled
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.checkpoint = Checkpoint(output_dir)
+        self.client = BatchClient(plugin.http, plugin.llm.primary, api_version=batch_api_version) if batch else None
+        settings = plugin.settings
+        self.summarizer = ArticleSummarizer(
+            ThrottledLLM(plugin.llm, RequestThrottle(per_minute)),
+            max_input_tokens=settings.max_input_tokens,
+            chunk_tokens=settings.chunk_tokens,
+            max_chunks=settings.max_chunks,
+            concurrency=settings.map_concurrency,
+        )
+        self._llm_slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self.stats = {"done": 0, "cached": 0, "failed": 0, "skipped": 0, "submitted": 0,
+                      "prompt_tokens": 0, "completion_tokens": 0}
+        os.makedirs(os.path.join(output_dir, "summaries"), exist_ok=True)
+        if self.cards:
+            os.makedirs(os.path.join(output_dir, "cards"), exist_ok=True)
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self.stats[name] += value
+
+    def run(self, items, wait=True):
+        """处理所有链接并返回统计；wait为False时提交批处理后即返回，之后重新运行以收取结果"""
+        todo = []
+        for item in items:
+            record = self.checkpoint.get(item["id"])
+            if record and record["status"] == "done":
+                self._count("skipped")
+            elif record and record["status"] == "submitted":
+                # 已提交的批处理在下面继续等待，不重复提交
+                continue
+            else:
+                todo.append(item)
+        logger.info(f"[ReadBrief] 批量摘要共{len(items)}个链接，待处理{len(todo)}个，已完成{self.stats['skipped']}个")
+
+        for start in range(0, len(todo), self.batch_size):
+            group = todo[start:start + self.batch_size]
+            with ThreadPoolExecutor(max_workers=self.fetch_concurrency) as executor:
+                prepared = [p for p in executor.map(self.process, group) if p]
+            if prepared:
+                self.submit(prepared)
+
+        pending = self.checkpoint.pending_batches()
+        if pending and wait:
+            self.wait_batches(pending)
+        elif pending:
+            logger.info(f"[ReadBrief] {len(pending)}个批处理尚未完成，稍后以相同参数重新运行以收取结果")
+        return self.stats
+
+    def process(self, item):
+        """抓取一篇文章；需要通过批处理生成时返回(item, url_data, messages)，否则直接生成并写出结果"""
+        url = item["url"]
+        prompt = item["prompt"] or self.plugin.settings.prompt
+        try:
+            with self.plugin.metrics.trace("bulk", url):
+                cached = self.plugin.summary_cache.get(self.cache_key(item)) if self.plugin.summary_cache else None
+                if cached:
+                    summary = Summary.from_dict(cached[0])
+                    card = cached[1] if self.cards else None
+                    if self.cards and not card:
+                        card = self.plugin.build_card(summary, url)
+                    self.write(item, summary, {"mode": "cached", "calls": 0}, card)
+                    self._count("cached")
+                    return None
+                url_data = self.plugin.fetch_url_content(url)
+                if not url_data or not url_data.get("content"):
+                    self.fail(item, "无法获取网页内容")
+                    return None
+                if self.client:
+                    messages = self.summarizer.single_messages(prompt, url, url_data["content"])
+                    if messages:
+                        return item, url_data, messages
+                with self._llm_slots:
+                    text, usage = self.summarizer.summarize(prompt, url, url_data["content"], json_mode=self.plugin.settings.llm_json_mode)
+                self.finish(item, url_data.get("title", ""), url_data.get("source", ""), text, usage)
+        except Exception as e:
+            logger.error(f"[ReadBrief] 批量摘要失败 {url}: {e}")
+            self.fail(item, str(e))
+        return None
+
+    def submit(self, prepared):
+        """把一组文章提交为一个批处理，提交失败时改为直接生成"""
+        lines = []
+        metas = {}
+        for item, url_data, messages in prepared:
+            lines.append(self.client.request_line(item["id"], messages, max_tokens=self.summarizer.max_output_tokens,
+                                                  json_mode=self.plugin.settings.llm_json_mode))
+            metas[item["id"]] = {
+                "url": item["url"],
+                "prompt": item["prompt"],
+                "title": url_data.get("title", ""),
+                "source": url_data.get("source", ""),
+            }
+        try:
+            batch_id = self.client.submit(lines)
+        except (BatchError, requests.exceptions.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"[ReadBrief] 提交批处理失败，改为直接调用: {e}")
+            self.run_direct(prepared)
+            return
+        self.checkpoint.add_batch(batch_id, self.client.provider.name, metas)
+        self._count("submitted", len(lines))
+
+    def run_direct(self, prepared):
+        def one(entry):
+            item, url_data, _ = entry
+            try:
+                prompt = item["prompt"] or self.plugin.settings.prompt
+                text, usage = self.summarizer.summarize(prompt, item["url"], url_data["content"],
+                                                        json_mode=self.plugin.settings.llm_json_mode)
+                self.finish(item, url_data.get("title", ""), url_data.get("source", ""), text, usage)
+            except Exception as e:
+                logger.error(f"[ReadBrief] 批量摘要失败 {item['url']}: {e}")
+                self.fail(item, str(e))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(one, prepared))
+
+    def wait_batches(self, batch_ids):
+        """轮询批处理直到全部结束，结束的批处理立即下载结果"""
+        pending = set(batch_ids)
+        while pending:
+            for batch_id in sorted(pending):
+                try:
+                    batch = self.client.status(batch_id)
+                except (BatchError, requests.exceptions.RequestException, ValueError) as e:
+                    logger.warning(f"[ReadBrief] 查询批处理{batch_id}失败: {e}")
+                    continue
+                if batch.get("status") not in BATCH_FINAL_STATUS:
+                    counts = batch.get("request_counts") or {}
+                    logger.info(f"[ReadBrief] 批处理{batch_id}状态{batch.get('status')}，"
+                                f"已完成{counts.get('completed', 0)}/{counts.get('total', 0)}")
+                    continue
+                pending.discard(batch_id)
+                self.collect(batch_id, batch)
+            if pending:
+                time.sleep(self.poll_interval)
+
+    def collect(self, batch_id, batch):
+        """下载批处理结果并写出；结果中缺失或失败的请求标记为failed，重新运行时会重试"""
+        try:
+            results = self.client.results(batch)
+        except (BatchError, requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"[ReadBrief] 下载批处理{batch_id}的结果失败，稍后重新运行以重试: {e}")
+            return
+        record = self.checkpoint.batches.get(batch_id) or {"items": {}}
+        logger.info(f"[ReadBrief] 批处理{batch_id}已结束，状态{batch.get('status')}，收到{len(results)}条结果")
+
+        def one(entry):
+            key, meta = entry
+            current = self.checkpoint.get(key)
+            # 链接已在其他批处理中重新提交或已经完成
+            if not current or current.get("batch_id") != batch_id or current["status"] != "submitted":
+                return
+            item = {"id": key, "url": meta["url"], "prompt": meta.get("prompt")}
+            text, usage, error = results.get(key, (None, {}, f"批处理{batch.get('status')}，无结果"))
+            if error:
+                self.fail(item, error)
+                return
+            try:
+                usage = dict(usage, mode="batch", calls=1)
+                self.finish(item, meta.get("title", ""), meta.get("source", ""), text, usage)
+            except Exception as e:
+                logger.error(f"[ReadBrief] 处理批处理结果失败 {meta['url']}: {e}")
+                self.fail(item, str(e))
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            list(executor.map(one, record["items"].items()))
+
+    def cache_key(self, item):
+        prompt = item["prompt"] or self.plugin.settings.prompt
+        return make_cache_key(item["url"], prompt, self.plugin.get_model_name(), self.plugin.settings.service)
+
+    def finish(self, item, title, source, text, usage):
+        """解析模型输出，生成卡片并写入摘要缓存和输出目录"""
+        summary = self.plugin.summary_parser.parse(text, title=title, source=source)
+        if summary is None:
+            self.fail(item, "摘要JSON解析失败")
+            return
+        mark_partial(summary, usage)
+        card = self.plugin.build_card(summary, item["url"]) if self.cards else None
+        if self.plugin.summary_cache:
+            try:
+                self.plugin.summary_cache.put(self.cache_key(item), item["url"], summary.to_dict(), card)
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 写入摘要缓存失败: {e}")
+        if self.plugin.archive:
+            self.plugin.archive.add(item["url"], summary.to_dict(),
+                                    self.plugin.get_config_hash(item["prompt"] or self.plugin.settings.prompt))
+        self.write(item, summary, usage, card)
+        self._count("prompt_tokens", usage.get("prompt_tokens", 0))
+        self._count("completion_tokens", usage.get("completion_tokens", 0))
+
+    def write(self, item, summary, usage, card=None):
+        card_path = None
+        if card:
+            extension = next((ext for magic, ext in CARD_EXTENSIONS if card.startswith(magic)), "png")
+            card_path = os.path.join("cards", f"{item['id']}.{extension}")
+            self._write_file(card_path, card)
+        data = {
+            "id": item["id"],
+            "url": item["url"],
+            "summary_data": summary.to_dict(),
+            "usage": usage,
+            "card": card_path,
+        }
+        self._write_file(os.path.join("summaries", f"{item['id']}.json"),
+                         json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8"))
+        self.checkpoint.record(item["id"], item["url"], "done")
+        self._count("done")
+
+    def _write_file(self, relative_path, content):
+        """先写临时文件再替换，中断时不会留下不完整的结果"""
+        path = os.path.join(self.output_dir, relative_path)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+    def fail(self, item, error):
+        self.checkpoint.record(item["id"], item["url"], "failed", error=str(error)[:500])
+        self._count("failed")
+
+    def close(self):
+        self.checkpoint.close()
+        if self.plugin.archive:
+            self.plugin.archive.flush()
+
+
+def load_plugin(config_path, cards=False):
+    """按配置文件创建插件实例，并关闭批量运行时不需要的功能"""
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    config.setdefault("readbrief", {}).update(BULK_OVERRIDES, card_enabled=cards)
+    # 临时配置包含密钥，只在插件初始化期间存在
+    fd, path = tempfile.mkstemp(prefix="readbrief-bulk-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(config, f, ensure_ascii=False)
+        os.environ["READBRIEF_CONFIG"] = path
+        from .readbrief import ReadBrief
+        plugin = ReadBrief()
+    finally:
+        os.environ.pop("READBRIEF_CONFIG", None)
+        os.remove(path)
+    if not hasattr(plugin, "metrics"):
+        raise SystemExit("ReadBrief初始化失败，请检查配置")
+    return plugin
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ReadBrief批量摘要")
+    parser.add_argument("--input", required=True, help="链接列表：每行一个链接的文本文件或JSONL")
+    parser.add_argument("--output", required=True, help="输出目录，同时保存检查点")
+    parser.add_argument("--config", default=os.path.join(os.path.dirname(__file__), "config.json"),
+                        help="插件配置文件，默认为插件目录下的config.json")
+    parser.add_argument("--mode", choices=["auto", "batch", "concurrent"], default="auto",
+                        help="auto在首选服务为OpenAI/Azure时使用Batch API，否则并发调用")
+    parser.add_argument("--fetch-concurrency", type=int, default=8, help="并发抓取正文的数量")
+    parser.add_argument("--concurrency", type=int, default=4, help="直接调用大模型和处理结果的并发数")
+    parser.add_argument("--rpm", type=int, default=60, help="直接调用时每分钟最多发起的大模型请求数，0表示不限制")
+    parser.add_argument("--batch-size", type=int, default=500, help="每个批处理包含的最大请求数")
+    parser.add_argument("--poll-interval", type=float, default=30, help="查询批处理状态的间隔（秒）")
+    parser.add_argument("--no-wait", dest="wait", action="store_false", help="提交批处理后立即退出，之后重新运行以收取结果")
+    parser.add_argument("--cards", action="store_true", help="同时生成卡片图片")
+    parser.add_argument("--azure-batch-api-version", default=AZURE_BATCH_API_VERSION)
+    args = parser.parse_args()
+
+    items = read_input(args.input)
+    plugin = load_plugin(args.config, cards=args.cards)
+    supported = BatchClient.supports(plugin.llm.primary)
+    if args.mode == "batch" and not supported:
+        parser.error(f"{plugin.llm.primary.name}不支持Batch API，请使用--mode concurrent")
+    runner = BulkRunner(
+        plugin, args.output,
+        batch=args.mode == "batch" or (args.mode == "auto" and supported),
+        fetch_concurrency=args.fetch_concurrency,
+        concurrency=args.concurrency,
+        per_minute=args.rpm,
+        cards=args.cards,
+        batch_size=args.batch_size,
+        poll_interval=args.poll_interval,
+        batch_api_version=args.azure_batch_api_version,
+    )
+    try:
+        stats = runner.run(items, wait=args.wait)
+    finally:
+        runner.close()
+    print(f"完成{stats['done']}个（其中摘要缓存命中{stats['cached']}个），失败{stats['failed']}个，"
+          f"跳过已完成{stats['skipped']}个，提交批处理{stats['submitted']}条请求；"
+          f"输入token {stats['prompt_tokens']}，输出token {stats['completion_tokens']}")
+    if stats["failed"]:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
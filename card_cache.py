@@ -0,0 +1,91 @@
+import hashlib
+import json
+import os
+import threading
+
+from common.log import logger
+
+
+def make_card_key(*parts):
+    """根据卡片内容和渲染配置生成缓存键，parts需可JSON序列化"""
+    data = json.dumps(parts, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class CardCache:
+    """
+    卡片图片磁盘缓存
+
+    文件名为卡片内容（摘要、链接、渲染和后处理配置）的哈希，相同内容的卡片只渲染和编码一次；
+    读取时更新文件的修改时间，总大小超出上限时删除最久未使用的文件。
+    """
+
+    def __init__(self, directory, max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._total = sum(size for _, _, size in self._files())
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """读取卡片，未命中时返回None"""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key, data):
+        """写入卡片，先写临时文件再替换，并发读取不会读到不完整的文件"""
+        if not data or len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._total += len(data)
+            if self._total > self.max_bytes:
+                self._evict()
+
+    def _files(self):
+        """返回[(修改时间, 路径, 大小)]"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir():
+                continue
+            for item in os.scandir(entry.path):
+                if item.is_file() and not item.name.endswith(".tmp"):
+                    stat = item.stat()
+                    files.append((stat.st_mtime, item.path, stat.st_size))
+        return files
+
+    def _evict(self):
+        """重新统计实际大小，删除最久未使用的文件直到不超过上限的90%"""
+        files = sorted(self._files())
+        self._total = sum(size for _, _, size in files)
+        removed = 0
+        for _, path, size in files:
+            if self._total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._total -= size
+            removed += 1
+        logger.info(f"[ReadBrief] 卡片缓存淘汰{removed}个文件，当前{self._total / 1048576:.1f}MB")
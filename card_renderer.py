@@ -0,0 +1,276 @@
+import os
+import threading
+from functools import lru_cache
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from common.log import logger
+
+try:
+    import qrcode
+except ImportError:
+    qrcode = None
+
+# 常见系统中文字体，未配置card_font_path时依次查找
+FONT_CANDIDATES = [
+    "/usr/share/fonts/opentype/noto/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/google-noto-cjk/NotoSansCJK-Regular.ttc",
+    "/usr/share/fonts/truetype/wqy/wqy-microhei.ttc",
+    "/usr/share/fonts/wqy-microhei/wqy-microhei.ttc",
+    "/System/Library/Fonts/PingFang.ttc",
+    "/System/Library/Fonts/STHeiti Medium.ttc",
+    "C:/Windows/Fonts/msyh.ttc",
+    "C:/Windows/Fonts/simhei.ttf",
+]
+
+BACKGROUND = (244, 239, 228)
+PANEL = (255, 255, 255)
+TITLE_COLOR = (33, 33, 33)
+HEADING_COLOR = (51, 51, 51)
+TEXT_COLOR = (68, 68, 68)
+MUTED_COLOR = (136, 136, 136)
+ACCENT_COLOR = (217, 118, 2)
+TAG_COLOR = (35, 90, 217)
+
+
+def find_font(font_path=None):
+    """返回可用的中文字体路径，找不到时返回None"""
+    if font_path and os.path.exists(font_path):
+        return font_path
+    for path in FONT_CANDIDATES:
+        if os.path.exists(path):
+            return path
+    return None
+
+
+@lru_cache(maxsize=32)
+def load_font(path, size):
+    """加载并缓存字体对象"""
+    if path:
+        return ImageFont.truetype(path, size)
+    try:
+        return ImageFont.load_default(size)
+    except TypeError:
+        return ImageFont.load_default()
+
+
+class CardRenderer:
+    """
+    本地卡片渲染
+
+    使用Pillow在进程内绘制摘要卡片：标题、一句话总结、核心要点、AI点评、智能标签、预计阅读、来源和原文二维码，
+    字体和字形宽度均有缓存，无需网络请求。
+    """
+
+    def __init__(self, font_path=None, width=540, scale=2, image_format="png", jpeg_quality=85, encoder=None):
+        self.font_path = find_font(font_path)
+        if not self.font_path:
+            logger.warning("[ReadBrief] 未找到中文字体，卡片中文可能无法显示，请配置card_font_path")
+        if qrcode is None:
+            logger.warning("[ReadBrief] 未安装qrcode，卡片中不显示原文二维码，请执行pip install qrcode")
+        self.width = width * scale
+        self.scale = scale
+        self.image_format = image_format.lower()
+        self.jpeg_quality = jpeg_quality
+        # 自定义编码函数，如ImageOptimizer.encode，设置后image_format和jpeg_quality不再生效
+        self.encoder = encoder
+        self.padding = 28 * scale
+        self.inner = 24 * scale
+        self._widths = {}
+        self._lock = threading.Lock()
+
+    def font(self, size):
+        return load_font(self.font_path, size * self.scale)
+
+    def _char_width(self, font, char):
+        key = (id(font), char)
+        width = self._widths.get(key)
+        if width is None:
+            width = font.getlength(char)
+            with self._lock:
+                self._widths[key] = width
+        return width
+
+    def wrap(self, text, font, max_width):
+        """按宽度折行，中文逐字折行，英文单词尽量不拆开"""
+        lines = []
+        for paragraph in str(text).split("\n"):
+            line = ""
+            line_width = 0.0
+            word = ""
+            word_width = 0.0
+            for char in paragraph + "\0":
+                if char != "\0" and char.isascii() and char.isalnum():
+                    word += char
+                    word_width += self._char_width(font, char)
+                    continue
+                # 单词结束，整体放入当前行
+                if word:
+                    if line_width + word_width > max_width and line:
+                        lines.append(line)
+                        line, line_width = "", 0.0
+                    while word_width > max_width:
+                        # 超长单词强制拆分
+                        cut = len(word) - 1
+                        while cut > 1 and font.getlength(word[:cut]) > max_width:
+                            cut -= 1
+                        lines.append(word[:cut])
+                        word = word[cut:]
+                        word_width = font.getlength(word)
+                    line += word
+                    line_width += word_width
+                    word, word_width = "", 0.0
+                if char == "\0":
+                    break
+                char_width = self._char_width(font, char)
+                if line_width + char_width > max_width and line:
+                    lines.append(line)
+                    line, line_width = "", 0.0
+                    if char == " ":
+                        continue
+                line += char
+                line_width += char_width
+            lines.append(line)
+        return lines
+
+    def render(self, title, summary="", points=None, comment="", tags="", read_time="", source="", url=""):
+        """渲染卡片并返回图片字节"""
+        s = self.scale
+        body_font = self.font(14)
+
+        # 先排版，计算每个元素的位置和总高度
+        blocks = []
+        self._add_text(blocks, title or "未知标题", self.font(24), TITLE_COLOR, 18 * s)
+        if summary:
+            self._add_heading(blocks, "一句话总结")
+            self._add_text(blocks, summary, body_font, TEXT_COLOR, 14 * s)
+        if points:
+            self._add_heading(blocks, "核心要点")
+            for i, point in enumerate(points):
+                self._add_text(blocks, f"{i + 1}. {point}", body_font, TEXT_COLOR, 6 * s)
+            blocks.append(("gap", 8 * s))
+        if comment:
+            self._add_heading(blocks, "AI辣评")
+            self._add_text(blocks, comment, body_font, TEXT_COLOR, 14 * s)
+        if tags:
+            self._add_heading(blocks, "智能标签")
+            self._add_text(blocks, tags, body_font, TAG_COLOR, 14 * s)
+        if read_time:
+            self._add_text(blocks, f"预计阅读：{read_time}", self.font(12), ACCENT_COLOR, 10 * s)
+        return self._draw(blocks, source, url)
+
+    def render_digest(self, title, items, source="", url=""):
+        """渲染多篇文章的汇总卡片，items为[(文章标题, 一句话总结, 要点列表, 标签)]"""
+        s = self.scale
+        body_font = self.font(14)
+        small_font = self.font(12)
+
+        blocks = []
+        self._add_text(blocks, title or "文章汇总", self.font(24), TITLE_COLOR, 18 * s)
+        for i, (item_title, summary, points, tags) in enumerate(items):
+            self._add_heading(blocks, f"{i + 1}. {item_title or '未知标题'}")
+            if summary:
+                self._add_text(blocks, summary, body_font, TEXT_COLOR, 4 * s)
+            for point in points or []:
+                self._add_text(blocks, f"· {point}", small_font, TEXT_COLOR, 2 * s, indent=8 * s)
+            if tags:
+                self._add_text(blocks, tags, small_font, TAG_COLOR, 0)
+            blocks.append(("gap", 14 * s))
+        return self._draw(blocks, source, url)
+
+    def _content_width(self):
+        return self.width - 2 * self.padding - 2 * self.inner
+
+    def _add_text(self, blocks, text, font, color, gap_after, indent=0):
+        line_height = int(font.size * 1.6)
+        for line in self.wrap(text, font, self._content_width() - indent):
+            blocks.append(("text", line, font, color, indent, line_height))
+        blocks.append(("gap", gap_after))
+
+    def _add_heading(self, blocks, text):
+        heading_font = self.font(16)
+        # 标题过长时只保留一行
+        lines = self.wrap(text, heading_font, self._content_width() - 10 * self.scale)
+        heading = lines[0] + ("…" if len(lines) > 1 else "")
+        blocks.append(("heading", heading, heading_font, int(heading_font.size * 1.8)))
+
+    def _draw(self, blocks, source, url):
+        """按排版结果绘制卡片，页脚为来源和原文二维码"""
+        s = self.scale
+        small_font = self.font(12)
+        qr_image = self._qr_image(url) if url else None
+        footer_height = qr_image.size[1] if qr_image else int(small_font.size * 1.6)
+
+        body_height = 0
+        for block in blocks:
+            body_height += block[1] if block[0] == "gap" else block[-1]
+        panel_height = self.inner * 2 + body_height + 16 * s + footer_height
+        height = panel_height + 2 * self.padding
+
+        # 绘制
+        image = Image.new("RGB", (self.width, height), BACKGROUND)
+        draw = ImageDraw.Draw(image)
+        draw.rounded_rectangle(
+            (self.padding, self.padding, self.width - self.padding, self.padding + panel_height),
+            radius=20 * s, fill=PANEL,
+        )
+        x = self.padding + self.inner
+        y = self.padding + self.inner
+        for block in blocks:
+            if block[0] == "gap":
+                y += block[1]
+            elif block[0] == "heading":
+                _, text, font, line_height = block
+                bar_top = y + (line_height - font.size) // 2
+                draw.rectangle((x, bar_top, x + 4 * s, bar_top + font.size), fill=ACCENT_COLOR)
+                draw.text((x + 10 * s, y + (line_height - font.size) // 2), text, font=font, fill=HEADING_COLOR)
+                y += line_height
+            else:
+                _, text, font, color, indent, line_height = block
+                draw.text((x + indent, y + (line_height - font.size) // 2), text, font=font, fill=color)
+                y += line_height
+
+        # 页脚：来源和原文二维码
+        y += 16 * s
+        draw.line((x, y - 8 * s, self.width - x, y - 8 * s), fill=(235, 235, 235), width=s)
+        draw.text((x, y + (footer_height - small_font.size) // 2), source or "未知来源", font=small_font, fill=MUTED_COLOR)
+        if qr_image:
+            qr_x = self.width - x - qr_image.size[0]
+            image.paste(qr_image, (qr_x, y))
+            caption = "长按识别二维码 · 阅读原文"
+            caption_width = small_font.getlength(caption)
+            draw.text((qr_x - caption_width - 10 * s, y + (footer_height - small_font.size) // 2),
+                      caption, font=small_font, fill=MUTED_COLOR)
+
+        return self._encode(image)
+
+    def _qr_image(self, url):
+        """生成原文二维码，未安装qrcode时返回None"""
+        if qrcode is None:
+            return None
+        try:
+            qr = qrcode.QRCode(border=1, box_size=3 * self.scale, error_correction=qrcode.constants.ERROR_CORRECT_M)
+            qr.add_data(url)
+            qr.make(fit=True)
+            image = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+            max_size = 80 * self.scale
+            if image.size[0] > max_size:
+                image = image.resize((max_size, max_size), Image.NEAREST)
+            return image
+        except Exception as e:
+            logger.warning(f"[ReadBrief] 二维码生成失败: {e}")
+            return None
+
+    def _encode(self, image):
+        if self.encoder:
+            return self.encoder(image)
+        output = BytesIO()
+        if self.image_format in ("jpg", "jpeg"):
+            image.save(output, format="JPEG", quality=self.jpeg_quality, optimize=True, progressive=True)
+        else:
+            # 卡片颜色较少，量化为调色板PNG可显著减小体积；optimize耗时较多且收益很小，不启用
+            image = image.quantize(colors=128, method=Image.FASTOCTREE)
+            image.save(output, format="PNG")
+        return output.getvalue()
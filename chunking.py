@@ -0,0 +1,248 @@
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from common.log import logger
+
+# 常见模型的上下文长度（token），未列出的模型使用DEFAULT_CONTEXT_TOKENS
+MODEL_CONTEXT_TOKENS = {
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-pro": 2097152,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+
+# 常见模型单次调用最多输出的token数，max_tokens超过时接口直接拒绝请求，未列出的模型使用DEFAULT_OUTPUT_TOKENS
+MODEL_OUTPUT_TOKENS = {
+    "gpt-3.5-turbo": 4096,
+    "gpt-4": 4096,
+    "gpt-4-turbo": 4096,
+    "gpt-4o": 4096,
+    "gpt-4o-mini": 16384,
+    "gemini-1.5-flash": 8192,
+    "gemini-1.5-pro": 8192,
+}
+DEFAULT_OUTPUT_TOKENS = 4096
+
+# 中日韩字符，每个字符约计1个token
+CJK_RE = re.compile(r'[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]')
+SENTENCE_RE = re.compile(r'(?<=[。！？!?；;.])\s*')
+
+MAP_PROMPT = "你是一个专业的文章分析师。以下是一篇长文章的第{index}/{total}部分，请用中文提炼这一部分的核心信息、关键数据和主要观点，使用简洁的要点列出，不要使用JSON格式。"
+REDUCE_HINT = "以下内容是对一篇长文章各部分的要点提炼，请基于这些要点为整篇文章生成摘要。"
+PARTIAL_HINT = "文章过长，以下要点只覆盖全文的前{percent}%，请只总结这部分内容，不要推测未覆盖的部分。"
+PARTIAL_NOTE = "（文章过长，摘要仅覆盖前{percent}%的内容）"
+
+# tiktoken在首次估算token时才导入：None为尚未导入，False为未安装
+_tiktoken = None
+_encoders = {}
+
+
+def _load_tiktoken():
+    global _tiktoken
+    if _tiktoken is None:
+        try:
+            import tiktoken
+            _tiktoken = tiktoken
+        except ImportError:
+            _tiktoken = False
+    return _tiktoken
+
+
+def _encoder(model):
+    tiktoken = _load_tiktoken()
+    if not tiktoken:
+        return None
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding("cl100k_base")
+    return _encoders[model]
+
+
+def warm_up_tokenizer(model):
+    """提前导入tiktoken并加载模型的编码表，避免首个请求等待"""
+    _encoder(model or "gpt-3.5-turbo")
+
+
+def estimate_tokens(text, model=None):
+    """估算文本的token数，安装tiktoken时精确计算，否则按中文每字1个、其他约4字符1个估算"""
+    if not text:
+        return 0
+    encoder = _encoder(model or "gpt-3.5-turbo")
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    cjk = len(CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _model_limit(limits, model, default):
+    """按模型名查表，支持带日期后缀的模型名"""
+    if model in limits:
+        return limits[model]
+    for name in sorted(limits, key=len, reverse=True):
+        if model and model.startswith(name):
+            return limits[name]
+    return default
+
+
+def context_window(model):
+    """返回模型的上下文长度，支持带日期后缀的模型名"""
+    return _model_limit(MODEL_CONTEXT_TOKENS, model, DEFAULT_CONTEXT_TOKENS)
+
+
+def output_limit(model):
+    """返回模型单次调用最多输出的token数，支持带日期后缀的模型名"""
+    return _model_limit(MODEL_OUTPUT_TOKENS, model, DEFAULT_OUTPUT_TOKENS)
+
+
+def split_into_chunks(text, chunk_tokens, model=None):
+    """按段落、句子的顺序切分文本，使每块不超过chunk_tokens"""
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def flush():
+        nonlocal current, current_tokens
+        if current:
+            chunks.append("\n".join(current))
+        current = []
+        current_tokens = 0
+
+    for paragraph in text.split("\n"):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        tokens = estimate_tokens(paragraph, model)
+        if tokens > chunk_tokens:
+            # 超长段落按句子切分，单句仍超长时按字符硬切
+            flush()
+            for sentence in SENTENCE_RE.split(paragraph):
+                sentence_tokens = estimate_tokens(sentence, model)
+                if sentence_tokens > chunk_tokens:
+                    flush()
+                    step = max(1, len(sentence) * chunk_tokens // sentence_tokens)
+                    chunks.extend(sentence[i:i + step] for i in range(0, len(sentence), step))
+                    continue
+                if current_tokens + sentence_tokens > chunk_tokens:
+                    flush()
+                current.append(sentence)
+                current_tokens += sentence_tokens
+            continue
+        if current_tokens + tokens > chunk_tokens:
+            flush()
+        current.append(paragraph)
+        current_tokens += tokens
+    flush()
+    return chunks
+
+
+def mark_partial(summary, usage):
+    """摘要只覆盖了部分正文时，在点评前注明覆盖的比例"""
+    if usage.get("partial"):
+        summary.comment = PARTIAL_NOTE.format(percent=int(usage["coverage"] * 100)) + summary.comment
+
+
+class ArticleSummarizer:
+    """
+    按token预算摘要文章
+
+    - 短文章：整篇正文单次调用
+    - 长文章：map-reduce，各分块并发提炼要点，再合并生成title/summary/key_points/comment/tags格式的JSON
+    - 分块数超过max_chunks时增大分块（不超过单次调用的预算）；仍然超过时只处理前max_chunks块，
+      用量中partial为True、coverage为已处理的正文比例
+    """
+
+    def __init__(self, llm, max_input_tokens=6000, chunk_tokens=3000, max_chunks=8,
+                 concurrency=4, max_output_tokens=1000):
+        self.llm = llm
+        self.max_input_tokens = max_input_tokens
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max_chunks
+        self.concurrency = concurrency
+        self.max_output_tokens = max_output_tokens
+
+    def input_budget(self, prompt, model):
+        """正文可用的token预算：不超过配置上限，也不超过模型上下文减去提示词和输出预留"""
+        available = context_window(model) - estimate_tokens(prompt, model) - self.max_output_tokens - 200
+        return max(500, min(self.max_input_tokens, available))
+
+    def single_messages(self, prompt, url, content):
+        """正文不超过预算时返回单次摘要的消息列表，需要分块时返回None；批量摘要据此构造批处理请求"""
+        model = self.llm.primary.model
+        if estimate_tokens(content, model) > self.input_budget(prompt, model):
+            return None
+        return self._messages(prompt, f"链接：{url}\n\n内容：{content}")
+
+    def summarize(self, prompt, url, content, json_mode=False, on_delta=None, on_restart=None):
+        """
+        返回(模型输出文本, token用量)，用量包含mode、calls、prompt_tokens和completion_tokens；
+        json_mode以及流式回调on_delta、on_restart只作用于生成最终摘要的调用
+        """
+        model = self.llm.primary.model
+        budget = self.input_budget(prompt, model)
+        usage = {"mode": "single", "calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+        if estimate_tokens(content, model) <= budget:
+            text = self._call(prompt, f"链接：{url}\n\n内容：{content}", usage, model, json_mode, on_delta, on_restart)
+            return text, usage
+
+        chunks = split_into_chunks(content, min(self.chunk_tokens, budget), model)
+        if len(chunks) > self.max_chunks:
+            # 增大分块使全文不超过max_chunks块，分块按段落和句子切分，留出一成余量
+            total = estimate_tokens(content, model)
+            chunk_tokens = min(budget, max(self.chunk_tokens, total * 11 // (10 * self.max_chunks) + 1))
+            chunks = split_into_chunks(content, chunk_tokens, model)
+        usage["mode"] = "map_reduce"
+        reduce_hint = REDUCE_HINT
+        if len(chunks) > self.max_chunks:
+            coverage = sum(len(chunk) for chunk in chunks[:self.max_chunks]) / max(1, len(content))
+            logger.warning(f"[ReadBrief] 文章分块数{len(chunks)}超过上限，仅处理前{self.max_chunks}块"
+                           f"（约{coverage:.0%}的正文），摘要标记为不完整")
+            chunks = chunks[:self.max_chunks]
+            usage["partial"] = True
+            usage["coverage"] = round(coverage, 2)
+            reduce_hint += PARTIAL_HINT.format(percent=int(usage["coverage"] * 100))
+        logger.info(f"[ReadBrief] 长文章分{len(chunks)}块并发提炼")
+
+        def map_chunk(item):
+            index, chunk = item
+            system = MAP_PROMPT.format(index=index + 1, total=len(chunks))
+            # 用量在各线程中单独统计，完成后再汇总
+            chunk_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+            return self._call(system, chunk, chunk_usage, model), chunk_usage
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(chunks))) as executor:
+            results = list(executor.map(map_chunk, enumerate(chunks)))
+        notes = []
+        for note, chunk_usage in results:
+            notes.append(note)
+            for key, value in chunk_usage.items():
+                usage[key] += value
+
+        merged = "\n\n".join(f"【第{i + 1}部分】\n{note}" for i, note in enumerate(notes))
+        text = self._call(prompt, f"{reduce_hint}\n\n链接：{url}\n\n{merged}", usage, model, json_mode, on_delta, on_restart)
+        return text, usage
+
+    @staticmethod
+    def _messages(system, user):
+        return [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ]
+
+    def _call(self, system, user, usage, model, json_mode=False, on_delta=None, on_restart=None):
+        messages = self._messages(system, user)
+        result = self.llm.complete(messages, max_tokens=self.max_output_tokens, on_delta=on_delta, json_mode=json_mode,
+                                   on_restart=on_restart)
+        # 服务未返回用量时按估算值统计
+        prompt_tokens = result.usage.get("prompt_tokens") or estimate_tokens(system + user, model)
+        completion_tokens = result.usage.get("completion_tokens") or estimate_tokens(result.text, model)
+        usage["calls"] += 1
+        usage["prompt_tokens"] += prompt_tokens
+        usage["completion_tokens"] += completion_tokens
+        return result.text
@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+# 导出指标时的状态值
+STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitBreaker:
+    """
+    按滚动窗口统计的熔断器
+
+    - 关闭：记录最近window秒内每次调用的结果，失败或耗时超过slow_seconds均视为异常，
+      调用数不少于min_requests且异常比例达到error_rate时打开
+    - 打开：allow直接返回False，调用方立即降级，open_seconds秒后进入半开
+    - 半开：只放行一个探测请求，成功则关闭并清空窗口，失败则重新打开；
+      探测请求超过open_seconds仍未记录结果时再放行一个
+    - 状态变化时调用on_change(name, 原状态, 新状态, 原因)
+    """
+
+    def __init__(self, name, window=60, min_requests=5, error_rate=0.5, slow_seconds=0, open_seconds=30,
+                 on_change=None):
+        self.name = name
+        self.window = window
+        self.min_requests = min_requests
+        self.error_rate = error_rate
+        self.slow_seconds = slow_seconds
+        self.open_seconds = open_seconds
+        self.on_change = on_change
+        self.state = CLOSED
+        self.rejected = 0
+        self.transitions = 0
+        self._calls = deque()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """是否可以发起调用，放行后需调用record记录结果"""
+        now = time.monotonic()
+        with self._lock:
+            if self.state == OPEN and now - self._opened_at >= self.open_seconds:
+                change = self._transition(HALF_OPEN, "等待期结束，放行探测请求")
+            else:
+                change = None
+            if self.state == CLOSED:
+                allowed = True
+            elif self.state == HALF_OPEN and (self._probe_at is None or now - self._probe_at >= self.open_seconds):
+                self._probe_at = now
+                allowed = True
+            else:
+                self.rejected += 1
+                allowed = False
+        self._notify(change)
+        return allowed
+
+    def record(self, success, elapsed=0.0):
+        """记录一次调用的结果，elapsed为耗时（秒）"""
+        now = time.monotonic()
+        healthy = success and not (self.slow_seconds and elapsed > self.slow_seconds)
+        reason = "调用失败" if not success else f"耗时{elapsed:.1f}秒"
+        change = None
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_at = None
+                if healthy:
+                    self._calls.clear()
+                    self._failures = 0
+                    change = self._transition(CLOSED, "探测请求成功")
+                else:
+                    self._opened_at = now
+                    change = self._transition(OPEN, f"探测请求{reason}")
+            elif self.state == CLOSED:
+                self._calls.append((now, healthy))
+                if not healthy:
+                    self._failures += 1
+                self._trim(now)
+                total = len(self._calls)
+                if total >= self.min_requests and self._failures >= total * self.error_rate:
+                    self._opened_at = now
+                    change = self._transition(OPEN, f"最近{total}次调用中{self._failures}次异常")
+        self._notify(change)
+
+    def _trim(self, now):
+        while self._calls and now - self._calls[0][0] > self.window:
+            if not self._calls.popleft()[1]:
+                self._failures -= 1
+
+    def _transition(self, state, reason):
+        """切换状态，调用时需持有锁；返回的变化在释放锁后通知"""
+        previous, self.state = self.state, state
+        self.transitions += 1
+        return previous, state, reason
+
+    def _notify(self, change):
+        if change and self.on_change:
+            self.on_change(self.name, *change)
+
+    def stats(self):
+        with self._lock:
+            self._trim(time.monotonic())
+            total = len(self._calls)
+            return {
+                "state": self.state,
+                "calls": total,
+                "error_rate": round(self._failures / total, 4) if total else 0.0,
+                "rejected": self.rejected,
+                "transitions": self.transitions,
+            }
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from array import array
+
+from common.log import logger
+
+from .url_router import canonicalize
+
+# 指纹只使用标点和空白之外的字符，转载时增删的空行、标点和排版不影响结果
+NON_WORD_RE = re.compile(r'[\W_]+')
+# 参与计算的正文最大字符数
+MAX_FINGERPRINT_CHARS = 20000
+EMPTY_BIN = (1 << 64) - 1
+
+
+def shingles(text, size=5):
+    """把正文规范化后切分为长度为size的字符片段集合"""
+    text = NON_WORD_RE.sub("", text.lower())[:MAX_FINGERPRINT_CHARS]
+    if len(text) < size:
+        return {text} if text else set()
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / float(len(a | b))
+
+
+def minhash(grams, num_perm=64):
+    """
+    单次哈希的MinHash签名（one permutation hashing）
+
+    每个片段只计算一次哈希，按哈希值分到num_perm个桶中各取最小值；空桶借用右侧最近的非空桶并加上距离偏移，
+    两篇文章签名中相同位置相等的比例即为Jaccard相似度的估计。
+    """
+    shift = num_perm.bit_length() - 1
+    bins = [EMPTY_BIN] * num_perm
+    for gram in grams:
+        value = int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8).digest(), "little")
+        index = value & (num_perm - 1)
+        value >>= shift
+        if value < bins[index]:
+            bins[index] = value
+    for i in range(num_perm):
+        if bins[i] != EMPTY_BIN:
+            continue
+        for distance in range(1, num_perm):
+            borrowed = bins[(i + distance) % num_perm]
+            if borrowed != EMPTY_BIN and borrowed < (1 << (64 - shift)):
+                bins[i] = borrowed + (distance << (64 - shift))
+                break
+    return array("Q", bins)
+
+
+def similarity(a, b):
+    """两个签名的估计相似度"""
+    return sum(1 for x, y in zip(a, b) if x == y) / float(len(a))
+
+
+class DuplicateDetector:
+    """
+    近似重复文章检测
+
+    对提取后的正文计算MinHash签名，按LSH分段（bands×rows）索引最近摘要过的文章，只比较至少一段完全相同的候选；
+    估计相似度达到threshold且能取得原文时再计算精确的Jaccard相似度确认，低于阈值的计为误匹配。
+    索引保存在SQLite中，重启后仍然有效，超过ttl或max_entries的条目被淘汰。
+    """
+
+    def __init__(self, path, threshold=0.8, ttl=7 * 86400, max_entries=20000, min_chars=300, num_perm=64, bands=16):
+        if num_perm & (num_perm - 1) or num_perm % bands:
+            raise ValueError("num_perm必须是2的幂且能被bands整除")
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.min_chars = min_chars
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._lock = threading.Lock()
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS fingerprints (url TEXT PRIMARY KEY, signature BLOB, created_at REAL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bands (band INTEGER, hash INTEGER, url TEXT)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands ON bands(band, hash)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_bands_url ON bands(url)")
+        self._conn.commit()
+        self.stats = {"checked": 0, "hits": 0, "false_matches": 0, "unverified": 0}
+
+    def fingerprint(self, text):
+        """返回(片段集合, 签名)，正文过短时返回None"""
+        if not text or len(text) < self.min_chars:
+            return None
+        grams = shingles(text)
+        return grams, minhash(grams, self.num_perm)
+
+    def _band_hashes(self, signature):
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            yield band, int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "little", signed=True)
+
+    def find(self, url, fingerprint, load_text=None):
+        """
+        查找与当前文章近似重复的已摘要文章，返回(原文章链接, 相似度)，没有时返回None；
+        load_text(url)返回原文章正文时用精确相似度确认，取不到原文时按估计相似度判断
+        """
+        grams, signature = fingerprint
+        url = canonicalize(url)
+        now = time.time()
+        with self._lock:
+            candidates = set()
+            for band, value in self._band_hashes(signature):
+                for row in self._conn.execute("SELECT url FROM bands WHERE band = ? AND hash = ?", (band, value)):
+                    candidates.add(row[0])
+            candidates.discard(url)
+            scored = []
+            for candidate in candidates:
+                row = self._conn.execute(
+                    "SELECT signature, created_at FROM fingerprints WHERE url = ?", (candidate,)
+                ).fetchone()
+                if row is None or now - row[1] > self.ttl:
+                    continue
+                score = similarity(signature, array("Q", row[0]))
+                if score >= self.threshold:
+                    scored.append((score, candidate))
+            self.stats["checked"] += 1
+
+        for score, candidate in sorted(scored, reverse=True):
+            original = load_text(candidate) if load_text else None
+            if original is None:
+                with self._lock:
+                    self.stats["unverified"] += 1
+                    self.stats["hits"] += 1
+                return candidate, score
+            exact = jaccard(grams, shingles(original))
+            if exact >= self.threshold:
+                with self._lock:
+                    self.stats["hits"] += 1
+                return candidate, exact
+            with self._lock:
+                self.stats["false_matches"] += 1
+            logger.info(f"[ReadBrief] 近似重复误匹配: {candidate} 估计相似度{score:.2f}，实际{exact:.2f}")
+        return None
+
+    def add(self, url, fingerprint):
+        """把已摘要的文章加入索引"""
+        _, signature = fingerprint
+        url = canonicalize(url)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM bands WHERE url = ?", (url,))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO fingerprints (url, signature, created_at) VALUES (?, ?, ?)",
+                (url, signature.tobytes(), now),
+            )
+            self._conn.executemany(
+                "INSERT INTO bands (band, hash, url) VALUES (?, ?, ?)",
+                [(band, value, url) for band, value in self._band_hashes(signature)],
+            )
+            self._writes += 1
+            # 每写入一定次数清理一次过期和超出数量的条目
+            if self._writes % 100 == 0:
+                self._conn.execute("DELETE FROM fingerprints WHERE created_at < ?", (now - self.ttl,))
+                self._conn.execute(
+                    "DELETE FROM fingerprints WHERE url IN "
+                    "(SELECT url FROM fingerprints ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+                self._conn.execute("DELETE FROM bands WHERE url NOT IN (SELECT url FROM fingerprints)")
+            self._conn.commit()
+
+    def rates(self):
+        """返回(近似重复命中率, 误匹配率)"""
+        with self._lock:
+            checked = self.stats["checked"]
+            hits = self.stats["hits"]
+            false_matches = self.stats["false_matches"]
+        hit_rate = hits / float(checked) if checked else 0.0
+        false_rate = false_matches / float(hits + false_matches) if hits + false_matches else 0.0
+        return hit_rate, false_rate
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from common.log import logger
+
+from .chunking import context_window, estimate_tokens, output_limit
+
+DIGEST_PROMPT = (
+    "你是一个专业的资讯编辑。以下是多篇文章，请逐篇生成简要摘要，使用JSON格式返回："
+    '{"title": "本次汇总的总标题", "articles": [{"index": 文章序号, "title": "标题", "summary": "一句话总结", '
+    '"key_points": ["2-3个核心要点"], "tags": "智能标签"}]}。articles按文章序号顺序包含每一篇文章，不要遗漏。'
+)
+
+
+def truncate_tokens(text, max_tokens, model=None):
+    """把文本截断到约max_tokens个token"""
+    tokens = estimate_tokens(text, model)
+    if tokens <= max_tokens:
+        return text
+    return text[:len(text) * max_tokens // tokens]
+
+
+class DigestSummarizer:
+    """
+    多篇文章合并摘要
+
+    按token预算把多篇文章分批，每批只调用一次大模型，一次返回该批每篇文章的摘要；各批之间并发执行。
+    单篇文章的正文按批内平均预算截断，但不少于min_article_tokens；每批的文章数还受模型单次输出上限限制，
+    保证每篇output_tokens_per_article的输出预算不超过max_tokens上限。
+    """
+
+    def __init__(self, llm, parser, max_input_tokens=12000, min_article_tokens=600, concurrency=4,
+                 output_tokens_per_article=300):
+        self.llm = llm
+        self.parser = parser
+        self.max_input_tokens = max_input_tokens
+        self.min_article_tokens = min_article_tokens
+        self.concurrency = concurrency
+        self.output_tokens_per_article = output_tokens_per_article
+
+    def max_tokens(self, count, model):
+        """一批count篇文章的输出token上限，不超过模型的单次输出上限"""
+        return min(self.output_tokens_per_article * count + 200, output_limit(model))
+
+    def plan(self, count, prompt, model):
+        """返回(每批文章数, 每篇正文token预算)"""
+        max_batch = max(1, (output_limit(model) - 200) // self.output_tokens_per_article)
+        batch_count = max(1, min(count, max_batch))
+        available = context_window(model) - estimate_tokens(prompt, model) - self.max_tokens(batch_count, model)
+        budget = max(self.min_article_tokens, min(self.max_input_tokens, available))
+        per_article = max(self.min_article_tokens, budget // batch_count)
+        return max(1, min(max_batch, budget // per_article)), per_article
+
+    def summarize(self, articles, prompt=None, json_mode=False):
+        """
+        articles为[{url, title, source, content}]，返回(汇总标题, 与articles一一对应的Summary列表, token用量)，
+        某篇未能解析时对应位置为None
+        """
+        prompt = prompt or DIGEST_PROMPT
+        model = self.llm.primary.model
+        batch_size, per_article = self.plan(len(articles), prompt, model)
+        batches = [list(range(i, min(i + batch_size, len(articles)))) for i in range(0, len(articles), batch_size)]
+        logger.info(f"[ReadBrief] 汇总{len(articles)}篇文章，分{len(batches)}批调用，每篇正文上限{per_article}token")
+
+        def run_batch(indexes):
+            parts = []
+            for n, index in enumerate(indexes):
+                article = articles[index]
+                parts.append(f"【文章{n + 1}】\n链接：{article['url']}\n标题：{article.get('title', '')}\n"
+                             f"内容：{truncate_tokens(article['content'], per_article, model)}")
+            messages = [
+                {"role": "system", "content": prompt},
+                {"role": "user", "content": "\n\n".join(parts)}
+            ]
+            try:
+                result = self.llm.complete(messages, max_tokens=self.max_tokens(len(indexes), model),
+                                           json_mode=json_mode)
+            except Exception as e:
+                # 单批失败时其余批次的结果仍然可用
+                logger.error(f"[ReadBrief] 汇总调用失败: {e}")
+                return "", [None] * len(indexes), {"prompt_tokens": 0, "completion_tokens": 0}
+            usage = {
+                "prompt_tokens": result.usage.get("prompt_tokens") or estimate_tokens(messages[0]["content"] + messages[1]["content"], model),
+                "completion_tokens": result.usage.get("completion_tokens") or estimate_tokens(result.text, model),
+            }
+            defaults = [(articles[i].get("title", ""), articles[i].get("source", "")) for i in indexes]
+            title, summaries = self.parser.parse_many(result.text, defaults)
+            return title, summaries, usage
+
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(batches))) as executor:
+            results = list(executor.map(run_batch, batches))
+
+        usage = {"mode": "digest", "calls": len(batches), "prompt_tokens": 0, "completion_tokens": 0}
+        digest_title = ""
+        summaries = []
+        for title, batch_summaries, batch_usage in results:
+            digest_title = digest_title or title
+            summaries.extend(batch_summaries)
+            usage["prompt_tokens"] += batch_usage["prompt_tokens"]
+            usage["completion_tokens"] += batch_usage["completion_tokens"]
+        return digest_title, summaries, usage
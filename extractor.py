@@ -0,0 +1,334 @@
+import re
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+try:
+    from lxml import etree
+except ImportError:
+    etree = None
+
+# 不参与正文提取的标签
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "iframe", "form", "nav", "footer", "aside", "button", "select", "textarea"}
+# 块级标签，遇到时切分段落
+BLOCK_TAGS = {"p", "div", "section", "article", "main", "li", "ul", "ol", "h1", "h2", "h3", "h4", "h5", "h6",
+              "blockquote", "pre", "td", "tr", "table", "dd", "dt", "figure", "figcaption", "header", "body", "br", "hr"}
+# 没有结束标签的元素
+VOID_TAGS = {"br", "hr", "img", "meta", "link", "input", "source", "area", "base", "col", "embed", "param", "track", "wbr"}
+
+NEGATIVE_RE = re.compile(r'comment|footer|sidebar|share|related|recommend|advert|\bad-|banner|copyright|toolbar|qrcode|login|popup|breadcrumb', re.I)
+POSITIVE_RE = re.compile(r'article|content|post|entry|main|body|text|rich_media', re.I)
+WHITESPACE_RE = re.compile(r'\s+')
+CHARSET_RE = re.compile(rb'<meta[^>]+charset=["\']?([\w-]+)', re.I)
+
+# 段落少于该字数时不参与打分
+MIN_PARAGRAPH_CHARS = 25
+
+# 站点规则：正文容器、默认来源以及从脚本中提取元数据的正则
+SITE_RULES = {
+    "mp.weixin.qq.com": {
+        "content_ids": {"js_content"},
+        "source_ids": {"js_name"},
+        "source": "微信公众号",
+        "script_patterns": {
+            "source": re.compile(r'var\s+nickname\s*=\s*(?:htmlDecode\()?["\']([^"\']+)["\']'),
+            "publish_time": re.compile(r'var\s+ct\s*=\s*["\'](\d{10})["\']'),
+            "title": re.compile(r'var\s+msg_title\s*=\s*(?:htmlDecode\()?["\']([^"\']+)["\']'),
+        },
+    },
+    "zhuanlan.zhihu.com": {
+        "content_classes": {"Post-RichText", "RichText"},
+        "source": "知乎",
+    },
+    "www.zhihu.com": {
+        "content_classes": {"RichText"},
+        "source": "知乎",
+    },
+    "www.toutiao.com": {
+        "content_classes": {"article-content"},
+        "source": "今日头条",
+    },
+    "m.toutiao.com": {
+        "content_classes": {"article-content"},
+        "source": "今日头条",
+    },
+}
+
+
+def sniff_encoding(head_bytes, declared=None):
+    """确定HTML编码：优先使用响应头声明，其次是meta charset，默认utf-8"""
+    if declared:
+        return declared
+    match = CHARSET_RE.search(head_bytes[:4096])
+    if match:
+        return match.group(1).decode("ascii", errors="ignore")
+    return "utf-8"
+
+
+class _Node:
+    __slots__ = ("tag", "parent", "score", "text_len", "link_len", "paragraphs", "skip", "forced", "bonus")
+
+    def __init__(self, tag, parent):
+        self.tag = tag
+        self.parent = parent
+        self.score = 0.0
+        self.text_len = 0
+        self.link_len = 0
+        self.paragraphs = []
+        self.skip = parent.skip if parent else False
+        self.forced = False
+        self.bonus = 0.0
+
+
+class _ExtractTarget:
+    """
+    单遍扫描HTML的解析目标（兼容lxml target接口）
+
+    在解析过程中为块级元素的父节点和祖父节点累计段落得分，结束时选出得分最高的节点作为正文，
+    同时收集head中的标题、来源、作者和发布时间。
+    """
+
+    def __init__(self, rule=None):
+        self.rule = rule or {}
+        self.root = _Node("#root", None)
+        self.stack = [self.root]
+        self.buffer = []
+        self.buffer_link_len = 0
+        self.link_depth = 0
+        self.in_title = False
+        self.in_script = False
+        self.title_parts = []
+        self.script_parts = []
+        self.meta = {}
+        self.candidates = []
+        self.forced_nodes = []
+        self.source_depth = 0
+        self.source_parts = []
+        self.time_attr = ""
+        self.total_chars = 0
+
+    def start(self, tag, attrib):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag == "meta":
+            key = (attrib.get("property") or attrib.get("name") or attrib.get("itemprop") or "").lower()
+            if key and attrib.get("content"):
+                self.meta.setdefault(key, attrib.get("content"))
+            return
+        if tag == "time" and not self.time_attr:
+            self.time_attr = attrib.get("datetime", "")
+        if tag in VOID_TAGS:
+            return
+        if tag == "title":
+            self.in_title = True
+        elif tag == "script":
+            self.in_script = True
+        elif tag == "a":
+            self.link_depth += 1
+
+        node = _Node(tag, self.stack[-1])
+        element_id = attrib.get("id", "")
+        classes = attrib.get("class", "")
+        if element_id in self.rule.get("content_ids", ()) or set(classes.split()) & self.rule.get("content_classes", set()):
+            node.forced = True
+            node.skip = False
+            self.forced_nodes.append(node)
+        elif tag in SKIP_TAGS:
+            node.skip = True
+        else:
+            marker = f"{element_id} {classes}"
+            if marker.strip():
+                if NEGATIVE_RE.search(marker) and not POSITIVE_RE.search(marker):
+                    node.skip = True
+                elif POSITIVE_RE.search(marker):
+                    node.bonus = 25.0
+        if element_id in self.rule.get("source_ids", ()):
+            self.source_depth = len(self.stack) + 1
+        self.stack.append(node)
+
+    def end(self, tag):
+        tag = tag.lower() if isinstance(tag, str) else ""
+        if tag in VOID_TAGS:
+            if tag in BLOCK_TAGS:
+                self._flush()
+            return
+        if tag in BLOCK_TAGS:
+            self._flush()
+        if tag == "title":
+            self.in_title = False
+        elif tag == "script":
+            self.in_script = False
+        elif tag == "a" and self.link_depth:
+            self.link_depth -= 1
+        # 容错处理未闭合的标签：弹出到最近的同名节点
+        for i in range(len(self.stack) - 1, 0, -1):
+            if self.stack[i].tag == tag:
+                if self.source_depth and i + 1 <= self.source_depth:
+                    self.source_depth = 0
+                del self.stack[i:]
+                break
+
+    def data(self, text):
+        if self.in_title:
+            self.title_parts.append(text)
+            return
+        if self.in_script:
+            if self.rule.get("script_patterns"):
+                self.script_parts.append(text)
+            return
+        if self.stack[-1].skip:
+            return
+        if self.source_depth:
+            self.source_parts.append(text)
+        self.buffer.append(text)
+        if self.link_depth:
+            self.buffer_link_len += len(text.strip())
+
+    def comment(self, text):
+        pass
+
+    def close(self):
+        self._flush()
+        return self
+
+    def _flush(self):
+        """把当前缓冲的文字作为一个段落，计入所在块及其上两级节点"""
+        if not self.buffer:
+            return
+        text = WHITESPACE_RE.sub(" ", "".join(self.buffer)).strip()
+        link_len = self.buffer_link_len
+        self.buffer = []
+        self.buffer_link_len = 0
+        if not text:
+            return
+        self.total_chars += len(text)
+        block = self.stack[-1]
+        for node in self.forced_nodes:
+            if self._is_ancestor(node, block):
+                node.paragraphs.append(text)
+
+        score = 0.0
+        if len(text) >= MIN_PARAGRAPH_CHARS:
+            score = 1 + text.count("，") + text.count(",") + text.count("。") + min(len(text) / 100, 3)
+        node = block
+        for weight in (1.0, 1.0, 0.5):
+            if node is None or node is self.root:
+                break
+            if node.text_len == 0:
+                self.candidates.append(node)
+            node.score += score * weight
+            node.text_len += len(text)
+            node.link_len += link_len
+            node.paragraphs.append(text)
+            node = node.parent
+
+    @staticmethod
+    def _is_ancestor(ancestor, node):
+        while node is not None:
+            if node is ancestor:
+                return True
+            node = node.parent
+        return False
+
+    def best_content(self):
+        """返回正文文本：站点规则命中时使用规则容器，否则取链接密度修正后得分最高的节点"""
+        for node in self.forced_nodes:
+            if node.paragraphs:
+                return "\n".join(_dedupe(node.paragraphs))
+        best = None
+        best_score = 0.0
+        for node in self.candidates:
+            link_density = node.link_len / node.text_len if node.text_len else 1.0
+            score = (node.score + node.bonus) * (1 - link_density)
+            if score > best_score:
+                best, best_score = node, score
+        if best is None:
+            return ""
+        return "\n".join(_dedupe(best.paragraphs))
+
+    def metadata(self):
+        scripts = "".join(self.script_parts)
+        found = {}
+        for field, pattern in self.rule.get("script_patterns", {}).items():
+            match = pattern.search(scripts)
+            if match:
+                found[field] = match.group(1)
+        title = (self.meta.get("og:title") or found.get("title") or self.meta.get("twitter:title")
+                 or WHITESPACE_RE.sub(" ", "".join(self.title_parts)).strip())
+        source = (WHITESPACE_RE.sub(" ", "".join(self.source_parts)).strip() or found.get("source")
+                  or self.meta.get("og:site_name") or self.meta.get("application-name") or self.rule.get("source", ""))
+        author = self.meta.get("author") or self.meta.get("article:author") or self.meta.get("og:article:author", "")
+        publish_time = (self.meta.get("article:published_time") or self.meta.get("og:release_date")
+                        or self.meta.get("publishdate") or self.meta.get("pubdate") or found.get("publish_time")
+                        or self.meta.get("datepublished") or self.time_attr)
+        return {
+            "title": title,
+            "source": source,
+            "author": author,
+            "publish_time": publish_time or "",
+        }
+
+
+def _dedupe(paragraphs):
+    """段落会同时计入多级节点，按出现顺序去除相邻重复"""
+    result = []
+    for paragraph in paragraphs:
+        if not result or result[-1] != paragraph:
+            result.append(paragraph)
+    return result
+
+
+class _StdlibAdapter(HTMLParser):
+    """把标准库HTMLParser的回调转换为lxml target接口"""
+
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {k: v or "" for k, v in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.target.start(tag, {k: v or "" for k, v in attrs})
+        self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+class ArticleExtractor:
+    """
+    增量式正文提取器
+
+    通过feed逐块输入HTML文本，close后返回正文和元数据。安装lxml时使用lxml解析，否则使用标准库解析器。
+    """
+
+    def __init__(self, url):
+        host = urlsplit(url).hostname or ""
+        self.url = url
+        self.host = host
+        self.target = _ExtractTarget(SITE_RULES.get(host))
+        if etree is not None:
+            self._parser = etree.HTMLParser(target=self.target, recover=True)
+        else:
+            self._parser = _StdlibAdapter(self.target)
+
+    def feed(self, text):
+        self._parser.feed(text)
+
+    def paragraph_chars(self):
+        """已解析出的正文字数，用于判断是否可以提前停止下载"""
+        return self.target.total_chars
+
+    def close(self):
+        self._parser.close()
+        self.target.close()
+        metadata = self.target.metadata()
+        metadata["content"] = self.target.best_content()
+        if not metadata["source"]:
+            metadata["source"] = self.host
+        return metadata
+
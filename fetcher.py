@@ -0,0 +1,209 @@
+import codecs
+import re
+import tempfile
+import time
+from datetime import datetime
+from itertools import chain
+from urllib.parse import urlsplit
+
+from common.log import logger
+
+from .extractor import ArticleExtractor, sniff_encoding
+
+# 按网页处理的内容类型，未声明类型时按网页处理
+HTML_TYPES = ("text/html", "application/xhtml+xml", "application/xml", "text/xml")
+PDF_TYPES = ("application/pdf", "application/x-pdf")
+# 仍需检查内容开头才能确定是否为PDF的类型
+SNIFF_TYPES = ("application/octet-stream", "binary/octet-stream", "application/download", "")
+PDF_MAGIC = b"%PDF-"
+PDF_LINE_RE = re.compile(r'[ \t]*\n[ \t]*')
+# 写入PDF临时文件时超过该大小才落盘
+PDF_SPOOL_BYTES = 1024 * 1024
+
+# pypdf在首次遇到PDF时才导入：None为尚未导入，False为未安装
+_pypdf = None
+
+
+def _load_pypdf():
+    global _pypdf
+    if _pypdf is None:
+        try:
+            import pypdf
+            _pypdf = pypdf
+        except ImportError:
+            _pypdf = False
+    return _pypdf
+
+
+class ContentRejected(Exception):
+    """内容类型不支持或超出上限，不再回退到其他下载方式"""
+
+
+class FetchResult:
+    """一次下载的结果，not_modified为True时url_data为None"""
+
+    __slots__ = ("url_data", "not_modified", "etag", "last_modified", "bytes", "truncated", "kind")
+
+    def __init__(self):
+        self.url_data = None
+        self.not_modified = False
+        self.etag = ""
+        self.last_modified = ""
+        self.bytes = 0
+        # 提前停止的原因：chars（正文已足够）、bytes、time或pages
+        self.truncated = ""
+        self.kind = "html"
+
+
+class StreamingFetcher:
+    """
+    流式下载网页和PDF
+
+    - 读取响应体之前先检查Content-Type和Content-Length，图片、视频、压缩包等直接拒绝，不下载
+    - 网页按块解码后交给ArticleExtractor增量解析，已解析的文字达到stop_chars、下载量达到max_bytes
+      或耗时达到max_seconds时停止读取，用已解析的部分提取正文
+    - PDF写入超过1MB即落盘的临时文件，大小不超过pdf_max_bytes，用pypdf（可选依赖）逐页提取前pdf_max_pages页的文字；
+      pdf_enabled为False时拒绝PDF
+    """
+
+    def __init__(self, http, max_bytes=5 * 1024 * 1024, max_seconds=20, stop_chars=50000, pdf_enabled=True,
+                 pdf_max_bytes=20 * 1024 * 1024, pdf_max_pages=30, chunk_size=16384):
+        self.http = http
+        self.pdf_enabled = pdf_enabled
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+        self.stop_chars = stop_chars
+        self.pdf_max_bytes = pdf_max_bytes
+        self.pdf_max_pages = pdf_max_pages
+        self.chunk_size = chunk_size
+
+    def fetch(self, url, headers=None):
+        """下载并提取正文，返回FetchResult；HTTP错误时抛出requests异常，内容不可用时抛出ContentRejected"""
+        started_at = time.monotonic()
+        response = self.http.get(url, "fetch", headers=headers, stream=True)
+        try:
+            result = FetchResult()
+            if response.status_code == 304:
+                result.not_modified = True
+                return result
+            response.raise_for_status()
+            result.etag = response.headers.get("ETag", "")
+            result.last_modified = response.headers.get("Last-Modified", "")
+
+            content_type = response.headers.get("Content-Type", "")
+            mime = content_type.split(";")[0].strip().lower()
+            if not (mime in HTML_TYPES or mime in PDF_TYPES or mime in SNIFF_TYPES or mime.startswith("text/")):
+                raise ContentRejected(f"不支持的内容类型{mime}")
+            length = response.headers.get("Content-Length", "")
+            length = int(length) if length.isdigit() else 0
+
+            if mime in PDF_TYPES:
+                self._check_pdf(length)
+            chunks = response.iter_content(chunk_size=self.chunk_size)
+            first = next(chunks, b"")
+            if mime in PDF_TYPES or first.startswith(PDF_MAGIC):
+                result.kind = "pdf"
+                self._check_pdf(length)
+                result.url_data = self._read_pdf(url, chain([first], chunks), result, started_at)
+            elif mime in SNIFF_TYPES and mime:
+                raise ContentRejected(f"不支持的内容类型{mime}")
+            else:
+                if length > self.max_bytes:
+                    logger.info(f"[ReadBrief] 网页大小{length // 1024}KB超过上限，只读取前{self.max_bytes // 1024}KB")
+                declared = response.encoding if "charset" in content_type else None
+                result.url_data = self._read_html(url, chain([first], chunks), declared, result, started_at)
+            return result
+        finally:
+            response.close()
+
+    def _check_pdf(self, length):
+        """下载PDF之前检查是否启用以及Content-Length是否超过上限"""
+        if not self.pdf_enabled:
+            raise ContentRejected("未启用PDF摘要")
+        if length > self.pdf_max_bytes:
+            raise ContentRejected(f"PDF大小{length // 1048576}MB超过{self.pdf_max_bytes // 1048576}MB上限")
+
+    def _read_html(self, url, chunks, declared, result, started_at):
+        extractor = ArticleExtractor(url)
+        decoder = None
+        head = b""
+        for chunk in chunks:
+            result.bytes += len(chunk)
+            if decoder is None:
+                # 未声明编码时需要前4KB判断meta charset
+                head += chunk
+                if len(head) < 4096 and not declared:
+                    continue
+                decoder = self._decoder(sniff_encoding(head, declared))
+                chunk, head = head, b""
+            extractor.feed(decoder.decode(chunk))
+            if extractor.paragraph_chars() >= self.stop_chars:
+                result.truncated = "chars"
+            elif result.bytes >= self.max_bytes:
+                result.truncated = "bytes"
+            elif time.monotonic() - started_at >= self.max_seconds:
+                result.truncated = "time"
+            if result.truncated:
+                break
+        if decoder is None:
+            decoder = self._decoder(sniff_encoding(head, declared))
+            extractor.feed(decoder.decode(head))
+        extractor.feed(decoder.decode(b"", final=True))
+        return extractor.close()
+
+    @staticmethod
+    def _decoder(encoding):
+        try:
+            return codecs.getincrementaldecoder(encoding)(errors="replace")
+        except LookupError:
+            return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+    def _read_pdf(self, url, chunks, result, started_at):
+        pypdf = _load_pypdf()
+        if not pypdf:
+            raise ContentRejected("未安装pypdf，无法提取PDF")
+        # PDF的交叉引用表在文件末尾，需要完整下载；较大的文件写入磁盘，不占用内存
+        with tempfile.SpooledTemporaryFile(max_size=PDF_SPOOL_BYTES) as spool:
+            for chunk in chunks:
+                result.bytes += len(chunk)
+                if result.bytes > self.pdf_max_bytes:
+                    raise ContentRejected(f"PDF超过{self.pdf_max_bytes // 1048576}MB上限")
+                if time.monotonic() - started_at >= self.max_seconds:
+                    raise ContentRejected(f"PDF下载超过{self.max_seconds}秒")
+                spool.write(chunk)
+            spool.seek(0)
+            reader = pypdf.PdfReader(spool, strict=False)
+            pages = []
+            chars = 0
+            total = len(reader.pages)
+            for i in range(total):
+                if i >= self.pdf_max_pages:
+                    result.truncated = "pages"
+                    break
+                if chars >= self.stop_chars:
+                    result.truncated = "chars"
+                    break
+                text = PDF_LINE_RE.sub("\n", reader.pages[i].extract_text() or "").strip()
+                if text:
+                    pages.append(text)
+                    chars += len(text)
+            info = reader.metadata or {}
+            logger.info(f"[ReadBrief] PDF共{total}页，提取前{min(total, self.pdf_max_pages)}页{chars}字")
+            return {
+                "content": "\n".join(pages),
+                "title": (info.get("/Title") or "").strip() if isinstance(info.get("/Title"), str) else "",
+                "source": urlsplit(url).hostname or "",
+                "author": (info.get("/Author") or "").strip() if isinstance(info.get("/Author"), str) else "",
+                "publish_time": self._pdf_date(info.get("/CreationDate")),
+            }
+
+    @staticmethod
+    def _pdf_date(value):
+        """PDF日期形如D:20240131120000+08'00'，只保留日期和时间"""
+        match = re.match(r"D:(\d{14})", value) if isinstance(value, str) else None
+        if not match:
+            return ""
+        try:
+            return datetime.strptime(match.group(1), "%Y%m%d%H%M%S").isoformat()
+        except ValueError:
+            return ""
@@ -0,0 +1,160 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+from common.log import logger
+
+# 需要重试的HTTP状态码
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+# 各接口默认的(连接超时, 读取超时)，单位秒
+DEFAULT_TIMEOUTS = {
+    "default": (5, 30),
+    "openai": (5, 60),
+    "azure": (5, 60),
+    "gemini": (5, 60),
+    "card": (5, 30),
+    "fetch": (5, 20),
+    "feed": (5, 20),
+    "batch": (10, 120),
+}
+
+
+class EndpointStats:
+    """单个接口的调用统计"""
+
+    __slots__ = ("requests", "errors", "retries", "total_latency", "max_latency")
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def to_dict(self):
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "retries": self.retries,
+            "avg_latency": round(self.total_latency / self.requests, 3) if self.requests else 0.0,
+            "max_latency": round(self.max_latency, 3),
+        }
+
+
+class HttpClient:
+    """
+    插件共享的HTTP客户端
+
+    - 共用一个Session，按域名复用连接池、保持长连接和TLS会话
+    - 每个接口独立配置连接/读取超时
+    - 遇到429/5xx和网络错误时按带抖动的指数退避重试，并遵守Retry-After
+    - 统计每个接口的请求数、错误数、重试次数和耗时
+    - requests在首次发送请求时才导入并创建Session，不拖慢插件加载
+    """
+
+    def __init__(self, timeouts=None, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 pool_connections=10, pool_maxsize=20):
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        for endpoint, timeout in (timeouts or {}).items():
+            self.timeouts[endpoint] = tuple(timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self._session = None
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    @property
+    def session(self):
+        """共用的requests.Session，首次使用时创建"""
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize)
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    self._session = session
+        return self._session
+
+    def get(self, url, endpoint="default", **kwargs):
+        return self.request("GET", url, endpoint, **kwargs)
+
+    def post(self, url, endpoint="default", **kwargs):
+        return self.request("POST", url, endpoint, **kwargs)
+
+    def request(self, method, url, endpoint="default", retries=None, **kwargs):
+        """
+        发送请求，失败时自动重试；最后一次仍失败时返回响应或抛出异常。
+        retries为本次调用的最大重试次数，默认使用max_retries；有其他服务可切换的调用应传0，立即失败
+        """
+        import requests
+
+        max_retries = self.max_retries if retries is None else retries
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.timeouts["default"]))
+        attempt = 0
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(endpoint, time.monotonic() - start, error=True)
+                if attempt >= max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                logger.warning(f"[ReadBrief] {endpoint}请求失败: {e}，{delay:.1f}秒后重试")
+            else:
+                error = response.status_code >= 400
+                self._record(endpoint, time.monotonic() - start, error=error)
+                if response.status_code not in RETRY_STATUS or attempt >= max_retries:
+                    return response
+                delay = self._retry_after(response)
+                if delay is None:
+                    delay = self._backoff(attempt)
+                logger.warning(f"[ReadBrief] {endpoint}返回{response.status_code}，{delay:.1f}秒后重试")
+                response.close()
+            attempt += 1
+            with self._lock:
+                self._stats[endpoint].retries += 1
+            time.sleep(delay)
+
+    def _backoff(self, attempt):
+        """带完全抖动的指数退避"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _retry_after(self, response):
+        """解析Retry-After头，支持秒数和HTTP日期两种格式"""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            delay = float(value)
+        except ValueError:
+            try:
+                delay = parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+        return min(max(delay, 0.0), self.backoff_max * 4)
+
+    def _record(self, endpoint, latency, error=False):
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.requests += 1
+            stats.total_latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            if error:
+                stats.errors += 1
+
+    def stats(self):
+        """返回各接口的调用统计"""
+        with self._lock:
+            return {endpoint: stats.to_dict() for endpoint, stats in self._stats.items()}
@@ -0,0 +1,91 @@
+import math
+from io import BytesIO
+
+from PIL import Image, features
+
+from common.log import logger
+
+# PNG逐步减少的调色板颜色数
+PNG_COLORS = (256, 128, 64, 32)
+
+
+class ImageOptimizer:
+    """
+    卡片图片后处理
+
+    - 超过像素预算时等比缩小
+    - 按目标大小编码：JPEG/WebP二分查找不超过target_bytes的最高质量，PNG量化为调色板并逐步减少颜色数；
+      auto先尝试调色板PNG（颜色较少的卡片通常最小且文字清晰），超出目标大小时改用JPEG
+    - 不保留EXIF、ICC、PNG文本等元数据
+    """
+
+    def __init__(self, max_pixels=2000000, target_bytes=300 * 1024, image_format="auto", min_quality=40, max_quality=90):
+        self.max_pixels = max_pixels
+        self.target_bytes = target_bytes
+        self.image_format = "jpeg" if image_format.lower() == "jpg" else image_format.lower()
+        if self.image_format == "webp" and not features.check("webp"):
+            logger.warning("[ReadBrief] 当前Pillow不支持WebP，卡片改用JPEG编码")
+            self.image_format = "jpeg"
+        self.min_quality = min_quality
+        self.max_quality = max_quality
+
+    def optimize(self, data):
+        """处理已编码的图片（如卡片API的返回），返回重新编码后的字节"""
+        with Image.open(BytesIO(data)) as image:
+            image.load()
+            return self.encode(image)
+
+    def encode(self, image):
+        """缩小并编码PIL图片，本地渲染卡片时直接使用"""
+        image = self._prepare(image)
+        if self.image_format == "auto":
+            data = self._save(image.quantize(colors=PNG_COLORS[0], method=Image.FASTOCTREE), format="PNG")
+            if len(data) <= self.target_bytes:
+                return data
+        elif self.image_format == "png":
+            for colors in PNG_COLORS:
+                data = self._save(image.quantize(colors=colors, method=Image.FASTOCTREE), format="PNG")
+                if len(data) <= self.target_bytes:
+                    break
+            return data
+
+        options = {"format": "WEBP", "method": 4} if self.image_format == "webp" else \
+            {"format": "JPEG", "optimize": True, "progressive": True}
+        data = self._save(image, quality=self.max_quality, **options)
+        if len(data) <= self.target_bytes:
+            return data
+        # 二分查找满足目标大小的最高质量，仍然超出时使用最低质量
+        best = None
+        low, high = self.min_quality, self.max_quality - 1
+        while low <= high:
+            quality = (low + high) // 2
+            candidate = self._save(image, quality=quality, **options)
+            if len(candidate) <= self.target_bytes:
+                best = candidate
+                low = quality + 1
+            else:
+                data = candidate
+                high = quality - 1
+        return best or data
+
+    def _prepare(self, image):
+        """转换为RGB（透明部分以白色填充），按像素预算缩小，并去掉元数据"""
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, (255, 255, 255))
+            image.paste(rgba, mask=rgba.split()[3])
+        else:
+            image = image.convert("RGB")
+        width, height = image.size
+        if width * height > self.max_pixels:
+            ratio = math.sqrt(self.max_pixels / float(width * height))
+            size = (max(1, int(width * ratio)), max(1, int(height * ratio)))
+            image = image.resize(size, Image.LANCZOS, reducing_gap=2.0)
+        image.info = {}
+        return image
+
+    @staticmethod
+    def _save(image, **options):
+        output = BytesIO()
+        image.save(output, **options)
+        return output.getvalue()
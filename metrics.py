@@ -0,0 +1,239 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common.log import logger
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# 耗时直方图分桶（秒）
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+# 字节数直方图分桶
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def resident_memory():
+    """返回进程当前的常驻内存（字节）；无法读取/proc时返回峰值内存，均不可用时返回0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError, IndexError):
+        pass
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS的单位为字节，其他系统为KB
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class Trace:
+    """单个请求的分阶段耗时记录"""
+
+    def __init__(self, kind, target=""):
+        self.kind = kind
+        self.target = target
+        self.started_at = time.monotonic()
+        self.stages = []
+        self.fields = {}
+        self.result = "ok"
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def summary(self):
+        total = time.monotonic() - self.started_at
+        parts = [f"总计={total:.2f}s"]
+        for name, seconds, fields in self.stages:
+            extra = ",".join(f"{k}={v}" for k, v in fields.items())
+            parts.append(f"{name}={seconds:.2f}s" + (f"({extra})" if extra else ""))
+        parts += [f"{k}={v}" for k, v in self.fields.items()]
+        return " ".join(parts)
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+
+class Metrics:
+    """
+    请求耗时统计
+
+    记录每个请求在抓取、大模型、解析、格式化和卡片各阶段的耗时、字节数和token数，
+    汇总为直方图和计数器，以Prometheus文本格式通过HTTP端口或定时写入文件导出。
+    """
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._server = None
+
+    def observe(self, name, value, buckets=TIME_BUCKETS, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def add_collector(self, collect):
+        """注册导出时调用的函数，返回[(名称, 标签字典, 数值)]，用于导出缓存、队列等组件的即时状态"""
+        self._collectors.append(collect)
+
+    def current(self):
+        """当前线程正在记录的请求，没有时返回None"""
+        return getattr(self._local, "trace", None)
+
+    def annotate(self, **fields):
+        """为当前请求附加信息，如缓存是否命中"""
+        trace = self.current()
+        if trace:
+            trace.set(**fields)
+
+    @contextmanager
+    def trace(self, kind, target=""):
+        """记录一个请求，结束时输出各阶段耗时日志并计入请求耗时直方图"""
+        trace = Trace(kind, target)
+        previous = self.current()
+        self._local.trace = trace
+        try:
+            yield trace
+        except Exception:
+            trace.result = "error"
+            raise
+        finally:
+            self._local.trace = previous
+            self.observe("readbrief_request_seconds", time.monotonic() - trace.started_at,
+                         type=kind, result=trace.result)
+            logger.info(f"[ReadBrief] 耗时统计 {kind} {target} {trace.summary()}")
+
+    @contextmanager
+    def stage(self, name):
+        """记录一个阶段的耗时；yield的字典可填入bytes、prompt_tokens等信息"""
+        fields = {}
+        started_at = time.monotonic()
+        try:
+            yield fields
+        finally:
+            seconds = time.monotonic() - started_at
+            self.observe("readbrief_stage_seconds", seconds, stage=name)
+            if "bytes" in fields:
+                self.observe("readbrief_stage_bytes", fields["bytes"], buckets=SIZE_BUCKETS, stage=name)
+            for kind in ("prompt_tokens", "completion_tokens"):
+                if fields.get(kind):
+                    self.inc("readbrief_tokens_total", fields[kind], kind=kind.split("_")[0])
+            trace = self.current()
+            if trace:
+                trace.stages.append((name, seconds, fields))
+
+    def render(self):
+        """以Prometheus文本格式导出所有指标"""
+        lines = []
+        with self._lock:
+            histograms = sorted(self._histograms.items())
+            counters = sorted(self._counters.items())
+            histograms = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        typed = set()
+        for (name, labels), buckets, counts, total, count in histograms:
+            if name not in typed:
+                lines.append(f"# TYPE {name} histogram")
+                typed.add(name)
+            cumulative = 0
+            for bound, bucket_count in zip(buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{name}_bucket{_label_text(labels + (('le', bound),))} {cumulative}")
+            lines.append(f"{name}_bucket{_label_text(labels + (('le', '+Inf'),))} {count}")
+            lines.append(f"{name}_sum{_label_text(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_label_text(labels)} {count}")
+
+        for (name, labels), value in counters:
+            if name not in typed:
+                lines.append(f"# TYPE {name} counter")
+                typed.add(name)
+            lines.append(f"{name}{_label_text(labels)} {value}")
+
+        for collect in self._collectors:
+            try:
+                for name, labels, value in collect():
+                    if name not in typed:
+                        lines.append(f"# TYPE {name} gauge")
+                        typed.add(name)
+                    lines.append(f"{name}{_label_text(tuple(sorted(labels.items())))} {value}")
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 指标收集失败: {e}")
+        return "\n".join(lines) + "\n"
+
+    def start_server(self, port, host="127.0.0.1"):
+        """在后台线程中启动/metrics HTTP端口"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="ReadBrief-metrics", daemon=True).start()
+        logger.info(f"[ReadBrief] 指标导出地址: http://{host}:{port}/metrics")
+
+    def start_dump(self, path, interval):
+        """在后台线程中定时把指标写入文件"""
+        def dump():
+            while True:
+                time.sleep(interval)
+                try:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    tmp_path = path + ".tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(self.render())
+                    os.replace(tmp_path, path)
+                except Exception as e:
+                    logger.warning(f"[ReadBrief] 写入指标文件失败: {e}")
+
+        threading.Thread(target=dump, name="ReadBrief-metrics-dump", daemon=True).start()
+        logger.info(f"[ReadBrief] 每{interval}秒写入指标文件: {path}")
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+from common.log import logger
+
+from .url_router import route
+
+
+def _local_name(tag):
+    """去掉XML命名空间，{http://www.w3.org/2005/Atom}entry -> entry"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def parse_feed(content):
+    """从RSS 2.0/RSS 1.0/Atom订阅中按出现顺序提取文章链接"""
+    root = ET.fromstring(content)
+    links = []
+    for element in root.iter():
+        name = _local_name(element.tag)
+        if name == "item":
+            # RSS：<item><link>...</link></item>
+            for child in element:
+                if _local_name(child.tag) == "link" and (child.text or "").strip():
+                    links.append(child.text.strip())
+                    break
+        elif name == "entry":
+            # Atom：<entry><link rel="alternate" href="..."/></entry>，rel缺省即为alternate
+            for child in element:
+                if _local_name(child.tag) == "link" and child.get("href") and child.get("rel", "alternate") == "alternate":
+                    links.append(child.get("href").strip())
+                    break
+    return links
+
+
+class Prefetcher:
+    """
+    后台预取正文
+
+    定期读取RSS/Atom订阅和热门链接列表文件（每行一个链接，#开头为注释，每轮重新读取），
+    把正文缓存中没有或需要重新验证的文章提前下载并提取，用户分享时即可直接使用缓存。
+    订阅本身也使用ETag/Last-Modified条件请求，未更新时沿用上次的链接列表。
+    """
+
+    def __init__(self, fetch, cache, http, feeds=(), urls_file="", interval=1800, max_per_round=30, concurrency=2):
+        self.fetch = fetch
+        self.cache = cache
+        self.http = http
+        self.feeds = list(feeds)
+        self.urls_file = urls_file
+        self.interval = interval
+        self.max_per_round = max_per_round
+        self.concurrency = concurrency
+        # 订阅链接 -> (ETag, Last-Modified, 文章链接列表)
+        self._feed_state = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {"rounds": 0, "fetched": 0, "skipped": 0, "failed": 0}
+        self._lock = threading.Lock()
+
+    def stats(self):
+        """返回预取轮数和成功、跳过、失败的文章数"""
+        with self._lock:
+            return dict(self._stats)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="readbrief-prefetch", daemon=True)
+        self._thread.start()
+        logger.info(f"[ReadBrief] 后台预取已启动: {len(self.feeds)}个订阅，间隔{self.interval}秒")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(f"[ReadBrief] 后台预取失败: {e}")
+            self._stop.wait(self.interval)
+
+    def run_once(self):
+        """执行一轮预取，返回本轮成功写入缓存的文章数"""
+        urls = self.collect_urls()
+        started_at = time.monotonic()
+
+        def prefetch(url):
+            try:
+                ok = bool(self.fetch(url))
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 预取失败 {url}: {e}")
+                ok = False
+            # 各工作线程同时计数，collect_metrics也会同时读取
+            self._count("fetched" if ok else "failed")
+            return ok
+
+        fetched = 0
+        if urls:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(urls))) as executor:
+                fetched = sum(executor.map(prefetch, urls))
+        self._count("rounds")
+        logger.info(f"[ReadBrief] 预取完成: {fetched}/{len(urls)}篇，耗时{time.monotonic() - started_at:.1f}秒")
+        return fetched
+
+    def collect_urls(self):
+        """汇总本轮需要预取的链接：去重、跳过不支持的链接和缓存仍有效的文章，最多max_per_round个"""
+        candidates = self.read_urls_file()
+        for feed in self.feeds:
+            try:
+                candidates.extend(self.read_feed(feed))
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 读取订阅失败 {feed}: {e}")
+
+        urls = []
+        seen = set()
+        for url in candidates:
+            target = route(url)
+            if target.unsupported or target.key in seen:
+                continue
+            seen.add(target.key)
+            if self.cache.is_fresh(target.url):
+                self._count("skipped")
+                continue
+            urls.append(target.url)
+            if len(urls) >= self.max_per_round:
+                break
+        return urls
+
+    def read_urls_file(self):
+        if not self.urls_file or not os.path.exists(self.urls_file):
+            return []
+        with open(self.urls_file, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip().startswith(("http://", "https://"))]
+
+    def read_feed(self, feed):
+        etag, last_modified, links = self._feed_state.get(feed, ("", "", []))
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        response = self.http.get(feed, "feed", headers=headers)
+        if response.status_code == 304:
+            return list(links)
+        response.raise_for_status()
+        links = parse_feed(response.content)
+        self._feed_state[feed] = (response.headers.get("ETag", ""), response.headers.get("Last-Modified", ""), links)
+        return list(links)
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from common.log import logger
+
+from .summary_model import StreamingFieldParser, Summary
+
+
+class ProgressiveReply:
+    """
+    渐进式回复
+
+    接收大模型的流式输出并增量解析摘要JSON，fields中的字段一完成就格式化后发送，不必等待整个生成和卡片渲染结束。
+    相邻两条消息至少间隔min_interval秒，间隔内完成的字段合并到下一条一起发送，避免刷屏；
+    close后仍未发送的内容直接丢弃，由调用方发送的最终回复（卡片或完整文本）包含这些内容。
+    """
+
+    def __init__(self, send, format_field, fields=("summary", "key_points"), min_interval=1.5):
+        self.parser = StreamingFieldParser()
+        self.send = send
+        self.format_field = format_field
+        self.fields = fields
+        self.min_interval = min_interval
+        # 已发送的字段，最终回复中可省略
+        self.sent_fields = []
+        self.first_sent_at = None
+        self._queued = set()
+        self._pending = []
+        self._last_sent = None
+        self._timer = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def on_delta(self, delta):
+        """大模型流式输出的回调"""
+        completed = self.parser.feed(delta)
+        names = [name for name in self.fields if name in completed and name not in self._queued]
+        if not names:
+            return
+        summary = Summary.from_dict(self.parser.fields)
+        with self._lock:
+            if self._closed:
+                return
+            for name in names:
+                self._queued.add(name)
+                text = self.format_field(name, summary)
+                if text:
+                    self._pending.append((name, text))
+            batch = self._take()
+        self._send(batch)
+
+    def on_restart(self):
+        """切换大模型服务时丢弃不完整的输出，已发送的字段不再重复发送"""
+        self.parser.reset()
+
+    def close(self):
+        """停止发送，返回已发送的字段"""
+        with self._lock:
+            self._closed = True
+            self._pending = []
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        return self.sent_fields
+
+    def _take(self):
+        """取出可立即发送的内容；距上条消息不足min_interval时启动定时器稍后发送。调用时需持有锁"""
+        if not self._pending or self._timer:
+            return []
+        now = time.monotonic()
+        wait = 0 if self._last_sent is None else self._last_sent + self.min_interval - now
+        if wait > 0:
+            self._timer = threading.Timer(wait, self._on_timer)
+            self._timer.daemon = True
+            self._timer.start()
+            return []
+        batch, self._pending = self._pending, []
+        self._last_sent = now
+        if self.first_sent_at is None:
+            self.first_sent_at = now
+        self.sent_fields.extend(name for name, _ in batch)
+        return batch
+
+    def _on_timer(self):
+        with self._lock:
+            self._timer = None
+            batch = [] if self._closed else self._take()
+        self._send(batch)
+
+    def _send(self, batch):
+        if not batch:
+            return
+        try:
+            self.send("\n\n".join(text for _, text in batch))
+        except Exception as e:
+            logger.warning(f"[ReadBrief] 发送部分摘要失败: {e}")
@@ -0,0 +1,342 @@
+import json
+import threading
+import time
+
+from common.log import logger
+
+
+class ProviderError(Exception):
+    """大模型服务调用失败"""
+
+
+class ProviderTimeout(ProviderError):
+    """首个token或整体生成超时，生成被提前中断"""
+
+
+class ProviderUnavailable(ProviderError):
+    """服务熔断中，未发起调用"""
+
+
+class CompletionResult:
+    """一次大模型调用的结果"""
+
+    __slots__ = ("text", "provider", "model", "ttft", "elapsed", "usage")
+
+    def __init__(self, text, provider, model, ttft, elapsed, usage=None):
+        self.text = text
+        self.provider = provider
+        self.model = model
+        self.ttft = ttft
+        self.elapsed = elapsed
+        self.usage = usage or {}
+
+
+class LLMProvider:
+    """
+    大模型服务基类
+
+    子类只需负责构造请求和解析流式/非流式响应，超时中断、耗时统计由基类统一处理。
+    """
+
+    name = ""
+
+    def __init__(self, http, model, stream=True, first_token_timeout=20, max_generation_time=90):
+        self.http = http
+        self.model = model
+        self.stream = stream
+        self.first_token_timeout = first_token_timeout
+        self.max_generation_time = max_generation_time
+
+    def build_request(self, messages, max_tokens, temperature, stream, json_mode=False):
+        """返回(url, headers, data)，json_mode为True时要求模型输出JSON"""
+        raise NotImplementedError
+
+    def parse_response(self, data):
+        """从非流式响应中返回(文本, 用量)"""
+        raise NotImplementedError
+
+    def parse_chunk(self, data):
+        """从一个流式数据块中返回(增量文本, 用量)"""
+        raise NotImplementedError
+
+    def complete(self, messages, max_tokens=1000, temperature=0.7, on_delta=None, json_mode=False):
+        """发送对话消息并返回CompletionResult，on_delta在流式模式下接收每段增量文本"""
+        import requests
+
+        url, headers, data = self.build_request(messages, max_tokens, temperature, self.stream, json_mode)
+        start = time.monotonic()
+        if not self.stream:
+            response = self.http.post(url, self.name, retries=0, headers=headers, json=data)
+            self._raise_for_status(response)
+            text, usage = self.parse_response(response.json())
+            elapsed = time.monotonic() - start
+            return CompletionResult(text, self.name, self.model, elapsed, elapsed, usage)
+
+        # 流式请求的读取超时即为首个token超时，同时限制数据块之间的最大间隔；
+        # 超时、限流和5xx都不在此重试，由ProviderRouter立即切换到下一个服务并计入熔断器
+        connect_timeout = self.http.timeouts.get(self.name, self.http.timeouts["default"])[0]
+        response = self.http.post(url, self.name, retries=0, headers=headers, json=data, stream=True,
+                                  timeout=(connect_timeout, self.first_token_timeout))
+        self._raise_for_status(response)
+        parts = []
+        usage = {}
+        ttft = None
+        try:
+            for raw in response.iter_lines():
+                # SSE响应通常不声明charset，按UTF-8解码避免中文乱码
+                line = raw.decode("utf-8", errors="replace") if raw else ""
+                if not line.startswith("data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == "[DONE]":
+                    break
+                delta, chunk_usage = self.parse_chunk(json.loads(payload))
+                if chunk_usage:
+                    usage = chunk_usage
+                elapsed = time.monotonic() - start
+                if delta:
+                    if ttft is None:
+                        ttft = elapsed
+                    parts.append(delta)
+                    if on_delta:
+                        on_delta(delta)
+                if ttft is None and elapsed > self.first_token_timeout:
+                    raise ProviderTimeout(f"{self.name}首个token超时: {elapsed:.1f}s")
+                if elapsed > self.max_generation_time:
+                    raise ProviderTimeout(f"{self.name}生成超时: {elapsed:.1f}s")
+        except requests.exceptions.RequestException as e:
+            raise ProviderTimeout(f"{self.name}流式读取中断: {e}")
+        finally:
+            response.close()
+        if not parts:
+            raise ProviderError(f"{self.name}返回内容为空")
+        return CompletionResult("".join(parts), self.name, self.model, ttft, time.monotonic() - start, usage)
+
+    def _raise_for_status(self, response):
+        if response.status_code >= 400:
+            body = response.text[:200]
+            response.close()
+            raise ProviderError(f"{self.name}返回{response.status_code}: {body}")
+
+
+class OpenAIProvider(LLMProvider):
+    """OpenAI及兼容接口"""
+
+    name = "openai"
+
+    def __init__(self, http, api_key, api_base, model, **kwargs):
+        super().__init__(http, model, **kwargs)
+        self.api_key = api_key
+        self.api_base = api_base.rstrip("/")
+
+    def endpoint(self):
+        return f"{self.api_base}/chat/completions"
+
+    def headers(self):
+        return {
+            'Content-Type': 'application/json',
+            'Authorization': f'Bearer {self.api_key}'
+        }
+
+    def build_request(self, messages, max_tokens, temperature, stream, json_mode=False):
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
+        if stream:
+            data["stream"] = True
+            data["stream_options"] = {"include_usage": True}
+        return self.endpoint(), self.headers(), data
+
+    def parse_response(self, data):
+        return data["choices"][0]["message"]["content"], self._usage(data.get("usage"))
+
+    def parse_chunk(self, data):
+        choices = data.get("choices") or []
+        delta = choices[0].get("delta", {}).get("content") if choices else None
+        return delta, self._usage(data.get("usage"))
+
+    @staticmethod
+    def _usage(usage):
+        if not usage:
+            return {}
+        return {
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+        }
+
+
+class AzureProvider(OpenAIProvider):
+    """Azure OpenAI"""
+
+    name = "azure"
+
+    def __init__(self, http, api_key, api_base, deployment_id, api_version="2023-05-15", **kwargs):
+        super().__init__(http, api_key, api_base, deployment_id, **kwargs)
+        self.api_version = api_version
+
+    def endpoint(self):
+        return f"{self.api_base}/openai/deployments/{self.model}/chat/completions?api-version={self.api_version}"
+
+    def headers(self):
+        return {
+            'Content-Type': 'application/json',
+            'api-key': self.api_key
+        }
+
+    def build_request(self, messages, max_tokens, temperature, stream, json_mode=False):
+        data = {
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens
+        }
+        # response_format需要2023-12-01-preview及以上的api-version
+        if json_mode:
+            data["response_format"] = {"type": "json_object"}
+        if stream:
+            data["stream"] = True
+        return self.endpoint(), self.headers(), data
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini"""
+
+    name = "gemini"
+    api_base = "https://generativelanguage.googleapis.com/v1beta/models"
+
+    def __init__(self, http, api_key, model="gemini-1.5-flash", **kwargs):
+        super().__init__(http, model, **kwargs)
+        self.api_key = api_key
+
+    def build_request(self, messages, max_tokens, temperature, stream, json_mode=False):
+        # Gemini使用systemInstruction传递系统提示词，assistant角色对应model
+        system = [m["content"] for m in messages if m["role"] == "system"]
+        contents = [
+            {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+            for m in messages if m["role"] != "system"
+        ]
+        data = {
+            "contents": contents,
+            "generationConfig": {
+                "temperature": temperature,
+                "maxOutputTokens": max_tokens
+            }
+        }
+        if json_mode:
+            data["generationConfig"]["responseMimeType"] = "application/json"
+        if system:
+            data["systemInstruction"] = {"parts": [{"text": "\n\n".join(system)}]}
+        if stream:
+            url = f"{self.api_base}/{self.model}:streamGenerateContent?alt=sse&key={self.api_key}"
+        else:
+            url = f"{self.api_base}/{self.model}:generateContent?key={self.api_key}"
+        return url, {'Content-Type': 'application/json'}, data
+
+    def parse_response(self, data):
+        return self._text(data), self._usage(data.get("usageMetadata"))
+
+    def parse_chunk(self, data):
+        return self._text(data), self._usage(data.get("usageMetadata"))
+
+    @staticmethod
+    def _text(data):
+        candidates = data.get("candidates") or []
+        if not candidates:
+            return ""
+        parts = candidates[0].get("content", {}).get("parts") or []
+        return "".join(part.get("text", "") for part in parts)
+
+    @staticmethod
+    def _usage(usage):
+        if not usage:
+            return {}
+        return {
+            "prompt_tokens": usage.get("promptTokenCount", 0),
+            "completion_tokens": usage.get("candidatesTokenCount", 0),
+        }
+
+
+class ProviderRouter:
+    """
+    按配置顺序调用大模型服务
+
+    当前服务超时、限流或出错时自动切换到下一个服务，并统计各服务的调用次数、失败次数和首token耗时。
+    breakers为按服务名的熔断器，熔断中的服务直接跳过，所有服务均熔断时立即失败而不等待超时；
+    首token耗时计入熔断器的慢调用判断。
+    """
+
+    def __init__(self, providers, breakers=None):
+        if not providers:
+            raise ValueError("没有可用的大模型服务")
+        self.providers = providers
+        self.breakers = breakers or {}
+        self._stats = {p.name: {"calls": 0, "failures": 0, "ttft_total": 0.0} for p in providers}
+        self._lock = threading.Lock()
+
+    @property
+    def primary(self):
+        return self.providers[0]
+
+    def complete(self, messages, max_tokens=1000, temperature=0.7, on_delta=None, json_mode=False, on_restart=None):
+        """
+        依次尝试各服务，返回第一个成功的结果；
+        某个服务已输出部分增量文本后失败时，切换前调用on_restart，便于流式消费者丢弃不完整的输出
+        """
+        import requests
+
+        last_error = None
+        attempted = False
+        for provider in self.providers:
+            breaker = self.breakers.get(provider.name)
+            if breaker and not breaker.allow():
+                last_error = ProviderUnavailable(f"{provider.name}熔断中")
+                logger.info(f"[ReadBrief] {provider.name}熔断中，跳过该服务")
+                continue
+            attempted = True
+            emitted = []
+
+            def delta(text):
+                if not emitted:
+                    emitted.append(True)
+                on_delta(text)
+
+            try:
+                result = provider.complete(messages, max_tokens, temperature, delta if on_delta else None, json_mode)
+            except (ProviderError, requests.exceptions.RequestException, ValueError, KeyError) as e:
+                last_error = e
+                if breaker:
+                    breaker.record(False)
+                with self._lock:
+                    self._stats[provider.name]["calls"] += 1
+                    self._stats[provider.name]["failures"] += 1
+                logger.warning(f"[ReadBrief] {provider.name}调用失败，尝试下一个服务: {e}")
+                if emitted and on_restart:
+                    on_restart()
+                continue
+            if breaker:
+                breaker.record(True, result.ttft or 0.0)
+            with self._lock:
+                self._stats[provider.name]["calls"] += 1
+                self._stats[provider.name]["ttft_total"] += result.ttft or 0.0
+            logger.info(f"[ReadBrief] {provider.name}生成完成，首token {result.ttft or 0:.2f}s，总耗时 {result.elapsed:.2f}s")
+            return result
+        if not attempted:
+            raise ProviderUnavailable("所有大模型服务均熔断中，暂停调用")
+        raise ProviderError(f"所有大模型服务均调用失败: {last_error}")
+
+    def stats(self):
+        """返回各服务的调用统计"""
+        with self._lock:
+            result = {}
+            for name, s in self._stats.items():
+                succeeded = s["calls"] - s["failures"]
+                result[name] = {
+                    "calls": s["calls"],
+                    "failures": s["failures"],
+                    "avg_ttft": round(s["ttft_total"] / succeeded, 3) if succeeded else 0.0,
+                }
+            return result
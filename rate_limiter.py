@@ -0,0 +1,91 @@
+import threading
+import time
+
+from common.expired_dict import ExpiredDict
+
+
+class TokenBucket:
+    """令牌桶：rate为每秒补充的令牌数，capacity为最大突发数"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated_at = time.monotonic() if now is None else now
+
+    def delay(self, now):
+        """获取一个令牌需要等待的秒数"""
+        # 调用方的now可能早于桶的创建时间，不能让经过时间为负
+        elapsed = max(0.0, now - self.updated_at)
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+        self.updated_at = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        """扣除一个令牌，余额可以为负，表示预约了未来的令牌"""
+        self.tokens -= 1
+
+
+class RateLimiter:
+    """
+    按用户、群聊和全局三级令牌桶限流
+
+    每级配置为每分钟允许的请求数，0表示不限制。acquire返回需要等待的秒数：
+    不超过max_delay时预约令牌并返回等待时间，超过时不扣令牌并返回None。
+    """
+
+    def __init__(self, user_per_minute=0, group_per_minute=0, global_per_minute=0, idle_seconds=600):
+        self.limits = {
+            "user": user_per_minute,
+            "group": group_per_minute,
+            "global": global_per_minute,
+        }
+        # 空闲的令牌桶会自动过期，避免按用户无限增长
+        self._buckets = ExpiredDict(idle_seconds)
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.delayed = 0
+        self.rejected = 0
+
+    def enabled(self):
+        return any(self.limits.values())
+
+    def _bucket(self, level, key, now):
+        per_minute = self.limits[level]
+        if not per_minute:
+            return None
+        bucket_key = f"{level}:{key}"
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            # 突发容量为每分钟限额，最少为1
+            bucket = TokenBucket(per_minute / 60.0, max(1, per_minute), now)
+        self._buckets[bucket_key] = bucket
+        return bucket
+
+    def acquire(self, user_id, group_id=None, max_delay=0.0):
+        """申请一次请求额度，返回等待秒数，超出max_delay时返回None"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = [self._bucket("user", user_id, now), self._bucket("global", "", now)]
+            if group_id:
+                buckets.append(self._bucket("group", group_id, now))
+            buckets = [b for b in buckets if b is not None]
+            delay = max([b.delay(now) for b in buckets] or [0.0])
+            if delay > max_delay:
+                self.rejected += 1
+                return None
+            for bucket in buckets:
+                bucket.take()
+            if delay > 0:
+                self.delayed += 1
+            else:
+                self.allowed += 1
+            return delay
+
+    def stats(self):
+        with self._lock:
+            return {"allowed": self.allowed, "delayed": self.delayed, "rejected": self.rejected}
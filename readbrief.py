@@ -1,7 +1,12 @@
-import requests
 import json
-import re
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import resident_memory
+# 记录模块开始加载的时间和内存，初始化完成时输出插件加载的总耗时和内存增长
+_LOAD_STARTED = time.perf_counter()
+_LOAD_RSS = resident_memory()
 import plugins
 from bridge.reply import Reply, ReplyType
 from bridge.context import ContextType
@@ -9,12 +14,55 @@ from channel.chat_message import ChatMessage
 from plugins import *
 from common.log import logger
 from common.expired_dict import ExpiredDict
-from bs4 import BeautifulSoup
-from PIL import Image
-import base64
 import html
 from io import BytesIO
-import jina
+from .summary_cache import SummaryCache, make_cache_key, make_config_hash
+from .article_cache import ArticleCache
+from .card_cache import CardCache, make_card_key
+from .dedup import DuplicateDetector
+from .archive import SummaryArchive
+from .prefetcher import Prefetcher
+from .worker_pool import WorkerPool
+from .rate_limiter import RateLimiter
+from .metrics import Metrics
+from .http_client import HttpClient
+from .providers import AzureProvider, GeminiProvider, OpenAIProvider, ProviderRouter, ProviderUnavailable
+from .circuit_breaker import STATE_VALUES, CircuitBreaker
+from .chunking import ArticleSummarizer, mark_partial, warm_up_tokenizer
+from .fetcher import ContentRejected, StreamingFetcher
+from .singleflight import SingleFlight
+from .summary_model import Summary, SummaryParser
+from .digest import DigestSummarizer
+from .url_router import FETCH_JINA, canonicalize, extract_urls, leading_url, route
+from .session_store import MemorySessionStore, Session, SQLiteSessionStore, create_session_store
+from .settings import Settings
+from .progressive import ProgressiveReply
+
+# 追问时作为上下文的正文最大字符数
+QA_ARTICLE_MAX_CHARS = 8000
+# 正文提取结果少于该字数时视为提取失败
+MIN_ARTICLE_CHARS = 100
+FETCH_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+
+_jina_document = None
+
+
+def jina_document():
+    """返回jina.Document，首次回退到jina时才导入：该包加载耗时数秒并占用大量内存"""
+    global _jina_document
+    if _jina_document is None:
+        from jina import Document
+        _jina_document = Document
+    return _jina_document
+
+
+def format_duration(seconds):
+    """把配置中的秒数格式化为回复中的时长：整分钟显示为分钟，否则显示为秒"""
+    seconds = int(round(seconds))
+    if seconds >= 60 and seconds % 60 == 0:
+        return f"{seconds // 60}分钟"
+    return f"{seconds}秒"
+
 
 @plugins.register(
     name="readbrief",
@@ -37,7 +85,8 @@ class ReadBrief(Plugin):
         try:
             # 加载配置
             curdir = os.path.dirname(__file__)
-            config_path = os.path.join(curdir, "config.json")
+            # READBRIEF_CONFIG可指定其他配置文件，如压测时使用的配置
+            config_path = os.environ.get("READBRIEF_CONFIG") or os.path.join(curdir, "config.json")
             if os.path.exists(config_path):
                 with open(config_path, "r", encoding="utf-8") as f:
                     self.config = json.load(f)
@@ -49,37 +98,259 @@ class ReadBrief(Plugin):
                     
             # 设置事件处理函数
             self.handlers[Event.ON_HANDLE_CONTEXT] = self.on_handle_context
-            self.params_cache = ExpiredDict(300)  # 设置5分钟过期的缓存
-            
-            # 从配置中提取所需的设置
-            self.readbrief = self.config.get("readbrief", {})
-            self.keys = self.config.get("keys", {})
-            
-            # ReadBrief相关配置
-            self.enabled = self.readbrief.get("enabled", False)
-            self.service = self.readbrief.get("service", "gpt-3.5-turbo")
-            self.group = self.readbrief.get("group", True)
-            self.qa_enabled = self.readbrief.get("qa_enabled", True)
-            self.qa_prefix = self.readbrief.get("qa_prefix", "问")
-            self.prompt = self.readbrief.get("prompt", "")
-            self.card_enabled = self.readbrief.get("card_enabled", True)
-            self.card_api_url = self.readbrief.get("card_api_url", "https://fireflycard-api.302ai.cn/api/saveImg")
-            
-            # API密钥配置
-            self.open_ai_api_key = self.keys.get("open_ai_api_key", "")
-            self.model = self.keys.get("model", "gpt-3.5-turbo")
-            self.open_ai_api_base = self.keys.get("open_ai_api_base", "https://api.openai.com/v1")
-            self.gemini_key = self.keys.get("gemini_key", "")
-            self.azure_deployment_id = self.keys.get("azure_deployment_id", "")
-            self.azure_api_key = self.keys.get("azure_api_key", "")
-            self.azure_api_base = self.keys.get("azure_api_base", "")
-            
-            # 初始化成功日志
-            logger.info("[ReadBrief] 初始化成功。")
+            
+            # 校验配置，之后所有配置项都从只读的self.settings读取
+            self.settings = Settings(self.config)
+            
+            # 卡片图片后处理：按像素预算缩小，按目标大小重新编码并去掉元数据
+            self.image_optimizer = None
+            if self.settings.card_enabled and self.settings.image_optimize_enabled:
+                # 只在需要处理卡片时才加载Pillow
+                from .image_pipeline import ImageOptimizer
+                self.image_optimizer = ImageOptimizer(
+                    max_pixels=self.settings.image_max_pixels,
+                    target_bytes=int(self.settings.image_target_kb * 1024),
+                    image_format=self.settings.image_format,
+                )
+            self.card_renderer = None
+            if self.settings.card_enabled and self.settings.card_renderer == "local":
+                from .card_renderer import CardRenderer
+                self.card_renderer = CardRenderer(
+                    font_path=self.settings.card_font_path,
+                    image_format=self.settings.card_image_format,
+                    encoder=self.image_optimizer.encode if self.image_optimizer else None,
+                )
+            
+            # 共享HTTP客户端
+            self.http = HttpClient(
+                timeouts=self.settings.http_timeouts,
+                max_retries=self.settings.http_max_retries,
+            )
+            
+            # 流式下载网页和PDF，正文足够或超过大小、时间上限时提前停止
+            self.fetcher = StreamingFetcher(
+                self.http,
+                max_bytes=int(self.settings.fetch_max_mb * 1024 * 1024),
+                max_seconds=self.settings.fetch_max_seconds,
+                stop_chars=self.settings.fetch_stop_chars,
+                pdf_enabled=self.settings.pdf_enabled,
+                pdf_max_bytes=int(self.settings.pdf_max_mb * 1024 * 1024),
+                pdf_max_pages=self.settings.pdf_max_pages,
+            )
+            
+            # 卡片接口和各大模型服务的熔断器：持续失败或过慢时暂停调用，卡片降级为文本，大模型切换到备用服务
+            self.card_breaker = None
+            if self.settings.circuit_enabled and self.settings.card_enabled and not self.card_renderer:
+                self.card_breaker = self.create_breaker("card", self.settings.circuit_card_slow_seconds)
+            
+            # 大模型服务，按failover顺序依次尝试
+            self.llm = self.build_llm_router()
+            
+            # 摘要解析，llm_json_mode启用时要求模型按JSON格式输出
+            self.summary_parser = SummaryParser()
+            
+            # 按token预算分块摘要
+            self.summarizer = ArticleSummarizer(
+                self.llm,
+                max_input_tokens=self.settings.max_input_tokens,
+                chunk_tokens=self.settings.chunk_tokens,
+                max_chunks=self.settings.max_chunks,
+                concurrency=self.settings.map_concurrency,
+            )
+            
+            # 汇总模式：一条消息中有多个链接，或发送汇总指令汇总最近收到的链接
+            self.digest_summarizer = DigestSummarizer(
+                self.llm, self.summary_parser,
+                max_input_tokens=self.settings.digest_max_input_tokens,
+                min_article_tokens=self.settings.digest_min_article_tokens,
+                concurrency=self.settings.map_concurrency,
+            )
+            self.recent_links = ExpiredDict(self.settings.digest_window)
+            
+            # 缓存目录，默认为插件目录下的cache
+            self.cache_dir = self.settings.cache_dir or os.path.join(curdir, "cache")
+            
+            # 追问会话存储，默认5分钟内有效，每次访问顺延
+            self.sessions = create_session_store(
+                backend=self.settings.session_backend,
+                ttl=self.settings.session_ttl,
+                max_entries=self.settings.session_max_entries,
+                path=os.path.join(self.cache_dir, "sessions.db"),
+                redis_url=self.settings.session_redis_url,
+            )
+            
+            # 卡片缓存：按卡片内容哈希保存最终图片，相同内容不再渲染和编码
+            self.card_cache = None
+            if self.settings.card_enabled and self.settings.card_cache_enabled:
+                self.card_cache = CardCache(
+                    os.path.join(self.cache_dir, "cards"),
+                    max_bytes=int(self.settings.card_cache_max_mb * 1024 * 1024),
+                )
+            # 渲染方式和后处理配置变化后，卡片缓存键随之变化
+            self.card_options = [self.settings.card_renderer, self.settings.card_api_scale, self.settings.card_image_format,
+                                 self.settings.image_optimize_enabled, self.settings.image_format,
+                                 self.settings.image_max_pixels, self.settings.image_target_kb]
+            
+            # 摘要缓存配置
+            self.summary_cache = None
+            if self.settings.cache_enabled:
+                self.summary_cache = SummaryCache(
+                    os.path.join(self.cache_dir, "summary.db"),
+                    ttl=self.settings.cache_ttl,
+                    max_entries=self.settings.cache_max_entries,
+                    max_bytes=self.settings.cache_max_mb * 1024 * 1024,
+                )
+            
+            # 正文缓存：保存提取后的正文，过期后按ETag/Last-Modified重新验证
+            self.article_cache = None
+            if self.settings.article_cache_enabled:
+                self.article_cache = ArticleCache(
+                    os.path.join(self.cache_dir, "articles.db"),
+                    fresh_ttl=self.settings.article_cache_fresh,
+                    ttl=self.settings.article_cache_ttl,
+                    max_entries=self.settings.article_cache_max_entries,
+                    max_bytes=self.settings.article_cache_max_mb * 1024 * 1024,
+                )
+            
+            # 近似重复检测：转载或镜像的文章复用已有摘要，需要摘要缓存
+            self.dedup = None
+            if self.summary_cache and self.settings.dedup_enabled:
+                self.dedup = DuplicateDetector(
+                    os.path.join(self.cache_dir, "dedup.db"),
+                    threshold=min(self.settings.dedup_threshold, 1.0),
+                    ttl=self.settings.dedup_ttl,
+                    max_entries=self.settings.dedup_max_entries,
+                    min_chars=self.settings.dedup_min_chars,
+                )
+            
+            # 摘要归档：长期保存生成过的摘要，可按关键词和标签检索；摘要缓存未命中时复用配置相同且未过期的归档
+            self.archive = None
+            if self.settings.archive_enabled:
+                try:
+                    self.archive = SummaryArchive(os.path.join(self.cache_dir, "archive.db"))
+                except Exception as e:
+                    logger.warning(f"[ReadBrief] 摘要归档不可用（需要SQLite的FTS5扩展）: {e}")
+            self.archive_reuse = self.archive is not None and self.settings.archive_reuse
+            
+            # 合并相同链接的并发请求
+            self.inflight = SingleFlight(timeout=self.settings.coalesce_wait)
+            
+            # 异步处理配置
+            self.worker_pool = None
+            if self.settings.async_enabled:
+                self.worker_pool = WorkerPool(
+                    max_workers=self.settings.async_workers,
+                    queue_size=self.settings.async_queue_size,
+                )
+            
+            # 限流配置：按用户、群聊和全局每分钟请求数
+            self.rate_limiter = RateLimiter(
+                user_per_minute=self.settings.rate_limit_user,
+                group_per_minute=self.settings.rate_limit_group,
+                global_per_minute=self.settings.rate_limit_global,
+            )
+            
+            # 分阶段耗时统计，可通过HTTP端口或定时写入文件导出
+            self.load_seconds = 0.0
+            self.metrics = Metrics()
+            self.metrics.add_collector(self.collect_metrics)
+            metrics_port = self.settings.metrics_port
+            if metrics_port:
+                self.metrics.start_server(metrics_port, self.settings.metrics_host)
+            metrics_dump_interval = self.settings.metrics_dump_interval
+            if metrics_dump_interval:
+                self.metrics.start_dump(os.path.join(self.cache_dir, "metrics.prom"), metrics_dump_interval)
+            
+            # 后台预取：从订阅和热门链接列表提前抓取正文写入正文缓存
+            self.prefetcher = None
+            prefetch_feeds = self.settings.prefetch_feeds
+            prefetch_urls_file = self.settings.prefetch_urls_file
+            if self.article_cache and (prefetch_feeds or prefetch_urls_file):
+                self.prefetcher = Prefetcher(
+                    self.prefetch_article, self.article_cache, self.http,
+                    feeds=prefetch_feeds,
+                    urls_file=prefetch_urls_file,
+                    interval=self.settings.prefetch_interval,
+                    max_per_round=self.settings.prefetch_max_per_round,
+                    concurrency=self.settings.prefetch_concurrency,
+                )
+                self.prefetcher.start()
+            
+            # 后台预热分词器和卡片字体，首个请求不必等待加载
+            if self.settings.warmup_enabled:
+                threading.Thread(target=self.warm_up, name="readbrief-warmup", daemon=True).start()
+            
+            # 初始化成功日志，包含插件加载耗时和内存增长
+            self.load_seconds = time.perf_counter() - _LOAD_STARTED
+            rss = resident_memory()
+            logger.info(f"[ReadBrief] 初始化成功。加载耗时{self.load_seconds:.2f}秒，"
+                        f"常驻内存{rss / 1048576:.1f}MB，其中插件加载增加{(rss - _LOAD_RSS) / 1048576:.1f}MB")
         except Exception as e:
             # 初始化失败日志
             logger.warn(f"ReadBrief初始化失败: {e}")
             
+    def warm_up(self):
+        """预热首个请求会用到的requests、分词器和本地卡片字体；jina只在回退时才加载"""
+        started_at = time.perf_counter()
+        try:
+            self.http.session  # 导入requests并创建Session
+            warm_up_tokenizer(self.get_model_name())
+            if self.card_renderer:
+                self.card_renderer.render("预热", "预热")
+        except Exception as e:
+            logger.warning(f"[ReadBrief] 预热失败: {e}")
+            return
+        logger.info(f"[ReadBrief] 预热完成，耗时{time.perf_counter() - started_at:.2f}秒")
+            
+    def build_llm_router(self):
+        """根据配置创建大模型服务路由，首选service，其余按failover顺序"""
+        options = {
+            "stream": self.settings.llm_stream,
+            "first_token_timeout": self.settings.llm_first_token_timeout,
+            "max_generation_time": self.settings.llm_max_generation_time,
+        }
+        primary = self.settings.service if self.settings.service in ("gemini", "azure") else "openai"
+        order = [primary] + [name for name in self.settings.failover if name != primary]
+        
+        providers = []
+        for name in order:
+            # 首选服务总是启用，备用服务未配置密钥时跳过
+            if name == "openai" and (self.settings.open_ai_api_key or name == primary):
+                providers.append(OpenAIProvider(self.http, self.settings.open_ai_api_key, self.settings.open_ai_api_base, self.settings.model, **options))
+            elif name == "azure" and (self.settings.azure_api_key or name == primary):
+                providers.append(AzureProvider(self.http, self.settings.azure_api_key, self.settings.azure_api_base, self.settings.azure_deployment_id,
+                                               api_version=self.settings.azure_api_version, **options))
+            elif name == "gemini" and (self.settings.gemini_key or name == primary):
+                providers.append(GeminiProvider(self.http, self.settings.gemini_key, self.settings.gemini_model, **options))
+            else:
+                logger.warning(f"[ReadBrief] 未配置{name}的密钥或服务名无效，跳过该服务")
+        logger.info(f"[ReadBrief] 大模型服务顺序: {[p.name for p in providers]}")
+        breakers = None
+        if self.settings.circuit_enabled:
+            breakers = {p.name: self.create_breaker(p.name, self.settings.circuit_llm_slow_seconds) for p in providers}
+        return ProviderRouter(providers, breakers)
+        
+    def create_breaker(self, name, slow_seconds):
+        """按熔断配置创建一个依赖的熔断器"""
+        return CircuitBreaker(
+            name,
+            window=self.settings.circuit_window,
+            min_requests=self.settings.circuit_min_requests,
+            error_rate=self.settings.circuit_error_rate,
+            slow_seconds=slow_seconds,
+            open_seconds=self.settings.circuit_open_seconds,
+            on_change=self.on_circuit_change,
+        )
+        
+    def on_circuit_change(self, name, previous, state, reason):
+        """记录熔断器状态变化"""
+        message = f"[ReadBrief] {name}熔断器: {previous} -> {state}，{reason}"
+        if state == "open":
+            logger.warning(message + ("，卡片降级为文本回复" if name == "card" else "，暂停调用该服务"))
+        else:
+            logger.info(message)
+        self.metrics.inc("readbrief_circuit_transitions", dependency=name, state=state)
+        
     def on_handle_context(self, e_context: EventContext):
         """处理上下文事件的主函数"""
         context = e_context["context"]
@@ -89,7 +360,7 @@ class ReadBrief(Plugin):
             return
             
         # 如果插件未启用，直接返回
-        if not self.enabled:
+        if not self.settings.enabled:
             return
             
         msg: ChatMessage = e_context["context"]["msg"]
@@ -98,64 +369,166 @@ class ReadBrief(Plugin):
         isgroup = e_context["context"].get("isgroup", False)
         
         # 处理群聊和私聊的配置
-        if isgroup and not self.group:
+        if isgroup and not self.settings.group:
             return
             
-        # 更新URL匹配逻辑，支持完整的URL
-        url_match = re.match(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[^\s]*', content)
-        unsupported_urls = re.search(r'.*finder\.video\.qq\.com.*|.*support\.weixin\.qq\.com/update.*|.*support\.weixin\.qq\.com/security.*|.*mp\.weixin\.qq\.com/mp/waerrpage.*', content)
-        
         # 处理用户追问
-        if user_id in self.params_cache and 'last_url' in self.params_cache[user_id]:
-            # 用户发送追问
-            if content.startswith(self.qa_prefix) and self.qa_enabled:
+        if self.settings.qa_enabled and content.startswith(self.settings.qa_prefix):
+            session = self.sessions.get(user_id)
+            if session and session.last_url:
                 logger.info('内容以qa_prefix开头，处理追问')
                 # 去除关键词前缀
-                new_content = content[len(self.qa_prefix):]
-                self.params_cache[user_id]['prompt'] = new_content
-                logger.info('已更新用户提问')
-                self.handle_url(self.params_cache[user_id]['last_url'], e_context)
+                question = content[len(self.settings.qa_prefix):].strip()
+                self.dispatch(self.handle_question, question, e_context)
+                return
+                
+        # 检索摘要归档
+        if self.archive and content.startswith(self.settings.archive_prefix):
+            self.handle_search(content[len(self.settings.archive_prefix):].strip(), e_context)
+            return
+            
+        # 汇总多个链接
+        if self.settings.digest_enabled:
+            text = html.unescape(content) if context.type == ContextType.SHARING else content
+            digest_urls = self.collect_digest_urls(text, user_id)
+            if digest_urls is not None:
+                if not digest_urls:
+                    reply = Reply(ReplyType.TEXT, f"最近{format_duration(self.settings.digest_window)}内没有可汇总的链接")
+                    e_context["reply"] = reply
+                    e_context.action = EventAction.BREAK_PASS
+                    return
+                self.sessions.put(user_id, Session(last_url=digest_urls[0], prompt=self.settings.prompt))
+                logger.info(f"[ReadBrief] 汇总{len(digest_urls)}个链接")
+                self.dispatch(self.handle_digest, digest_urls, e_context)
                 return
                 
         # 处理链接分享
         if context.type == ContextType.SHARING:
-            content = html.unescape(content)
-            if unsupported_urls:  # 不支持的URL类型
+            link = route(html.unescape(content))
+            if link.unsupported:  # 不支持的URL类型
                 if not isgroup:  # 私聊回复不支持
                     logger.info("[ReadBrief] 不支持的URL : %s", content)
-                    reply = Reply(type=ReplyType.TEXT, content="不支持小程序和视频号")
+                    reply = Reply(type=ReplyType.TEXT, content=f"暂不支持{link.unsupported}链接")
                     e_context["reply"] = reply
                     e_context.action = EventAction.BREAK_PASS
             else:  # 支持的URL类型
-                # 更新params_cache中的last_url
-                self.params_cache[user_id] = {}
-                self.params_cache[user_id]['last_url'] = content
-                self.params_cache[user_id]['prompt'] = self.prompt
-                logger.info('[ReadBrief] 已更新last_url至params_cache')
-                self.handle_url(content, e_context)
-        
-        # 处理文本中可能包含的URL
-        elif url_match and not unsupported_urls:
-            url = url_match.group(0)
-            # 更新params_cache中的last_url
-            self.params_cache[user_id] = {}
-            self.params_cache[user_id]['last_url'] = url
-            self.params_cache[user_id]['prompt'] = self.prompt
-            logger.info('[ReadBrief] 已从文本中提取URL并更新至params_cache')
-            self.handle_url(url, e_context)
+                # 新建会话；抓取使用原始链接，缓存按规范化后的链接查找
+                self.sessions.put(user_id, Session(last_url=link.url, prompt=self.settings.prompt))
+                logger.info('[ReadBrief] 已更新会话中的last_url')
+                self.dispatch(self.handle_url, link.url, e_context)
+            return
+        
+        # 处理以URL开头的文本，普通文本不会进入正则匹配
+        url = leading_url(content)
+        if url:
+            link = route(url)
+            if link.unsupported:
+                return
+            # 新建会话
+            self.sessions.put(user_id, Session(last_url=link.url, prompt=self.settings.prompt))
+            logger.info('[ReadBrief] 已从文本中提取URL并更新会话')
+            self.dispatch(self.handle_url, link.url, e_context)
+            
+    def collect_digest_urls(self, text, session_id):
+        """
+        记录消息中的链接，供汇总指令使用；消息包含多个链接时返回这些链接，
+        消息为汇总指令时返回最近收到的链接（可能为空），其他情况返回None
+        """
+        if text.strip() == self.settings.digest_prefix:
+            cutoff = time.time() - self.settings.digest_window
+            return [url for received_at, url in self.recent_links.get(session_id, []) if received_at >= cutoff]
+            
+        urls = [url for url in extract_urls(text) if not route(url).unsupported]
+        if urls:
+            now = time.time()
+            keys = {canonicalize(url) for url in urls}
+            links = [item for item in self.recent_links.get(session_id, []) if canonicalize(item[1]) not in keys]
+            links += [(now, url) for url in urls]
+            self.recent_links[session_id] = links[-self.settings.digest_max_urls:]
+        if len(urls) >= self.settings.digest_min_urls:
+            return urls[:self.settings.digest_max_urls]
+        return None
+        
+    def dispatch(self, handler, arg, e_context):
+        """执行处理函数；启用异步模式时提交到线程池并立即回复确认消息"""
+        context = e_context["context"]
+        msg = context["msg"]
+        isgroup = context.get("isgroup", False)
+        user_id = (msg.actual_user_id if isgroup else None) or msg.from_user_id
+        group_id = msg.other_user_id if isgroup else None
+        
+        # 限流：同步模式不能排队等待，超限直接拒绝；异步模式下短时间的超限延后执行
+        delay = 0
+        if self.rate_limiter.enabled():
+            max_delay = self.settings.rate_limit_max_delay if self.worker_pool else 0
+            delay = self.rate_limiter.acquire(user_id, group_id, max_delay=max_delay)
+            if delay is None:
+                logger.info(f"[ReadBrief] 请求超出限流，已拒绝: user={user_id}, group={group_id}, 统计: {self.rate_limiter.stats()}")
+                e_context["reply"] = Reply(ReplyType.TEXT, self.settings.rate_limit_text)
+                e_context.action = EventAction.BREAK_PASS
+                return
+        
+        if not self.worker_pool:
+            handler(arg, e_context)
+            return
+            
+        channel = e_context["channel"]
+        job_context = EventContext(Event.ON_HANDLE_CONTEXT, {"channel": channel, "context": context, "reply": None})
+        # 按群聊分组排队，私聊按用户分组，线程池在各组之间轮流执行
+        key = group_id or user_id
+        if delay > 0:
+            logger.info(f"[ReadBrief] 请求超出限流，{delay:.1f}秒后执行: user={user_id}, group={group_id}")
+            timer = threading.Timer(delay, self.submit_job, (handler, arg, job_context, key))
+            timer.daemon = True
+            timer.start()
+            reply = Reply(ReplyType.TEXT, f"{self.settings.async_ack_text}（请求较多，约{int(delay) + 1}秒后开始）") if self.settings.async_ack_text else None
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+            
+        if self.worker_pool.submit(self.run_job, handler, arg, job_context, key=key):
+            logger.info(f"[ReadBrief] 已提交后台任务，排队: {self.worker_pool.stats()}")
+            reply = Reply(ReplyType.TEXT, self.settings.async_ack_text) if self.settings.async_ack_text else None
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            return
+            
+        # 队列已满
+        logger.warning(f"[ReadBrief] 后台队列已满，处理策略: {self.settings.async_overload}")
+        if self.settings.async_overload == "sync":
+            handler(arg, e_context)
+        else:
+            reply = Reply(ReplyType.TEXT, self.settings.async_busy_text)
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
+            
+    def submit_job(self, handler, arg, job_context, key):
+        """延后执行的任务到期后提交到线程池，队列已满时直接通知用户"""
+        if self.worker_pool.submit(self.run_job, handler, arg, job_context, key=key):
+            return
+        logger.warning("[ReadBrief] 后台队列已满，延后的任务被丢弃")
+        job_context["channel"].send(Reply(ReplyType.TEXT, self.settings.async_busy_text), job_context["context"])
+        
+    def run_job(self, handler, arg, job_context):
+        """在后台线程中执行处理函数，并通过通道发送结果"""
+        handler(arg, job_context)
+        reply = job_context["reply"]
+        if reply:
+            job_context["channel"].send(reply, job_context["context"])
             
     def handle_url(self, url, e_context):
         """处理URL链接，获取内容并生成摘要"""
         try:
             logger.info(f"[ReadBrief] 处理URL: {url}")
-            
-            # 根据选择的服务调用不同的API
-            if self.service == "gemini":
-                self.handle_gemini(url, e_context)
-            elif self.service == "azure":
-                self.handle_azure(url, e_context)
-            else:  # 默认使用OpenAI
-                self.handle_openai(url, e_context)
+            with self.metrics.trace("summary", url) as trace:
+                # 命中摘要缓存时直接回复
+                if self.reply_from_cache(url, e_context):
+                    trace.result = "cache_hit"
+                    return
+                
+                self.handle_summary(url, e_context)
+                if e_context["reply"] and e_context["reply"].type == ReplyType.ERROR:
+                    trace.result = "error"
                 
         except Exception as e:
             logger.error(f"处理URL时出错: {str(e)}")
@@ -163,449 +536,740 @@ class ReadBrief(Plugin):
             e_context["reply"] = reply
             e_context.action = EventAction.BREAK_PASS
             
-    def fetch_url_content(self, url):
-        """使用jina获取URL内容"""
+    def handle_question(self, question, e_context):
+        """基于已获取的文章内容回答追问，只调用一次大模型，不重新抓取网页"""
         try:
-            # 使用jina提取网页内容
-            from jina import Document
-            doc = Document(uri=url).load_uri_to_text()
-            
-            # 获取网页正文内容
-            content = doc.text
-            
-            # 解析网页元数据
-            soup = BeautifulSoup(content, 'html.parser')
-            
-            # 提取标题
-            title = soup.title.string if soup.title else ""
-            
-            # 提取来源（可能需要根据实际网站结构调整）
-            source = ""
-            meta_site = soup.find('meta', {'property': 'og:site_name'})
-            if meta_site:
-                source = meta_site.get('content', '')
-                
-            return {
-                "content": content,
-                "title": title,
-                "source": source
-            }
-        except Exception as e:
-            logger.error(f"获取URL内容失败: {str(e)}")
-            return None
-            
-    def handle_openai(self, url, e_context):
-        """使用OpenAI处理URL内容"""
-        try:
-            # 获取用户ID和参数
             msg: ChatMessage = e_context["context"]["msg"]
             user_id = msg.from_user_id
-            user_params = self.params_cache.get(user_id, {})
-            isgroup = e_context["context"].get("isgroup", False)
-            prompt = user_params.get('prompt', self.prompt)
-            
-            # 获取网页内容
-            url_data = self.fetch_url_content(url)
-            if not url_data:
-                reply = Reply(ReplyType.ERROR, "无法获取网页内容")
+            session = self.sessions.get(user_id)
+            if session is None:
+                reply = Reply(ReplyType.TEXT, "追问已过期，请重新发送链接")
                 e_context["reply"] = reply
                 e_context.action = EventAction.BREAK_PASS
                 return
                 
-            # 构建API请求
-            headers = {
-                'Content-Type': 'application/json',
-                'Authorization': f'Bearer {self.open_ai_api_key}'
-            }
+            # 优先使用文章正文，缓存命中时没有正文则使用摘要
+            article = session.article or session.content
+            if not article and session.summary is not None:
+                article = self.format_summary(session.summary)
+            history = session.history
             
-            # 构建消息
             messages = [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": f"链接：{url}\n\n内容：{url_data['content'][:5000]}"}  # 限制内容长度
+                {"role": "system", "content": "你是一个专业的文章分析师，请根据以下文章内容回答用户的问题，回答简洁准确，不要使用JSON格式。\n\n"
+                                              f"标题：{session.title}\n\n内容：{article}"}
             ]
+            for turn in history[-self.settings.qa_max_turns:]:
+                messages.append({"role": "user", "content": turn['question']})
+                messages.append({"role": "assistant", "content": turn['answer']})
+            messages.append({"role": "user", "content": question})
             
-            # API调用参数
-            data = {
-                "model": self.model,
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000
-            }
+            logger.info(f"[ReadBrief] 处理追问: {question}")
+            with self.metrics.trace("question", question[:20]):
+                answer = self.call_llm(messages)
             
-            logger.info(f"[OpenAI API请求] URL: {url}")
-            logger.info(f"[OpenAI API请求] 提示词: {prompt}")
+            # 记录对话轮次
+            history.append({'question': question, 'answer': answer})
+            session.history = history[-self.settings.qa_max_turns:]
+            self.sessions.put(user_id, session)
             
-            # 发送API请求
-            response = requests.post(f"{self.open_ai_api_base}/chat/completions", 
-                                    headers=headers, json=data)
-            response.raise_for_status()
-            response_data = response.json()
+            reply = Reply(ReplyType.TEXT, answer)
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
             
-            # 提取生成的摘要
-            summary_json = response_data["choices"][0]["message"]["content"]
+        except Exception as e:
+            logger.error(f"处理追问时出错: {str(e)}")
+            reply = Reply(ReplyType.ERROR, "追问处理失败")
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
             
-            # 尝试解析JSON
-            try:
-                summary_data = json.loads(summary_json)
-                
-                # 构建格式化摘要文本
-                summary_text = self.format_summary(summary_data, url_data)
-                
-                # 保存内容到用户缓存
-                self.params_cache[user_id]['content'] = summary_text
-                self.params_cache[user_id]['title'] = summary_data.get('title', url_data.get('title', ''))
-                self.params_cache[user_id]['source'] = summary_data.get('source', url_data.get('source', ''))
-                
-                # 处理生成的摘要
-                self.process_summary_response(summary_text, e_context)
-                
-            except json.JSONDecodeError:
-                # JSON解析失败，直接使用文本
-                logger.warning("JSON解析失败，使用原始文本")
-                summary_text = summary_json
-                
-                # 添加交互提示
-                if self.qa_enabled:
-                    final_text = f"{summary_text}\n\n💬5分钟内输入{self.qa_prefix}+问题，可继续追问"
-                else:
-                    final_text = summary_text
-                    
-                # 创建文本回复
-                reply = Reply(ReplyType.TEXT, final_text)
-                e_context["reply"] = reply
-                e_context.action = EventAction.BREAK_PASS
-                
+    def handle_search(self, keyword, e_context):
+        """在摘要归档中检索关键词或#标签，直接回复已保存的摘要，不调用大模型"""
+        try:
+            if not keyword:
+                reply = Reply(ReplyType.TEXT, f"请输入{self.settings.archive_prefix}+关键词，如：{self.settings.archive_prefix} 大模型，或按标签检索：{self.settings.archive_prefix} #AI")
+            else:
+                with self.metrics.trace("search", keyword[:20]) as trace:
+                    results = self.archive.search(keyword, limit=self.settings.archive_max_results)
+                    trace.set(results=len(results))
+                reply = Reply(ReplyType.TEXT, self.format_search_results(keyword, results))
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
         except Exception as e:
-            logger.error(f"OpenAI处理错误: {str(e)}")
-            reply = Reply(ReplyType.ERROR, "摘要生成失败")
+            logger.error(f"检索摘要归档时出错: {str(e)}")
+            reply = Reply(ReplyType.ERROR, "检索失败")
             e_context["reply"] = reply
             e_context.action = EventAction.BREAK_PASS
             
-    def handle_gemini(self, url, e_context):
-        """使用Gemini处理URL内容"""
+    def format_search_results(self, keyword, results):
+        """只有一条结果时回复完整摘要，多条时回复标题、一句话总结和链接的列表"""
+        if not results:
+            return f"没有找到与“{keyword}”相关的摘要"
+        if len(results) == 1:
+            item = results[0]
+            return f"{self.format_summary(Summary.from_dict(item.summary_data))}\n\n🔗 {item.url}"
+        lines = [f"🔎 找到{len(results)}篇与“{keyword}”相关的摘要："]
+        for i, item in enumerate(results):
+            summary = Summary.from_dict(item.summary_data)
+            date = time.strftime("%Y-%m-%d", time.localtime(item.created_at))
+            lines.append(f"{i+1}️⃣ {summary.title or '未知标题'}（{date}）\n📌 {summary.summary or '无摘要'}\n"
+                         f"🏷️ {summary.tags}\n🔗 {item.url}")
+        return "\n\n".join(lines)
+        
+    def handle_digest(self, urls, e_context):
+        """汇总多篇文章：并行抓取，分批合并调用大模型，回复一张汇总卡片或一段汇总文本"""
         try:
-            # 获取用户ID和参数
             msg: ChatMessage = e_context["context"]["msg"]
             user_id = msg.from_user_id
-            user_params = self.params_cache.get(user_id, {})
-            isgroup = e_context["context"].get("isgroup", False)
-            prompt = user_params.get('prompt', self.prompt)
-            
-            # 获取网页内容
-            url_data = self.fetch_url_content(url)
-            if not url_data:
-                reply = Reply(ReplyType.ERROR, "无法获取网页内容")
-                e_context["reply"] = reply
-                e_context.action = EventAction.BREAK_PASS
-                return
+            with self.metrics.trace("digest", f"{len(urls)}个链接") as trace:
+                summaries = [None] * len(urls)
                 
-            # Gemini API配置
-            api_key = self.gemini_key
-            api_base = "https://generativelanguage.googleapis.com/v1beta/models/gemini-1.5-flash:generateContent"
+                # 已有单篇摘要缓存的文章直接使用，不再抓取
+                pending = []
+                for i, url in enumerate(urls):
+                    cached = None
+                    if self.summary_cache:
+                        cached = self.summary_cache.get(make_cache_key(url, self.settings.prompt, self.get_model_name(), self.settings.service))
+                    if cached:
+                        summaries[i] = Summary.from_dict(cached[0])
+                    else:
+                        pending.append(i)
+                trace.set(cached=len(urls) - len(pending))
+                        
+                # 并行抓取
+                articles = []
+                indexes = []
+                if pending:
+                    with ThreadPoolExecutor(max_workers=min(self.settings.digest_fetch_concurrency, len(pending))) as executor:
+                        fetched = list(executor.map(self.fetch_url_content, [urls[i] for i in pending]))
+                    for i, url_data in zip(pending, fetched):
+                        if url_data and url_data.get('content'):
+                            articles.append(dict(url_data, url=urls[i]))
+                            indexes.append(i)
+                            
+                # 分批合并摘要
+                digest_title = ""
+                usage = {"mode": "digest", "calls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+                if articles:
+                    with self.metrics.stage("llm") as stage:
+                        digest_title, results, usage = self.digest_summarizer.summarize(
+                            articles, self.settings.digest_prompt, json_mode=self.settings.llm_json_mode)
+                        stage.update(mode=usage['mode'], calls=usage['calls'],
+                                     prompt_tokens=usage['prompt_tokens'], completion_tokens=usage['completion_tokens'])
+                    for i, summary in zip(indexes, results):
+                        summaries[i] = summary
+                logger.info(f"[ReadBrief] 汇总完成 {len(urls)}个链接，成功{sum(1 for s in summaries if s)}篇，调用: {usage['calls']}次")
+                        
+                if not any(summaries):
+                    trace.result = "error"
+                    e_context["reply"] = Reply(ReplyType.ERROR, "无法获取网页内容")
+                    e_context.action = EventAction.BREAK_PASS
+                    return
+                    
+                digest_title = digest_title or f"{len(urls)}篇文章汇总"
+                with self.metrics.stage("format"):
+                    digest_text = self.format_digest(digest_title, urls, summaries)
+                card_image = self.build_digest_card(digest_title, urls, summaries) if self.settings.card_enabled else None
+                
+            # 保存汇总内容，供追问使用
+            session = self.sessions.get(user_id)
+            if session is not None:
+                session.title = digest_title
+                session.content = digest_text[:QA_ARTICLE_MAX_CHARS]
+                session.history = []
+                session.usage = usage
+                self.sessions.put(user_id, session)
+                
+            if self.settings.card_enabled and not card_image:
+                logger.warning("[卡片生成] 汇总卡片生成失败，回退到文本")
+            e_context["reply"] = self.make_summary_reply(digest_text, card_image)
+            e_context.action = EventAction.BREAK_PASS
             
-            # 构建请求
-            headers = {
-                'Content-Type': 'application/json'
-            }
+        except Exception as e:
+            logger.error(f"汇总生成错误: {str(e)}")
+            reply = Reply(ReplyType.ERROR, "汇总生成失败")
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
             
-            # 构建消息
-            data = {
-                "contents": [
-                    {
-                        "parts": [
-                            {"text": prompt},
-                            {"text": f"链接：{url}\n\n内容：{url_data['content'][:5000]}"}  # 限制内容长度
-                        ]
-                    }
-                ],
-                "generationConfig": {
-                    "temperature": 0.7,
-                    "maxOutputTokens": 1000
-                }
-            }
+    def call_llm(self, messages, max_tokens=1000):
+        """按配置的服务顺序发送对话消息，返回模型回复文本"""
+        with self.metrics.stage("llm") as stage:
+            result = self.llm.complete(messages, max_tokens=max_tokens)
+            stage["provider"] = result.provider
+            if result.usage:
+                stage["prompt_tokens"] = result.usage.get("prompt_tokens", 0)
+                stage["completion_tokens"] = result.usage.get("completion_tokens", 0)
+        return result.text
+        
+    def get_model_name(self):
+        """返回首选服务实际使用的模型名称"""
+        return self.llm.primary.model
+        
+    def get_config_hash(self, prompt):
+        """返回提示词、模型和服务的哈希，用于判断归档的摘要能否复用"""
+        return make_config_hash(prompt, self.get_model_name(), self.settings.service)
+        
+    def reply_from_cache(self, url, e_context):
+        """查询摘要缓存，未命中时查询摘要归档，命中时直接回复并返回True"""
+        if not self.summary_cache and not self.archive_reuse:
+            return False
+        msg: ChatMessage = e_context["context"]["msg"]
+        user_id = msg.from_user_id
+        session = self.sessions.get(user_id)
+        prompt = session.prompt if session else self.settings.prompt
+        cache_key = make_cache_key(url, prompt, self.get_model_name(), self.settings.service)
+        if session is not None:
+            session.cache_key = cache_key
+            self.sessions.put(user_id, session)
             
-            logger.info(f"[Gemini API请求] URL: {url}")
-            logger.info(f"[Gemini API请求] 提示词: {prompt}")
+        cached = self.summary_cache.get(cache_key) if self.summary_cache else None
+        result = "hit" if cached else "miss"
+        if not cached and self.archive_reuse:
+            archived = self.archive.get(url, self.get_config_hash(prompt), self.settings.cache_ttl)
+            if archived:
+                cached = (archived.summary_data, None)
+                result = "archive"
+        self.metrics.inc("readbrief_cache_total", result=result)
+        self.metrics.annotate(cache=result)
+        if not cached:
+            return False
+        summary_data, card_image = cached
+        logger.info(f"[ReadBrief] 命中摘要{'归档' if result == 'archive' else '缓存'}: {url}")
+        
+        # 恢复会话，保证追问可用
+        summary = Summary.from_dict(summary_data)
+        summary_text = self.format_summary(summary)
+        if session is not None:
+            session.summary = summary
+            session.title = summary.title
+            self.sessions.put(user_id, session)
+        
+        if self.settings.card_enabled and not card_image:
+            # 缓存中无卡片时仅重新生成卡片，不再调用大模型
+            self.process_summary_response(summary, e_context)
+            return True
             
-            # 发送API请求
-            response = requests.post(f"{api_base}?key={api_key}", 
-                                    headers=headers, json=data)
-            response.raise_for_status()
-            response_data = response.json()
+        e_context["reply"] = self.make_summary_reply(summary_text, card_image if self.settings.card_enabled else None)
+        e_context.action = EventAction.BREAK_PASS
+        return True
+        
+    def save_to_cache(self, user_id, card_image=None):
+        """将当前用户的摘要数据和卡片写入摘要缓存"""
+        if not self.summary_cache:
+            return
+        session = self.sessions.get(user_id)
+        if session is None or not session.cache_key or session.summary is None:
+            return
+        try:
+            self.summary_cache.put(session.cache_key, session.last_url, session.summary.to_dict(), card_image)
+        except Exception as e:
+            logger.warning(f"[ReadBrief] 写入摘要缓存失败: {e}")
             
-            # 提取生成的摘要
-            summary_json = response_data["candidates"][0]["content"]["parts"][0]["text"]
+    def fetch_url_content(self, url):
+        """
+        获取正文和元数据：优先使用正文缓存，缓存需要重新验证时发送条件请求；
+        直接提取失败或站点需要执行脚本时使用jina，均失败时使用过期前的缓存
+        """
+        cached = self.article_cache.get(url) if self.article_cache else None
+        if cached and cached.is_fresh(self.article_cache.fresh_ttl):
+            logger.info(f"[ReadBrief] 使用缓存的正文: {url}")
+            self.metrics.annotate(article_cache="hit")
+            return cached.data
             
-            # 尝试解析JSON
+        if route(url).fetch != FETCH_JINA:
             try:
-                summary_data = json.loads(summary_json)
-                
-                # 构建格式化摘要文本
-                summary_text = self.format_summary(summary_data, url_data)
-                
-                # 保存内容到用户缓存
-                self.params_cache[user_id]['content'] = summary_text
-                self.params_cache[user_id]['title'] = summary_data.get('title', url_data.get('title', ''))
-                self.params_cache[user_id]['source'] = summary_data.get('source', url_data.get('source', ''))
-                
-                # 处理生成的摘要
-                self.process_summary_response(summary_text, e_context)
-                
-            except json.JSONDecodeError:
-                # JSON解析失败，直接使用文本
-                logger.warning("JSON解析失败，使用原始文本")
-                summary_text = summary_json
-                
-                # 添加交互提示
-                if self.qa_enabled:
-                    final_text = f"{summary_text}\n\n💬5分钟内输入{self.qa_prefix}+问题，可继续追问"
-                else:
-                    final_text = summary_text
-                    
-                # 创建文本回复
-                reply = Reply(ReplyType.TEXT, final_text)
-                e_context["reply"] = reply
-                e_context.action = EventAction.BREAK_PASS
+                url_data = self.fetch_direct(url, cached)
+            except ContentRejected as e:
+                logger.warning(f"[ReadBrief] 无法摘要该链接: {e}")
+                self.metrics.annotate(fetch="rejected")
+                self.metrics.inc("readbrief_fetch_rejected")
+                return cached.data if cached else None
+            if url_data:
+                return url_data
                 
+        try:
+            # 使用jina提取网页内容
+            with self.metrics.stage("fetch_jina") as stage:
+                doc = jina_document()(uri=url).load_uri_to_text()
+                stage["chars"] = len(doc.text or "")
+            url_data = {
+                "content": doc.text,
+                "title": "",
+                "source": "",
+                "author": "",
+                "publish_time": ""
+            }
+            if doc.text:
+                self.save_article(url, url_data)
+            return url_data
         except Exception as e:
-            logger.error(f"Gemini处理错误: {str(e)}")
-            reply = Reply(ReplyType.ERROR, "摘要生成失败")
-            e_context["reply"] = reply
-            e_context.action = EventAction.BREAK_PASS
+            logger.error(f"获取URL内容失败: {str(e)}")
+            if cached:
+                logger.warning(f"[ReadBrief] 重新获取失败，使用缓存的正文: {url}")
+                return cached.data
+            return None
+            
+    def fetch_direct(self, url, cached=None):
+        """
+        流式下载网页或PDF并提取正文，有缓存时带条件请求头，失败或正文过短时返回None；
+        内容类型不支持或超出上限时抛出ContentRejected，不再回退到jina
+        """
+        try:
+            headers = {'User-Agent': FETCH_USER_AGENT}
+            if cached:
+                headers.update(cached.conditional_headers())
+            with self.metrics.stage("fetch") as stage:
+                result = self.fetcher.fetch(url, headers)
+                stage["bytes"] = result.bytes
+                if result.not_modified and cached:
+                    self.article_cache.mark_valid(url)
+                    self.metrics.annotate(article_cache="revalidated")
+                    logger.info(f"[ReadBrief] 正文未变化，使用缓存: {url}")
+                    return cached.data
+                if result.not_modified:
+                    return None
+                url_data = result.url_data
+                stage["chars"] = len(url_data['content'])
+                if result.truncated:
+                    stage["truncated"] = result.truncated
+                    self.metrics.inc("readbrief_fetch_truncated", reason=result.truncated)
+            if len(url_data['content']) >= MIN_ARTICLE_CHARS:
+                logger.info(f"[ReadBrief] 正文提取完成: {len(url_data['content'])}字，标题: {url_data['title']}")
+                self.save_article(url, url_data, result.etag, result.last_modified)
+                return url_data
+            if result.kind == "pdf":
+                raise ContentRejected(f"PDF中没有可提取的文字({len(url_data['content'])}字)")
+            logger.warning(f"[ReadBrief] 正文过短({len(url_data['content'])}字)，回退到jina")
+        except ContentRejected:
+            raise
+        except Exception as e:
+            logger.warning(f"[ReadBrief] 正文提取失败，回退到jina: {e}")
+        return None
+        
+    def save_article(self, url, url_data, etag="", last_modified=""):
+        """写入正文缓存，失败时不影响摘要"""
+        if not self.article_cache:
+            return
+        try:
+            self.article_cache.put(url, url_data, etag, last_modified)
+        except Exception as e:
+            logger.warning(f"[ReadBrief] 写入正文缓存失败: {e}")
+            
+    def prefetch_article(self, url):
+        """后台预取单篇文章的正文"""
+        with self.metrics.trace("prefetch", url):
+            return self.fetch_url_content(url)
             
-    def handle_azure(self, url, e_context):
-        """使用Azure OpenAI处理URL内容"""
+    def handle_summary(self, url, e_context):
+        """获取网页内容并调用大模型生成摘要，相同链接和提示词的并发请求只处理一次"""
         try:
             # 获取用户ID和参数
             msg: ChatMessage = e_context["context"]["msg"]
             user_id = msg.from_user_id
-            user_params = self.params_cache.get(user_id, {})
-            isgroup = e_context["context"].get("isgroup", False)
-            prompt = user_params.get('prompt', self.prompt)
+            session = self.sessions.get(user_id)
+            prompt = session.prompt if session else self.settings.prompt
+            cache_key = (session and session.cache_key) or make_cache_key(url, prompt, self.get_model_name(), self.settings.service)
             
-            # 获取网页内容
-            url_data = self.fetch_url_content(url)
-            if not url_data:
+            progress = self.create_progress(e_context)
+            try:
+                result, shared = self.inflight.do(cache_key, lambda: self.generate_summary(url, prompt, cache_key, progress))
+            finally:
+                sent_fields = progress.close() if progress else []
+            if shared:
+                logger.info(f"[ReadBrief] 复用并发请求的摘要结果: {url}")
+                self.metrics.annotate(shared=True)
+            if progress and progress.first_sent_at is not None:
+                trace = self.metrics.current()
+                if trace:
+                    first_reply = progress.first_sent_at - trace.started_at
+                    self.metrics.observe("readbrief_first_reply_seconds", first_reply)
+                    trace.set(first_reply=round(first_reply, 2))
+            if not result:
                 reply = Reply(ReplyType.ERROR, "无法获取网页内容")
                 e_context["reply"] = reply
                 e_context.action = EventAction.BREAK_PASS
                 return
                 
-            # Azure API配置
-            headers = {
-                'Content-Type': 'application/json',
-                'api-key': self.azure_api_key
-            }
-            
-            # 构建消息
-            messages = [
-                {"role": "system", "content": prompt},
-                {"role": "user", "content": f"链接：{url}\n\n内容：{url_data['content'][:5000]}"}  # 限制内容长度
-            ]
-            
-            # API调用参数
-            data = {
-                "messages": messages,
-                "temperature": 0.7,
-                "max_tokens": 1000
-            }
-            
-            logger.info(f"[Azure API请求] URL: {url}")
-            logger.info(f"[Azure API请求] 提示词: {prompt}")
-            
-            # 发送API请求
-            endpoint = f"{self.azure_api_base}/openai/deployments/{self.azure_deployment_id}/chat/completions?api-version=2023-05-15"
-            response = requests.post(endpoint, headers=headers, json=data)
-            response.raise_for_status()
-            response_data = response.json()
-            
-            # 提取生成的摘要
-            summary_json = response_data["choices"][0]["message"]["content"]
-            
-            # 尝试解析JSON
-            try:
-                summary_data = json.loads(summary_json)
-                
-                # 构建格式化摘要文本
-                summary_text = self.format_summary(summary_data, url_data)
-                
-                # 保存内容到用户缓存
-                self.params_cache[user_id]['content'] = summary_text
-                self.params_cache[user_id]['title'] = summary_data.get('title', url_data.get('title', ''))
-                self.params_cache[user_id]['source'] = summary_data.get('source', url_data.get('source', ''))
-                
-                # 处理生成的摘要
-                self.process_summary_response(summary_text, e_context)
-                
-            except json.JSONDecodeError:
-                # JSON解析失败，直接使用文本
-                logger.warning("JSON解析失败，使用原始文本")
-                summary_text = summary_json
-                
-                # 添加交互提示
-                if self.qa_enabled:
-                    final_text = f"{summary_text}\n\n💬5分钟内输入{self.qa_prefix}+问题，可继续追问"
-                else:
-                    final_text = summary_text
-                    
-                # 创建文本回复
-                reply = Reply(ReplyType.TEXT, final_text)
-                e_context["reply"] = reply
-                e_context.action = EventAction.BREAK_PASS
+            self.reply_summary(result, e_context, sent_fields)
                 
+        except ProviderUnavailable as e:
+            logger.warning(f"[ReadBrief] {e}")
+            reply = Reply(ReplyType.ERROR, "大模型服务暂时不可用，请稍后再试")
+            e_context["reply"] = reply
+            e_context.action = EventAction.BREAK_PASS
         except Exception as e:
-            logger.error(f"Azure处理错误: {str(e)}")
+            logger.error(f"摘要生成错误: {str(e)}")
             reply = Reply(ReplyType.ERROR, "摘要生成失败")
             e_context["reply"] = reply
             e_context.action = EventAction.BREAK_PASS
             
-    def format_summary(self, summary_data, url_data):
-        """格式化摘要数据为文本形式"""
-        title = summary_data.get('title', url_data.get('title', '未知标题'))
-        summary = summary_data.get('summary', '无摘要')
-        key_points = summary_data.get('key_points', [])
-        comment = summary_data.get('comment', '无评论')
-        tags = summary_data.get('tags', '')
-        read_time = summary_data.get('read_time', '未知')
-        source = summary_data.get('source', url_data.get('source', '未知来源'))
+    def create_progress(self, e_context):
+        """启用渐进式回复且可以主动发送消息时，创建当前请求的ProgressiveReply"""
+        channel = e_context["channel"]
+        if not self.settings.progressive_enabled or channel is None:
+            return None
+        context = e_context["context"]
+        return ProgressiveReply(
+            lambda text: channel.send(Reply(ReplyType.TEXT, text), context),
+            self.format_partial,
+            min_interval=self.settings.progressive_min_interval,
+        )
+        
+    def generate_summary(self, url, prompt, cache_key=None, progress=None):
+        """
+        抓取网页、生成摘要和卡片并写入缓存，返回与用户无关的结果；无法获取网页时返回None。
+        progress为ProgressiveReply时，摘要生成过程中即发送已完成的字段
+        """
+        # 获取网页内容
+        url_data = self.fetch_url_content(url)
+        if not url_data:
+            return None
+            
+        # 与最近摘要过的文章近似重复时直接复用其摘要
+        fingerprint = None
+        if self.dedup:
+            with self.metrics.stage("dedup"):
+                fingerprint = self.dedup.fingerprint(url_data['content'])
+                duplicate = self.reuse_duplicate(url, url_data, prompt, cache_key, fingerprint) if fingerprint else None
+            if duplicate:
+                return duplicate
+                
+        logger.info(f"[ReadBrief] 摘要请求 URL: {url}")
+        logger.info(f"[ReadBrief] 摘要请求 提示词: {prompt}")
+        
+        # 按token预算单次或分块摘要，调用失败时自动切换服务
+        with self.metrics.stage("llm") as stage:
+            summary_json, usage = self.summarizer.summarize(
+                prompt, url, url_data['content'], json_mode=self.settings.llm_json_mode,
+                on_delta=progress.on_delta if progress else None,
+                on_restart=progress.on_restart if progress else None,
+            )
+            stage.update(mode=usage['mode'], calls=usage['calls'],
+                         prompt_tokens=usage['prompt_tokens'], completion_tokens=usage['completion_tokens'])
+        logger.info(f"[ReadBrief] 摘要完成 模式: {usage['mode']}，调用: {usage['calls']}次，"
+                    f"输入token: {usage['prompt_tokens']}，输出token: {usage['completion_tokens']}")
+        result = {
+            "url": url,
+            "url_data": url_data,
+            "usage": usage,
+            "summary": None,
+            "summary_text": summary_json,
+            "card_image": None
+        }
+        
+        # 解析JSON，兼容代码块包裹、多余文字和被截断的输出
+        with self.metrics.stage("parse") as stage:
+            stage["bytes"] = len(summary_json.encode("utf-8"))
+            summary = self.summary_parser.parse(summary_json, title=url_data.get('title', ''), source=url_data.get('source', ''))
+        if summary is None:
+            # JSON解析失败，直接使用文本
+            logger.warning("JSON解析失败，使用原始文本")
+            return result
+        mark_partial(summary, usage)
+            
+        # 构建格式化摘要文本
+        result["summary"] = summary
+        with self.metrics.stage("format"):
+            result["summary_text"] = self.format_summary(summary)
         
+        # 生成卡片
+        if self.settings.card_enabled:
+            result["card_image"] = self.build_card(summary, url)
+            
+        if self.summary_cache and cache_key:
+            try:
+                self.summary_cache.put(cache_key, url, summary.to_dict(), result["card_image"])
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 写入摘要缓存失败: {e}")
+        if self.archive:
+            self.archive.add(url, summary.to_dict(), self.get_config_hash(prompt))
+        if fingerprint:
+            try:
+                self.dedup.add(url, fingerprint)
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 写入近似重复索引失败: {e}")
+        return result
+        
+    def reuse_duplicate(self, url, url_data, prompt, cache_key, fingerprint):
+        """正文与最近摘要过的文章近似重复且该文章有缓存的摘要时，返回复用该摘要的结果，否则返回None"""
+        match = self.dedup.find(url, fingerprint, self.load_article_text)
+        if match is None:
+            return None
+        original_url, score = match
+        cached = self.summary_cache.get(make_cache_key(original_url, prompt, self.get_model_name(), self.settings.service))
+        if not cached:
+            return None
+        hit_rate, false_rate = self.dedup.rates()
+        logger.info(f"[ReadBrief] 近似重复文章(相似度{score:.2f})，复用{original_url}的摘要；"
+                    f"近似重复命中率{hit_rate:.1%}，误匹配率{false_rate:.1%}")
+        self.metrics.annotate(duplicate=round(score, 2))
+        summary = Summary.from_dict(cached[0])
+        card_image = cached[1]
+        if self.settings.card_enabled and not card_image:
+            card_image = self.build_card(summary, url)
+        if cache_key:
+            try:
+                self.summary_cache.put(cache_key, url, summary.to_dict(), card_image)
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 写入摘要缓存失败: {e}")
+        if self.archive:
+            self.archive.add(url, summary.to_dict(), self.get_config_hash(prompt))
+        return {
+            "url": url,
+            "url_data": url_data,
+            "usage": {"mode": "duplicate", "calls": 0, "prompt_tokens": 0, "completion_tokens": 0},
+            "summary": summary,
+            "summary_text": self.format_summary(summary),
+            "card_image": card_image
+        }
+        
+    def load_article_text(self, url):
+        """从正文缓存读取文章正文，用于确认近似重复"""
+        if not self.article_cache:
+            return None
+        url_data = self.article_cache.peek(url)
+        return url_data.get("content") if url_data else None
+        
+    def reply_summary(self, result, e_context, sent_fields=()):
+        """把摘要结果写入当前用户的会话并回复；没有卡片时文本回复省略渐进式回复已发送的字段"""
+        msg: ChatMessage = e_context["context"]["msg"]
+        user_id = msg.from_user_id
+        url_data = result["url_data"]
+        summary = result["summary"]
+        
+        # 保存内容到会话，正文供追问使用；有结构化摘要时不再保存格式化后的文本
+        session = self.sessions.get(user_id)
+        if session is not None:
+            session.article = url_data['content'][:QA_ARTICLE_MAX_CHARS]
+            session.title = (summary.title if summary is not None else "") or url_data.get('title', '')
+            session.history = []
+            session.usage = result["usage"]
+            session.summary = summary
+            session.content = "" if summary is not None else result["summary_text"]
+            self.sessions.put(user_id, session)
+            
+        if self.settings.card_enabled and summary is not None and not result["card_image"]:
+            logger.warning("[卡片生成] 卡片生成失败，回退到文本")
+        summary_text = result["summary_text"]
+        if sent_fields and summary is not None and not result["card_image"]:
+            summary_text = self.format_summary(summary, skip=sent_fields)
+        e_context["reply"] = self.make_summary_reply(summary_text, result["card_image"])
+        e_context.action = EventAction.BREAK_PASS
+        
+    def make_summary_reply(self, summary_text, card_image=None):
+        """有卡片时回复图片，否则回复带追问提示的文本"""
+        if card_image:
+            return Reply(ReplyType.IMAGE, BytesIO(card_image))
+        if self.settings.qa_enabled:
+            return Reply(ReplyType.TEXT, f"{summary_text}\n\n💬{format_duration(self.settings.session_ttl)}内输入{self.settings.qa_prefix}+问题，可继续追问")
+        return Reply(ReplyType.TEXT, summary_text)
+        
+    def format_summary(self, summary, skip=()):
+        """格式化摘要为文本形式，skip中的字段（已通过渐进式回复发送）不再重复"""
         # 格式化关键点
         formatted_points = ""
-        for i, point in enumerate(key_points):
-            if isinstance(point, str):
-                formatted_points += f"{i+1}️⃣ {point}\n"
-                
+        for i, point in enumerate(summary.key_points):
+            formatted_points += f"{i+1}️⃣ {point}\n"
+            
         # 构建最终摘要文本
-        summary_text = f"📖 标题洞察：{title}\n\n"
-        summary_text += f"📌 一句话总结：{summary}\n\n"
-        summary_text += f"✨ 核心要点：\n{formatted_points}\n"
-        summary_text += f"🤖 AI辣评：{comment}\n\n"
-        summary_text += f"🏷️ 智能标签：{tags}\n\n"
-        summary_text += f"⏱️ 预计阅读：{read_time}\n\n"
-        summary_text += f"📰 文章来源：{source}"
+        summary_text = f"📖 标题洞察：{summary.title or '未知标题'}\n\n"
+        if "summary" not in skip:
+            summary_text += f"📌 一句话总结：{summary.summary or '无摘要'}\n\n"
+        if "key_points" not in skip:
+            summary_text += f"✨ 核心要点：\n{formatted_points}\n"
+        summary_text += f"🤖 AI辣评：{summary.comment or '无评论'}\n\n"
+        summary_text += f"🏷️ 智能标签：{summary.tags}\n\n"
+        summary_text += f"⏱️ 预计阅读：{summary.read_time or '未知'}\n\n"
+        summary_text += f"📰 文章来源：{summary.source or '未知来源'}"
         
         return summary_text
         
-    def process_summary_response(self, summary_text, e_context):
-        """处理摘要响应并生成卡片（如果启用）"""
+    def format_partial(self, name, summary):
+        """渐进式回复中单个字段的文本，字段为空时返回None"""
+        if name == "summary" and summary.summary:
+            title = f"📖 {summary.title}\n\n" if summary.title else ""
+            return f"{title}📌 一句话总结：{summary.summary}"
+        if name == "key_points" and summary.key_points:
+            points = "\n".join(f"{i+1}️⃣ {point}" for i, point in enumerate(summary.key_points))
+            return f"✨ 核心要点：\n{points}"
+        return None
+        
+    def format_digest(self, title, urls, summaries):
+        """格式化多篇文章的汇总文本"""
+        digest_text = f"📚 {title}\n"
+        for i, (url, summary) in enumerate(zip(urls, summaries)):
+            if summary is None:
+                digest_text += f"\n{i+1}. 无法获取内容\n🔗 {url}\n"
+                continue
+            digest_text += f"\n{i+1}. {summary.title or '未知标题'}\n"
+            if summary.summary:
+                digest_text += f"📌 {summary.summary}\n"
+            for point in summary.key_points:
+                digest_text += f"· {point}\n"
+            if summary.tags:
+                digest_text += f"🏷️ {summary.tags}\n"
+            digest_text += f"🔗 {url}\n"
+        return digest_text.rstrip()
+        
+    def process_summary_response(self, summary, e_context):
+        """为缓存的摘要生成卡片（如果启用）并回复"""
         try:
             # 获取用户信息
             msg: ChatMessage = e_context["context"]["msg"]
             user_id = msg.from_user_id
-            isgroup = e_context["context"].get("isgroup", False)
+            card_image = None
             
             # 如果启用了卡片生成
-            if summary_text and self.card_enabled:
-                logger.info(f"[卡片生成] 处理摘要文本...")
-                
-                # 获取标题和来源
-                title = self.params_cache[user_id].get('title', '')
-                source = self.params_cache[user_id].get('source', '')
-                original_url = self.params_cache[user_id].get('last_url', '')
-                
-                # 提取摘要各部分
-                one_line_match = re.search(r'📌 一句话总结[：:]\s*(.*?)(?=\n\n|$)', summary_text)
-                summary = one_line_match.group(1).strip() if one_line_match else ""
-                
-                # 提取核心要点
-                deep_analysis_match = re.search(r'✨ 核心要点[：:]?\n(.*?)(?=\n\n(?:🤖|🏷️|⏱️)|$)', summary_text, re.DOTALL)
-                points = []
-                if deep_analysis_match:
-                    analysis_text = deep_analysis_match.group(1).strip()
-                    for point in analysis_text.split('\n'):
-                        point = point.strip()
-                        if point and not point.startswith('✨'):
-                            # 移除markdown和编号
-                            point = re.sub(r'\*\*(.*?)\*\*', r'\1', point)
-                            point = re.sub(r'^[1-5]️⃣\s*', '', point)
-                            points.append(point)
-                
-                # 提取AI评论
-                thinking_match = re.search(r'🤖 AI辣评[：:]\s*(.*?)(?=\n\n(?:🏷️|⏱️)|$)', summary_text, re.DOTALL)
-                thinking = thinking_match.group(1).strip() if thinking_match else ""
-                
-                # 提取标签
-                tags_match = re.search(r'🏷️ 智能标签[：:]\s*(.*?)(?=\n\n(?:⏱️)|$)', summary_text, re.DOTALL)
-                tags = tags_match.group(1).strip() if tags_match else ""
-                
-                # 提取预计阅读时间
-                time_match = re.search(r'⏱️ 预计阅读[：:]\s*(.*?)(?=\n|$)', summary_text)
-                reading_time = time_match.group(1).strip() if time_match else ""
-                
-                # 格式化卡片内容
-                formatted_sections = []
-                
-                # 添加一句话总结
-                if summary:
-                    formatted_sections.append(f'<p><span style="background-color: transparent; color: inherit; font-size: calc(1.1rem);"><b>📌 一句话总结</b></span></p><p><span style="font-size: 14px;">{summary}</span></p>')
-                
-                # 添加核心要点
-                if points:
-                    formatted_points = '<br>'.join(points)
-                    formatted_sections.append(f'<p><b><span style="font-size: 16px;">✨ 核心要点</span></b></p><p><span style="font-size: 14px;">{formatted_points}</span></p>')
-                
-                # 添加AI评论
-                if thinking:
-                    formatted_sections.append(f'<p><b><span style="font-size: 16px;">🤖 AI辣评</span></b></p><p><span style="font-size: 14px;">{thinking}</span></p>')
-                
-                # 添加智能标签
-                if tags:
-                    formatted_sections.append(f'<p><b><span style="font-size: 14px;">🏷️ 智能标签</span></b></p><p><span style="color: rgb(35, 90, 217); font-size: 14px;">{tags}</span></p>')
-                
-                # 添加预计阅读时间
-                if reading_time:
-                    formatted_sections.append(f'<p><span style="color: rgb(217, 118, 2); font-size: 12px;">⏱️ 预计阅读：{reading_time}</span></p>')
-                
-                # 组合所有部分
-                content = '<p><br></p>'.join([section for section in formatted_sections if section.strip()])
-                
-                if not content:
-                    logger.error("[卡片生成] 无内容生成!")
-                    content = "<p>内容处理失败，请重试</p>"
-                
-                logger.info(f"[卡片生成] 标题: {title}")
-                logger.info(f"[卡片生成] 内容部分: {len(formatted_sections)}")
-                
-                # 生成卡片
-                card_image = self.generate_card(title, content, original_url, source)
-                
+            if self.settings.card_enabled:
+                session = self.sessions.get(user_id)
+                original_url = session.last_url if session else ''
+                card_image = self.build_card(summary, original_url)
                 if card_image:
-                    # 创建图片回复
-                    image_io = BytesIO(card_image)
-                    reply = Reply(ReplyType.IMAGE, image_io)
-                    logger.info("[卡片生成] 成功生成卡片图片")
+                    self.save_to_cache(user_id, card_image)
                 else:
-                    # 如果卡片生成失败，回退到文本回复
-                    # 添加交互提示
-                    if self.qa_enabled:
-                        final_text = f"{summary_text}\n\n💬5分钟内输入{self.qa_prefix}+问题，可继续追问"
-                    else:
-                        final_text = summary_text
-                        
-                    reply = Reply(ReplyType.TEXT, final_text)
                     logger.warning("[卡片生成] 卡片生成失败，回退到文本")
-            else:
-                # 默认文本回复
-                # 添加交互提示
-                if self.qa_enabled:
-                    final_text = f"{summary_text}\n\n💬5分钟内输入{self.qa_prefix}+问题，可继续追问"
-                else:
-                    final_text = summary_text
                     
-                reply = Reply(ReplyType.TEXT, final_text)
-                
-            e_context["reply"] = reply
+            e_context["reply"] = self.make_summary_reply(self.format_summary(summary), card_image)
             e_context.action = EventAction.BREAK_PASS
             
         except Exception as e:
             logger.error(f"处理摘要响应时出错: {str(e)}")
-            logger.error(f"导致错误的摘要文本: {summary_text}")
+            logger.error(f"导致错误的摘要: {summary.to_dict()}")
             reply = Reply(ReplyType.ERROR, "处理摘要时出错")
             e_context["reply"] = reply
             e_context.action = EventAction.BREAK_PASS
         
+    def build_card(self, summary, original_url):
+        """根据结构化摘要生成卡片图片"""
+        return self.finish_card(["card", summary.to_dict(), original_url],
+                                lambda: self.render_card(summary, original_url))
+        
+    def finish_card(self, content, render):
+        """
+        卡片的缓存和后处理：content为卡片内容，命中卡片缓存时直接返回；
+        否则调用render生成卡片，经图片后处理（本地渲染时已在编码时完成）后写入缓存，并记录各阶段耗时和图片大小
+        """
+        key = make_card_key(self.card_options, content)
+        if self.card_cache:
+            card_image = self.card_cache.get(key)
+            if card_image:
+                logger.info("[卡片生成] 使用缓存的卡片")
+                self.metrics.annotate(card_cache="hit")
+                return card_image
+                
+        with self.metrics.stage("card") as stage:
+            card_image = render()
+            stage["bytes"] = len(card_image) if card_image else 0
+        if card_image and self.image_optimizer and not self.card_renderer:
+            with self.metrics.stage("image") as stage:
+                try:
+                    original_size = len(card_image)
+                    card_image = self.image_optimizer.optimize(card_image)
+                    logger.info(f"[卡片生成] 图片后处理: {original_size // 1024}KB -> {len(card_image) // 1024}KB")
+                except Exception as e:
+                    logger.warning(f"[卡片生成] 图片后处理失败，使用原图: {e}")
+                stage["bytes"] = len(card_image)
+        if card_image and self.card_cache:
+            try:
+                self.card_cache.put(key, card_image)
+            except Exception as e:
+                logger.warning(f"[ReadBrief] 写入卡片缓存失败: {e}")
+        return card_image
+        
+    def render_card(self, summary, original_url):
+        """根据结构化摘要生成卡片图片，本地渲染或调用卡片API"""
+        logger.info(f"[卡片生成] 标题: {summary.title}")
+        
+        # 本地渲染卡片，无需请求卡片API
+        if self.card_renderer:
+            try:
+                return self.card_renderer.render(summary.title, summary.summary, summary.key_points, summary.comment,
+                                                 summary.tags, summary.read_time, summary.source, original_url)
+            except Exception as e:
+                logger.error(f"[卡片生成] 本地渲染失败: {e}")
+                return None
+                
+        # 格式化卡片内容
+        formatted_sections = []
+        
+        # 添加一句话总结
+        if summary.summary:
+            formatted_sections.append(f'<p><span style="background-color: transparent; color: inherit; font-size: calc(1.1rem);"><b>📌 一句话总结</b></span></p><p><span style="font-size: 14px;">{html.escape(summary.summary)}</span></p>')
+        
+        # 添加核心要点
+        if summary.key_points:
+            formatted_points = '<br>'.join(html.escape(point) for point in summary.key_points)
+            formatted_sections.append(f'<p><b><span style="font-size: 16px;">✨ 核心要点</span></b></p><p><span style="font-size: 14px;">{formatted_points}</span></p>')
+        
+        # 添加AI评论
+        if summary.comment:
+            formatted_sections.append(f'<p><b><span style="font-size: 16px;">🤖 AI辣评</span></b></p><p><span style="font-size: 14px;">{html.escape(summary.comment)}</span></p>')
+        
+        # 添加智能标签
+        if summary.tags:
+            formatted_sections.append(f'<p><b><span style="font-size: 14px;">🏷️ 智能标签</span></b></p><p><span style="color: rgb(35, 90, 217); font-size: 14px;">{html.escape(summary.tags)}</span></p>')
+        
+        # 添加预计阅读时间
+        if summary.read_time:
+            formatted_sections.append(f'<p><span style="color: rgb(217, 118, 2); font-size: 12px;">⏱️ 预计阅读：{html.escape(summary.read_time)}</span></p>')
+        
+        # 组合所有部分
+        content = '<p><br></p>'.join(formatted_sections)
+        
+        if not content:
+            logger.error("[卡片生成] 无内容生成!")
+            content = "<p>内容处理失败，请重试</p>"
+        
+        logger.info(f"[卡片生成] 内容部分: {len(formatted_sections)}")
+        
+        # 生成卡片
+        card_image = self.generate_card(html.escape(summary.title), content, original_url, html.escape(summary.source))
+        if card_image:
+            logger.info("[卡片生成] 成功生成卡片图片")
+        return card_image
+        
+    def build_digest_card(self, title, urls, summaries):
+        """生成多篇文章的汇总卡片，无法获取的文章不放入卡片"""
+        items = [summary for summary in summaries if summary is not None]
+        source = f"共{len(urls)}篇文章"
+        return self.finish_card(["digest", title, [s.to_dict() for s in items], source],
+                                lambda: self.render_digest_card(title, items, source))
+        
+    def render_digest_card(self, title, items, source):
+        """汇总卡片的本地渲染或调用卡片API"""
+        if self.card_renderer:
+            try:
+                return self.card_renderer.render_digest(
+                    title, [(s.title, s.summary, s.key_points, s.tags) for s in items], source)
+            except Exception as e:
+                logger.error(f"[卡片生成] 汇总卡片本地渲染失败: {e}")
+                return None
+                
+        sections = []
+        for i, summary in enumerate(items):
+            section = f'<p><b><span style="font-size: 16px;">{i + 1}. {html.escape(summary.title or "未知标题")}</span></b></p>'
+            if summary.summary:
+                section += f'<p><span style="font-size: 14px;">{html.escape(summary.summary)}</span></p>'
+            if summary.key_points:
+                points = '<br>'.join(f"· {html.escape(point)}" for point in summary.key_points)
+                section += f'<p><span style="font-size: 13px;">{points}</span></p>'
+            if summary.tags:
+                section += f'<p><span style="color: rgb(35, 90, 217); font-size: 12px;">{html.escape(summary.tags)}</span></p>'
+            sections.append(section)
+        return self.generate_card(html.escape(title), '<p><br></p>'.join(sections), None, source)
+        
     def generate_card(self, title, content, qr_code_url=None, source=""):
-        """生成卡片图片"""
+        """生成卡片图片，卡片接口熔断中时直接返回None，回复文本"""
+        if self.card_breaker and not self.card_breaker.allow():
+            logger.info("[卡片生成] 卡片接口熔断中，跳过卡片")
+            return None
+        started_at = time.monotonic()
+        card_image = self.request_card(title, content, qr_code_url, source)
+        if self.card_breaker:
+            self.card_breaker.record(card_image is not None, time.monotonic() - started_at)
+        return card_image
+        
+    def request_card(self, title, content, qr_code_url=None, source=""):
+        """调用卡片API生成卡片图片，失败时返回None"""
         try:
             # 默认值
             qr_code_title = "阅读简报"
@@ -662,7 +1326,7 @@ class ReadBrief(Plugin):
                     "showTGradual": True
                 },
                 "temp": "tempEasy",
-                "imgScale": 3,
+                "imgScale": self.settings.card_api_scale,
                 "language": "zh"
             }
             
@@ -672,8 +1336,8 @@ class ReadBrief(Plugin):
                 'Content-Type': 'application/json'
             }
             
-            response = requests.post(self.card_api_url, headers=headers, 
-                                    data=json.dumps(payload), verify=False)
+            response = self.http.post(self.settings.card_api_url, "card", headers=headers,
+                                      data=json.dumps(payload), verify=False)
             
             if response.status_code == 200:
                 logger.info("[卡片API响应] 成功接收图片数据")
@@ -685,6 +1349,66 @@ class ReadBrief(Plugin):
             logger.error(f"[卡片API错误] {str(e)}")
             return None
             
+    def collect_metrics(self):
+        """导出缓存、队列、限流和各接口的即时状态"""
+        values = []
+        if self.summary_cache:
+            values.append(("readbrief_summary_cache_hits", {}, self.summary_cache.hits))
+            values.append(("readbrief_summary_cache_misses", {}, self.summary_cache.misses))
+        if self.article_cache:
+            values.append(("readbrief_article_cache_hits", {}, self.article_cache.hits))
+            values.append(("readbrief_article_cache_misses", {}, self.article_cache.misses))
+            values.append(("readbrief_article_cache_revalidated", {}, self.article_cache.revalidated))
+        if self.prefetcher:
+            prefetch = self.prefetcher.stats()
+            for result in ("fetched", "skipped", "failed"):
+                values.append(("readbrief_prefetch_articles", {"result": result}, prefetch[result]))
+        if self.worker_pool:
+            pool = self.worker_pool.stats()
+            values.append(("readbrief_queue_pending", {}, pool["pending"]))
+            values.append(("readbrief_queue_active", {}, pool["active"]))
+            values.append(("readbrief_queue_avg_wait_seconds", {}, pool["avg_wait"]))
+        for action, count in self.rate_limiter.stats().items():
+            values.append(("readbrief_rate_limit_requests", {"action": action}, count))
+        breakers = dict(self.llm.breakers)
+        if self.card_breaker:
+            breakers["card"] = self.card_breaker
+        for name, breaker in breakers.items():
+            stats = breaker.stats()
+            values.append(("readbrief_circuit_state", {"dependency": name}, STATE_VALUES[stats["state"]]))
+            values.append(("readbrief_circuit_error_rate", {"dependency": name}, stats["error_rate"]))
+            values.append(("readbrief_circuit_rejected", {"dependency": name}, stats["rejected"]))
+        for provider, stats in self.llm.stats().items():
+            values.append(("readbrief_llm_calls", {"provider": provider}, stats["calls"]))
+            values.append(("readbrief_llm_failures", {"provider": provider}, stats["failures"]))
+            values.append(("readbrief_llm_avg_ttft_seconds", {"provider": provider}, stats["avg_ttft"]))
+        for endpoint, stats in self.http.stats().items():
+            values.append(("readbrief_http_requests", {"endpoint": endpoint}, stats["requests"]))
+            values.append(("readbrief_http_errors", {"endpoint": endpoint}, stats["errors"]))
+            values.append(("readbrief_http_retries", {"endpoint": endpoint}, stats["retries"]))
+        values.append(("readbrief_summary_parse", {"status": "ok"}, self.summary_parser.stats["ok"]))
+        values.append(("readbrief_summary_parse", {"status": "repaired"}, self.summary_parser.stats["repaired"]))
+        values.append(("readbrief_summary_parse", {"status": "failed"}, self.summary_parser.stats["failed"]))
+        values.append(("readbrief_coalesced_requests", {}, self.inflight.shared))
+        values.append(("readbrief_inflight_summaries", {}, self.inflight.in_flight()))
+        if self.dedup:
+            for name, count in self.dedup.stats.items():
+                values.append(("readbrief_dedup", {"result": name}, count))
+            hit_rate, false_rate = self.dedup.rates()
+            values.append(("readbrief_dedup_hit_rate", {}, round(hit_rate, 4)))
+            values.append(("readbrief_dedup_false_match_rate", {}, round(false_rate, 4)))
+        if self.archive:
+            for name, count in self.archive.stats.items():
+                values.append(("readbrief_archive", {"result": name}, count))
+        if self.card_cache:
+            values.append(("readbrief_card_cache_hits", {}, self.card_cache.hits))
+            values.append(("readbrief_card_cache_misses", {}, self.card_cache.misses))
+        values.append(("readbrief_load_seconds", {}, round(self.load_seconds, 3)))
+        values.append(("readbrief_resident_memory_bytes", {}, resident_memory()))
+        if isinstance(self.sessions, (MemorySessionStore, SQLiteSessionStore)):
+            values.append(("readbrief_sessions", {}, len(self.sessions)))
+        return values
+        
     def get_help_text(self, verbose=False, **kwargs):
         """返回插件帮助信息"""
         help_text = "ReadBrief插件：\n"
@@ -693,6 +1417,10 @@ class ReadBrief(Plugin):
         else:
             help_text += "一款专注于文章内容摘要生成的插件，帮助用户快速获取文章核心内容。\n"
             help_text += "- 发送链接即可获取文章摘要\n"
-            help_text += f"- 发送{self.qa_prefix}+问题，可针对文章内容提问\n"
+            help_text += f"- 发送{self.settings.qa_prefix}+问题，可针对文章内容提问\n"
+            if self.settings.digest_enabled:
+                help_text += f"- 一条消息中包含多个链接时自动汇总，发送{self.settings.digest_prefix}可汇总最近收到的链接\n"
+            if self.archive:
+                help_text += f"- 发送{self.settings.archive_prefix}+关键词或#标签，可检索以往的摘要\n"
             
         return help_text 
\ No newline at end of file
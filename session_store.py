@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from common.log import logger
+
+from .summary_model import Summary
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class Session:
+    """
+    单个会话的追问上下文
+
+    summary有值时文本摘要由其格式化得到，content只在摘要解析失败或汇总时保存原始文本。
+    """
+
+    __slots__ = ("last_url", "prompt", "cache_key", "title", "article", "content", "summary", "history", "usage")
+
+    def __init__(self, last_url="", prompt="", cache_key="", title="", article="", content="", summary=None,
+                 history=None, usage=None):
+        self.last_url = last_url
+        self.prompt = prompt
+        self.cache_key = cache_key
+        self.title = title
+        self.article = article
+        self.content = content
+        self.summary = summary
+        self.history = history or []
+        self.usage = usage or {}
+
+    def to_dict(self):
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["summary"] = self.summary.to_dict() if self.summary is not None else None
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        data = dict(data)
+        if data.get("summary"):
+            data["summary"] = Summary.from_dict(data["summary"])
+        return cls(**{name: data.get(name) for name in cls.__slots__ if name in data})
+
+
+class MemorySessionStore:
+    """
+    进程内会话存储
+
+    与ExpiredDict相同，每次读写都会把过期时间顺延ttl秒；超过max_entries时淘汰最久未访问的会话。
+    """
+
+    def __init__(self, ttl=300, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < now:
+                del self._items[key]
+                return None
+            self._items[key] = (now + self.ttl, item[1])
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key, session):
+        now = time.monotonic()
+        with self._lock:
+            self._items[key] = (now + self.ttl, session)
+            self._items.move_to_end(key)
+            # 最久未访问的会话在队首，先清理已过期的，再按数量淘汰
+            while self._items:
+                oldest_key, (expires_at, _) = next(iter(self._items.items()))
+                if expires_at >= now and len(self._items) <= self.max_entries:
+                    break
+                del self._items[oldest_key]
+
+    def delete(self, key):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SQLiteSessionStore:
+    """
+    SQLite会话存储，同一台机器上的多个进程共享会话
+
+    过期语义与内存存储相同；超过max_entries时淘汰最早过期（即最久未访问）的会话。
+    """
+
+    def __init__(self, path, ttl=300, max_entries=1000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions (key TEXT PRIMARY KEY, data TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT data FROM sessions WHERE key = ? AND expires_at >= ?", (key, now)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE sessions SET expires_at = ? WHERE key = ?", (now + self.ttl, key))
+            self._conn.commit()
+        return Session.from_dict(json.loads(row[0]))
+
+    def put(self, key, session):
+        now = time.time()
+        data = json.dumps(session.to_dict(), ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (key, data, expires_at) VALUES (?, ?, ?)", (key, data, now + self.ttl)
+            )
+            self._writes += 1
+            # 每写入一定次数清理一次，避免每次写入都扫描
+            if self._writes % 50 == 0:
+                self._conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE key IN (SELECT key FROM sessions ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM sessions WHERE expires_at >= ?", (time.time(),)).fetchone()[0]
+
+
+class RedisSessionStore:
+    """Redis（或兼容协议的服务）会话存储，可在多台机器的进程之间共享，过期由Redis的TTL实现"""
+
+    def __init__(self, url, ttl=300, prefix="readbrief:session:"):
+        if redis is None:
+            raise ImportError("使用redis会话存储需要安装redis")
+        self.ttl = ttl
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        pipe = self._client.pipeline()
+        pipe.get(self.prefix + key)
+        pipe.expire(self.prefix + key, self.ttl)
+        data, _ = pipe.execute()
+        if data is None:
+            return None
+        return Session.from_dict(json.loads(data))
+
+    def put(self, key, session):
+        self._client.set(self.prefix + key, json.dumps(session.to_dict(), ensure_ascii=False), ex=self.ttl)
+
+    def delete(self, key):
+        self._client.delete(self.prefix + key)
+
+
+def create_session_store(backend="memory", ttl=300, max_entries=1000, path="", redis_url=""):
+    """根据配置创建会话存储，共享存储不可用时回退到进程内存储"""
+    try:
+        if backend == "sqlite":
+            return SQLiteSessionStore(path, ttl=ttl, max_entries=max_entries)
+        if backend == "redis":
+            return RedisSessionStore(redis_url, ttl=ttl)
+    except Exception as e:
+        logger.error(f"[ReadBrief] 会话存储{backend}初始化失败，使用进程内存储: {e}")
+    return MemorySessionStore(ttl=ttl, max_entries=max_entries)
@@ -0,0 +1,175 @@
+from types import MappingProxyType
+
+from common.log import logger
+
+# 数值类配置接受int和float
+NUMBER = (int, float)
+
+# readbrief部分的配置项：(名称, 类型, 默认值, 可选值)
+READBRIEF_FIELDS = (
+    ("enabled", bool, False, None),
+    ("service", str, "gpt-3.5-turbo", None),
+    ("group", bool, True, None),
+    ("qa_enabled", bool, True, None),
+    ("qa_prefix", str, "问", None),
+    ("qa_max_turns", int, 5, None),
+    ("prompt", str, "", None),
+    ("card_enabled", bool, True, None),
+    ("card_api_url", str, "https://fireflycard-api.302ai.cn/api/saveImg", None),
+    ("card_renderer", str, "api", ("api", "local")),
+    ("card_font_path", str, "", None),
+    ("card_image_format", str, "png", ("png", "jpeg")),
+    ("card_api_scale", int, 3, None),
+    ("image_optimize_enabled", bool, True, None),
+    ("image_format", str, "auto", ("auto", "jpeg", "webp", "png")),
+    ("image_max_pixels", int, 2000000, None),
+    ("image_target_kb", NUMBER, 300, None),
+    ("card_cache_enabled", bool, True, None),
+    ("card_cache_max_mb", NUMBER, 200, None),
+    ("cache_enabled", bool, True, None),
+    ("cache_ttl", NUMBER, 86400, None),
+    ("cache_max_entries", int, 2000, None),
+    ("cache_max_mb", NUMBER, 200, None),
+    ("cache_dir", str, "", None),
+    ("article_cache_enabled", bool, True, None),
+    ("article_cache_fresh", NUMBER, 3600, None),
+    ("article_cache_ttl", NUMBER, 604800, None),
+    ("article_cache_max_entries", int, 5000, None),
+    ("article_cache_max_mb", NUMBER, 300, None),
+    ("prefetch_feeds", list, (), None),
+    ("prefetch_urls_file", str, "", None),
+    ("prefetch_interval", NUMBER, 1800, None),
+    ("prefetch_max_per_round", int, 30, None),
+    ("prefetch_concurrency", int, 2, None),
+    ("dedup_enabled", bool, True, None),
+    ("dedup_threshold", NUMBER, 0.8, None),
+    ("dedup_min_chars", int, 300, None),
+    ("dedup_ttl", NUMBER, 86400, None),
+    ("dedup_max_entries", int, 20000, None),
+    ("archive_enabled", bool, True, None),
+    ("archive_prefix", str, "查摘要", None),
+    ("archive_max_results", int, 5, None),
+    ("archive_reuse", bool, True, None),
+    ("fetch_max_mb", NUMBER, 5, None),
+    ("fetch_max_seconds", NUMBER, 20, None),
+    ("fetch_stop_chars", int, 50000, None),
+    ("pdf_enabled", bool, True, None),
+    ("pdf_max_mb", NUMBER, 20, None),
+    ("pdf_max_pages", int, 30, None),
+    ("coalesce_wait", NUMBER, 60, None),
+    ("session_backend", str, "memory", ("memory", "sqlite", "redis")),
+    ("session_ttl", NUMBER, 300, None),
+    ("session_max_entries", int, 1000, None),
+    ("session_redis_url", str, "redis://127.0.0.1:6379/0", None),
+    ("async_enabled", bool, False, None),
+    ("async_workers", int, 4, None),
+    ("async_queue_size", int, 20, None),
+    ("async_overload", str, "reject", ("reject", "sync")),
+    ("async_ack_text", str, "🔍 正在阅读文章，请稍候...", None),
+    ("async_busy_text", str, "当前排队的文章较多，请稍后再试", None),
+    ("rate_limit_user", NUMBER, 0, None),
+    ("rate_limit_group", NUMBER, 0, None),
+    ("rate_limit_global", NUMBER, 0, None),
+    ("rate_limit_max_delay", NUMBER, 60, None),
+    ("rate_limit_text", str, "请求太频繁了，请稍后再试", None),
+    ("metrics_port", int, 0, None),
+    ("metrics_host", str, "127.0.0.1", None),
+    ("metrics_dump_interval", NUMBER, 0, None),
+    ("warmup_enabled", bool, True, None),
+    ("http_max_retries", int, 3, None),
+    ("http_timeouts", dict, {}, None),
+    ("failover", list, (), None),
+    ("llm_stream", bool, True, None),
+    ("llm_first_token_timeout", NUMBER, 20, None),
+    ("llm_max_generation_time", NUMBER, 90, None),
+    ("circuit_enabled", bool, True, None),
+    ("circuit_window", NUMBER, 60, None),
+    ("circuit_min_requests", int, 5, None),
+    ("circuit_error_rate", NUMBER, 0.5, None),
+    ("circuit_open_seconds", NUMBER, 30, None),
+    ("circuit_card_slow_seconds", NUMBER, 15, None),
+    ("circuit_llm_slow_seconds", NUMBER, 15, None),
+    ("llm_json_mode", bool, False, None),
+    ("progressive_enabled", bool, False, None),
+    ("progressive_min_interval", NUMBER, 1.5, None),
+    ("max_input_tokens", int, 6000, None),
+    ("chunk_tokens", int, 3000, None),
+    ("max_chunks", int, 8, None),
+    ("map_concurrency", int, 4, None),
+    ("digest_enabled", bool, True, None),
+    ("digest_prefix", str, "汇总", None),
+    ("digest_window", NUMBER, 1800, None),
+    ("digest_min_urls", int, 2, None),
+    ("digest_max_urls", int, 15, None),
+    ("digest_max_input_tokens", int, 12000, None),
+    ("digest_min_article_tokens", int, 600, None),
+    ("digest_fetch_concurrency", int, 8, None),
+    ("digest_prompt", str, "", None),
+)
+
+# keys部分的配置项
+KEY_FIELDS = (
+    ("open_ai_api_key", str, "", None),
+    ("model", str, "gpt-3.5-turbo", None),
+    ("open_ai_api_base", str, "https://api.openai.com/v1", None),
+    ("gemini_key", str, "", None),
+    ("gemini_model", str, "gemini-1.5-flash", None),
+    ("azure_deployment_id", str, "", None),
+    ("azure_api_key", str, "", None),
+    ("azure_api_base", str, "", None),
+    ("azure_api_version", str, "2023-05-15", None),
+)
+
+
+def _freeze(value):
+    """列表转为元组、字典转为只读映射，配置加载后不会被意外修改"""
+    if isinstance(value, (list, tuple)):
+        return tuple(value)
+    if isinstance(value, dict):
+        return MappingProxyType(dict(value))
+    return value
+
+
+def _validate(section, name, kind, default, choices, value):
+    """返回校验后的值，类型不符、数值为负或不在可选值中时记录警告并使用默认值"""
+    # bool是int的子类，数值类配置不接受true/false
+    valid = isinstance(value, kind) and not (kind is not bool and isinstance(value, bool))
+    if valid and kind in (int, NUMBER) and value < 0:
+        valid = False
+    if valid and choices and value not in choices:
+        valid = False
+    if not valid:
+        logger.warning(f"[ReadBrief] 配置{section}.{name}的值{value!r}无效，使用默认值{default!r}")
+        return _freeze(default)
+    return _freeze(value)
+
+
+class Settings:
+    """
+    插件配置
+
+    初始化时按READBRIEF_FIELDS和KEY_FIELDS校验一次，未配置的项使用默认值，未知的配置项记录警告；之后不可修改。
+    """
+
+    __slots__ = tuple(field[0] for field in READBRIEF_FIELDS + KEY_FIELDS)
+
+    def __init__(self, config):
+        for section, fields in (("readbrief", READBRIEF_FIELDS), ("keys", KEY_FIELDS)):
+            values = config.get(section) or {}
+            known = set()
+            for name, kind, default, choices in fields:
+                known.add(name)
+                if name in values:
+                    value = _validate(section, name, kind, default, choices, values[name])
+                else:
+                    value = _freeze(default)
+                object.__setattr__(self, name, value)
+            for name in values:
+                if name not in known:
+                    logger.warning(f"[ReadBrief] 未知的配置项{section}.{name}，已忽略")
+
+    def __setattr__(self, name, value):
+        raise AttributeError("配置加载后不可修改")
+
+    def __delattr__(self, name):
+        raise AttributeError("配置加载后不可修改")
@@ -0,0 +1,65 @@
+import threading
+
+from common.log import logger
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "waiters")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并相同键的并发请求
+
+    同一个键同时只有一个调用在执行，其余并发调用等待它的结果；等待超时后各自执行。
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        """执行fn或等待正在执行的同键调用，返回(结果, 是否为共享结果)"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+
+        if not leader:
+            if call.event.wait(self.timeout):
+                with self._lock:
+                    self.shared += 1
+                if call.error is not None:
+                    raise call.error
+                return call.result, True
+            logger.warning(f"[ReadBrief] 等待相同请求超时({self.timeout}s)，单独处理")
+            return fn(), False
+
+        try:
+            call.result = fn()
+            return call.result, False
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+            if call.waiters:
+                logger.info(f"[ReadBrief] 合并了{call.waiters}个相同的并发请求")
+
+    def in_flight(self):
+        """正在执行的调用数"""
+        with self._lock:
+            return len(self._calls)
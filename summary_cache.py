@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from common.log import logger
+
+from .url_router import canonicalize
+
+
+def make_config_hash(prompt, model, service):
+    """提示词、模型和服务的哈希，任一项变化时需要重新生成摘要"""
+    return hashlib.sha256(f"{service}\x00{model}\x00{prompt}".encode("utf-8")).hexdigest()
+
+
+def make_cache_key(url, prompt, model, service):
+    """根据规范化URL（去掉跟踪参数）和提示词、模型、服务的哈希生成缓存键"""
+    config_hash = make_config_hash(prompt, model, service)
+    return hashlib.sha256(f"{canonicalize(url)}\x00{config_hash}".encode("utf-8")).hexdigest()
+
+
+class SummaryCache:
+    """
+    摘要缓存：以SQLite持久化保存summary_data和卡片图片
+
+    - 重启后仍然有效
+    - 按TTL过期，超出条目数或容量上限时按最近访问时间(LRU)淘汰
+    """
+
+    def __init__(self, path, ttl=86400, max_entries=2000, max_bytes=200 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS summaries ("
+            "key TEXT PRIMARY KEY, url TEXT, summary TEXT, card BLOB, "
+            "size INTEGER, created_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_summaries_accessed ON summaries(accessed_at)")
+        self._conn.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """读取缓存，返回(summary_data, card_bytes)，未命中或已过期时返回None"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, card, created_at FROM summaries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[2] > self.ttl:
+                if row is not None:
+                    self._conn.execute("DELETE FROM summaries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE summaries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0]), row[1]
+
+    def put(self, key, url, summary_data, card_bytes=None):
+        """写入缓存并执行淘汰"""
+        summary = json.dumps(summary_data, ensure_ascii=False)
+        size = len(summary.encode("utf-8")) + (len(card_bytes) if card_bytes else 0)
+        if size > self.max_bytes:
+            logger.warning(f"[ReadBrief] 缓存条目过大，跳过写入: {size} bytes")
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO summaries (key, url, summary, card, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, url, summary, card_bytes, size, now, now),
+            )
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now):
+        """删除过期条目，并按LRU淘汰直到满足条目数和容量上限"""
+        self._conn.execute("DELETE FROM summaries WHERE created_at < ?", (now - self.ttl,))
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM summaries").fetchone()
+        while count > self.max_entries or total > self.max_bytes:
+            row = self._conn.execute(
+                "SELECT key, size FROM summaries ORDER BY accessed_at ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._conn.execute("DELETE FROM summaries WHERE key = ?", (row[0],))
+            count -= 1
+            total -= row[1]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,304 @@
+import json
+import re
+import threading
+
+import json5
+
+from common.log import logger
+
+FENCE_RE = re.compile(r'```(?:json|JSON)?\s*(.*?)(?:```|$)', re.DOTALL)
+POINT_PREFIX_RE = re.compile(r'^\s*(?:[-*•]|\d+[.、)）]|\d️⃣)\s*')
+MARKDOWN_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+
+
+class Summary:
+    """结构化摘要，文本回复和卡片渲染都直接使用该对象"""
+
+    __slots__ = ("title", "summary", "key_points", "comment", "tags", "read_time", "source")
+
+    def __init__(self, title="", summary="", key_points=None, comment="", tags="", read_time="", source=""):
+        self.title = title
+        self.summary = summary
+        self.key_points = key_points or []
+        self.comment = comment
+        self.tags = tags
+        self.read_time = read_time
+        self.source = source
+
+    @classmethod
+    def from_dict(cls, data, title="", source=""):
+        """从模型返回的字典构造，字段类型不规范时尽量修正；title和source为字典中缺失时的默认值"""
+        return cls(
+            title=_text(data.get("title")) or title,
+            summary=_text(data.get("summary")),
+            key_points=_points(data.get("key_points")),
+            comment=_text(data.get("comment")),
+            tags=_tags(data.get("tags")),
+            read_time=_text(data.get("read_time")),
+            source=_text(data.get("source")) or source,
+        )
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def is_empty(self):
+        return not (self.summary or self.key_points or self.comment)
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "、".join(_text(v) for v in value if v)
+    return MARKDOWN_BOLD_RE.sub(r"\1", str(value)).strip()
+
+
+def _points(value):
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split("\n")
+    points = []
+    for point in value:
+        if isinstance(point, dict):
+            # 部分模型会返回[{"point": "..."}]或[{"title": "...", "content": "..."}]
+            point = "：".join(_text(v) for v in point.values() if v)
+        point = POINT_PREFIX_RE.sub("", _text(point))
+        if point:
+            points.append(point)
+    return points
+
+
+def _tags(value):
+    if isinstance(value, (list, tuple)):
+        return "、".join(_text(v).lstrip("#") for v in value if v)
+    return _text(value)
+
+
+def _close_partial(text):
+    """补全被截断的JSON：闭合未结束的字符串、对象和数组"""
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in "{[":
+            stack.append("}" if char == "{" else "]")
+        elif char in "}]" and stack:
+            stack.pop()
+    repaired = text
+    if escaped:
+        repaired = repaired[:-1]
+    if in_string:
+        repaired += '"'
+    repaired = repaired.rstrip().rstrip(",")
+    if repaired.endswith(":"):
+        repaired += ' ""'
+    return repaired + "".join(reversed(stack))
+
+
+class StreamingFieldParser:
+    """
+    增量解析流式输出的JSON对象
+
+    每次feed只扫描新增的文本，顶层字段的值一结束（字符串的右引号、数组或对象的右括号、数字后的逗号）
+    就解析该字段并返回，不必等待整个JSON输出完成。JSON之前的代码块标记或说明文字会被忽略。
+    """
+
+    def __init__(self):
+        self.fields = {}
+        self.reset()
+
+    def reset(self):
+        """丢弃已接收的文本，重新开始解析（如切换大模型服务后），已解析的字段保留"""
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._member_start = 0
+        self._has_colon = False
+        self._member_done = False
+
+    def feed(self, delta):
+        """输入增量文本，返回本次新解析出的顶层字段{名称: 值}"""
+        self._buffer += delta
+        completed = {}
+        buffer = self._buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._has_colon:
+                        self._complete(i + 1, completed)
+                continue
+            if self._depth == 0:
+                # 顶层对象之前的文字不参与解析
+                if char == "{":
+                    self._depth = 1
+                    self._start_member(i + 1)
+                continue
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._has_colon:
+                    self._complete(i + 1, completed)
+                elif self._depth == 0:
+                    self._complete(i, completed)
+            elif self._depth == 1:
+                if char == ":":
+                    self._has_colon = True
+                elif char == ",":
+                    self._complete(i, completed)
+                    self._start_member(i + 1)
+        self._pos = len(buffer)
+        return completed
+
+    def _start_member(self, start):
+        self._member_start = start
+        self._has_colon = False
+        self._member_done = False
+
+    def _complete(self, end, completed):
+        """解析当前顶层字段，同一字段只解析一次"""
+        if self._member_done or not self._has_colon:
+            return
+        self._member_done = True
+        member = "{" + self._buffer[self._member_start:end].strip() + "}"
+        try:
+            data = json.loads(member)
+        except ValueError:
+            try:
+                data = json5.loads(member)
+            except Exception:
+                return
+        if isinstance(data, dict):
+            for name, value in data.items():
+                if name not in self.fields:
+                    completed[name] = value
+                self.fields[name] = value
+
+
+class SummaryParser:
+    """
+    容错的摘要解析
+
+    依次处理代码块包裹、前后多余文字、尾逗号等非标准JSON，以及输出被截断的不完整JSON，并统计解析结果。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stats = {"ok": 0, "repaired": 0, "failed": 0}
+
+    def parse(self, text, title="", source=""):
+        """解析模型输出，成功返回Summary，无法解析时返回None"""
+        data, status = self._parse_dict(text or "")
+        with self._lock:
+            self.stats[status] += 1
+        if data is None:
+            logger.warning(f"[ReadBrief] 摘要JSON解析失败，解析统计: {self.stats}")
+            return None
+        if status == "repaired":
+            logger.info("[ReadBrief] 摘要JSON不规范，已修复解析")
+        summary = Summary.from_dict(data, title=title, source=source)
+        return None if summary.is_empty() else summary
+
+    def parse_many(self, text, defaults):
+        """
+        解析多篇文章的汇总输出{"title": ..., "articles": [...]}，defaults为每篇的(标题, 来源)默认值；
+        返回(汇总标题, Summary列表)，列表与defaults一一对应，缺失或为空的文章对应None
+        """
+        text = (text or "").strip()
+        fence = FENCE_RE.search(text)
+        if fence:
+            text = fence.group(1).strip()
+        if text.startswith("["):
+            # 部分模型直接返回文章数组
+            text = '{"articles": ' + text + "}"
+        data, status = self._parse_dict(text)
+        items = data.get("articles") if data else None
+        if not isinstance(items, list):
+            status = "failed"
+        with self._lock:
+            self.stats[status] += 1
+        if status == "failed":
+            logger.warning(f"[ReadBrief] 汇总JSON解析失败，解析统计: {self.stats}")
+            return "", [None] * len(defaults)
+
+        summaries = [None] * len(defaults)
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            # 优先按模型返回的序号对应文章，序号无效时按出现顺序
+            try:
+                index = int(item.get("index")) - 1
+            except (TypeError, ValueError):
+                index = position
+            if not 0 <= index < len(defaults):
+                index = position
+            if index >= len(defaults) or summaries[index] is not None:
+                continue
+            title, source = defaults[index]
+            summary = Summary.from_dict(item, title=title, source=source)
+            summaries[index] = None if summary.is_empty() else summary
+        return _text(data.get("title")), summaries
+
+    def _parse_dict(self, text):
+        text = text.strip()
+        try:
+            data = json.loads(text)
+            if isinstance(data, dict):
+                return data, "ok"
+        except ValueError:
+            pass
+
+        # 去掉```json代码块
+        fence = FENCE_RE.search(text)
+        if fence:
+            text = fence.group(1).strip()
+        start = text.find("{")
+        if start < 0:
+            return None, "failed"
+        text = text[start:]
+
+        # 忽略JSON之后的多余文字
+        try:
+            data, _ = json.JSONDecoder().raw_decode(text)
+            if isinstance(data, dict):
+                return data, "repaired"
+        except ValueError:
+            pass
+
+        # 尾逗号、单引号等非标准JSON
+        end = text.rfind("}")
+        candidates = [text[:end + 1]] if end > 0 else []
+        # 被截断的JSON：直接补全；末尾是悬空的键时补空值；仍失败时丢弃最后一个不完整字段
+        candidates += [_close_partial(text), _close_partial(text + ': ""')]
+        comma = text.rfind(",")
+        if comma > 0:
+            candidates.append(_close_partial(text[:comma]))
+        for candidate in candidates:
+            try:
+                data = json5.loads(candidate)
+                if isinstance(data, dict):
+                    return data, "repaired"
+            except Exception:
+                continue
+        return None, "failed"
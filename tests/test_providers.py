@@ -0,0 +1,80 @@
+from ..http_client import HttpClient
+from ..providers import CompletionResult, LLMProvider, OpenAIProvider, ProviderRouter
+
+
+class StubResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class StubSession:
+    """每次请求都返回同一个状态码"""
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        return StubResponse(self.status_code, "rate limited", self.headers)
+
+
+class StubProvider(LLMProvider):
+    name = "stub"
+
+    def __init__(self):
+        super().__init__(None, "stub-model")
+        self.calls = 0
+
+    def complete(self, messages, max_tokens=1000, temperature=0.7, on_delta=None, json_mode=False):
+        self.calls += 1
+        return CompletionResult("ok", self.name, self.model, 0.01, 0.01)
+
+
+def no_sleep(delay):
+    raise AssertionError(f"不应等待重试: {delay}")
+
+
+def test_rate_limited_provider_fails_over_without_retrying(monkeypatch):
+    monkeypatch.setattr("time.sleep", no_sleep)
+    http = HttpClient(max_retries=3)
+    session = StubSession(429, {"Retry-After": "30"})
+    http._session = session
+    fallback = StubProvider()
+    router = ProviderRouter([OpenAIProvider(http, "key", "http://llm.invalid/v1", "gpt-4o", stream=False), fallback])
+
+    result = router.complete([{"role": "user", "content": "hi"}])
+
+    assert result.provider == "stub"
+    assert session.calls == 1
+    assert fallback.calls == 1
+    assert router.stats()["openai"]["failures"] == 1
+
+
+def test_streaming_provider_fails_over_on_server_error(monkeypatch):
+    monkeypatch.setattr("time.sleep", no_sleep)
+    http = HttpClient(max_retries=3)
+    session = StubSession(503)
+    http._session = session
+    fallback = StubProvider()
+    router = ProviderRouter([OpenAIProvider(http, "key", "http://llm.invalid/v1", "gpt-4o"), fallback])
+
+    assert router.complete([{"role": "user", "content": "hi"}]).provider == "stub"
+    assert session.calls == 1
+
+
+def test_other_endpoints_keep_retrying(monkeypatch):
+    delays = []
+    monkeypatch.setattr("time.sleep", delays.append)
+    http = HttpClient(max_retries=2, backoff_base=0.01)
+    http._session = StubSession(503)
+
+    assert http.get("http://card.invalid/", "card").status_code == 503
+    assert http._session.calls == 3
+    assert len(delays) == 2
@@ -0,0 +1,22 @@
+from ..rate_limiter import RateLimiter, TokenBucket
+
+
+def test_new_bucket_starts_full():
+    bucket = TokenBucket(1 / 60.0, 1, now=100.0)
+    assert bucket.delay(99.0) == 0.0
+    assert bucket.tokens == 1.0
+
+
+def test_first_request_of_new_user_is_allowed():
+    limiter = RateLimiter(user_per_minute=1)
+    assert limiter.acquire("alice") == 0.0
+    assert limiter.acquire("bob") == 0.0
+    assert limiter.acquire("bob") is None
+    assert limiter.stats() == {"allowed": 2, "delayed": 0, "rejected": 1}
+
+
+def test_first_request_is_not_delayed_in_async_mode():
+    limiter = RateLimiter(user_per_minute=1, group_per_minute=1)
+    assert limiter.acquire("alice", "g1", max_delay=120.0) == 0.0
+    assert limiter.acquire("bob", "g2", max_delay=120.0) == 0.0
+    assert limiter.acquire("bob", "g2", max_delay=120.0) > 0
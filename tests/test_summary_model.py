@@ -0,0 +1,116 @@
+import json
+
+from ..summary_model import StreamingFieldParser, Summary, SummaryParser
+
+SUMMARY = {
+    "title": "大模型推理优化",
+    "summary": "介绍了降低推理延迟的方法",
+    "key_points": ["1. 批处理", "2. **KV缓存**"],
+    "comment": "值得一读",
+    "tags": ["#AI", "#推理"],
+}
+SUMMARY_JSON = json.dumps(SUMMARY, ensure_ascii=False)
+
+
+def test_plain_json():
+    parser = SummaryParser()
+    summary = parser.parse(SUMMARY_JSON, title="默认标题", source="example.com")
+    assert summary.title == "大模型推理优化"
+    assert summary.key_points == ["批处理", "KV缓存"]
+    assert summary.tags == "AI、推理"
+    assert summary.source == "example.com"
+    assert parser.stats == {"ok": 1, "repaired": 0, "failed": 0}
+
+
+def test_fenced_json():
+    parser = SummaryParser()
+    summary = parser.parse(f"```json\n{SUMMARY_JSON}\n```")
+    assert summary.summary == "介绍了降低推理延迟的方法"
+    assert parser.stats["repaired"] == 1
+
+
+def test_prose_before_and_after_json():
+    summary = SummaryParser().parse(f"好的，以下是摘要：\n{SUMMARY_JSON}\n希望对你有帮助。")
+    assert summary.comment == "值得一读"
+    assert summary.key_points == ["批处理", "KV缓存"]
+
+
+def test_non_standard_json():
+    text = "{'title': '标题', 'summary': '一句话', 'key_points': ['要点',],}"
+    summary = SummaryParser().parse(text)
+    assert summary.title == "标题"
+    assert summary.key_points == ["要点"]
+
+
+def test_truncated_json():
+    text = '{"title": "标题", "summary": "一句话总结", "key_points": ["第一点", "第二'
+    summary = SummaryParser().parse(text)
+    assert summary.summary == "一句话总结"
+    assert summary.key_points == ["第一点", "第二"]
+
+
+def test_truncated_after_key():
+    summary = SummaryParser().parse('{"title": "标题", "summary": "一句话总结", "comment"')
+    assert summary.summary == "一句话总结"
+    assert summary.comment == ""
+
+
+def test_malformed_output_fails():
+    parser = SummaryParser()
+    assert parser.parse("抱歉，我无法访问该链接。") is None
+    assert parser.parse('{"title": "只有标题"}') is None
+    assert parser.parse("") is None
+    assert parser.stats["failed"] == 2
+    assert parser.stats["ok"] == 1
+
+
+def test_from_dict_round_trip():
+    summary = Summary.from_dict(SUMMARY)
+    assert Summary.from_dict(summary.to_dict()).to_dict() == summary.to_dict()
+
+
+def test_parse_many_by_index():
+    text = json.dumps({"title": "汇总", "articles": [
+        {"index": 2, "title": "第二篇", "summary": "二"},
+        {"index": 1, "summary": "一"},
+    ]}, ensure_ascii=False)
+    title, summaries = SummaryParser().parse_many(f"```json\n{text}\n```", [("默认一", "a.com"), ("默认二", "b.com"), ("默认三", "c.com")])
+    assert title == "汇总"
+    assert summaries[0].title == "默认一"
+    assert summaries[0].source == "a.com"
+    assert summaries[1].title == "第二篇"
+    assert summaries[2] is None
+
+
+def test_parse_many_bare_array_and_failure():
+    parser = SummaryParser()
+    title, summaries = parser.parse_many('[{"summary": "一"}, {"summary": "二"}]', [("", ""), ("", "")])
+    assert title == ""
+    assert [s.summary for s in summaries] == ["一", "二"]
+    assert parser.parse_many("无法汇总", [("", "")]) == ("", [None])
+
+
+def test_streaming_fields_complete_incrementally():
+    parser = StreamingFieldParser()
+    events = []
+    text = "```json\n" + json.dumps({"title": "标题", "summary": "一句话", "key_points": ["甲", "乙"], "score": 3}, ensure_ascii=False) + "\n```"
+    for i in range(0, len(text), 3):
+        completed = parser.feed(text[i:i + 3])
+        events.extend(completed.items())
+    assert events == [("title", "标题"), ("summary", "一句话"), ("key_points", ["甲", "乙"]), ("score", 3)]
+    assert parser.fields["key_points"] == ["甲", "乙"]
+
+
+def test_streaming_field_waits_for_closing_quote():
+    parser = StreamingFieldParser()
+    assert parser.feed('{"summary": "一句') == {}
+    assert parser.feed('话", "key_points": ["甲"') == {"summary": "一句话"}
+    assert parser.feed("]") == {"key_points": ["甲"]}
+
+
+def test_streaming_reset_keeps_parsed_fields():
+    parser = StreamingFieldParser()
+    parser.feed('{"title": "标题", "summary": "半')
+    parser.reset()
+    assert parser.feed('{"title": "标题", "summary": "完整"}') == {"summary": "完整"}
+    assert parser.fields == {"title": "标题", "summary": "完整"}
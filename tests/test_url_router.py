@@ -0,0 +1,92 @@
+import pytest
+
+from ..url_router import FETCH_DIRECT, FETCH_JINA, HOST_RULES, canonicalize, extract_urls, leading_url, route
+
+WECHAT = "https://mp.weixin.qq.com/s?__biz=MzA&mid=2650&idx=1&sn=abc"
+
+CANONICAL_CASES = [
+    # 通用规则：协议和域名小写、去掉默认端口、片段和utm_参数，其余参数保持原样
+    ("HTTPS://Example.COM:443/Path?a=1#top", "https://example.com/Path?a=1"),
+    ("http://example.com:80", "http://example.com/"),
+    ("http://example.com:8080/x", "http://example.com:8080/x"),
+    ("https://example.com/x?utm_source=wx&id=3&utm_medium=share", "https://example.com/x?id=3"),
+    ("https://example.com/x?b=2&a=1", "https://example.com/x?b=2&a=1"),
+    ("  https://example.com/x  ", "https://example.com/x"),
+    # 微信文章只保留__biz、mid、idx、sn
+    (WECHAT + "&chksm=ff&scene=21&sessionid=1&key=k&pass_ticket=t#rd", WECHAT),
+    ("https://support.weixin.qq.com/update?from=x", "https://support.weixin.qq.com/update?from=x"),
+    # 知乎去掉share_code和utm_参数，子域名沿用上级域名的规则
+    ("https://www.zhihu.com/question/1/answer/2?share_code=x&utm_psn=1&utm_oi=2&page=3",
+     "https://www.zhihu.com/question/1/answer/2?page=3"),
+    ("https://zhuanlan.zhihu.com/p/1?share_code=x", "https://zhuanlan.zhihu.com/p/1"),
+    # 头条
+    ("https://www.toutiao.com/article/1/?app=news_article&timestamp=1&share_token=t&tt_from=wx"
+     "&use_new_style=1&upstream_biz=x&wid=9", "https://www.toutiao.com/article/1/?wid=9"),
+    # 其他站点不去掉同名参数
+    ("https://example.com/x?share_code=1&chksm=2", "https://example.com/x?share_code=1&chksm=2"),
+    ("https://x.com/user/status/1?s=20&utm_source=x", "https://x.com/user/status/1?s=20"),
+]
+
+
+@pytest.mark.parametrize("url, expected", CANONICAL_CASES)
+def test_canonicalize(url, expected):
+    assert canonicalize(url) == expected
+    assert route(url).key == expected
+
+
+@pytest.mark.parametrize("url, fetch, unsupported", [
+    ("https://finder.video.qq.com/251/20302/stodownload?x=1", FETCH_DIRECT, "视频号"),
+    ("https://channels.weixin.qq.com/web/pages/feed", FETCH_DIRECT, "视频号"),
+    ("https://support.weixin.qq.com/update/index", FETCH_DIRECT, "微信更新提示"),
+    ("https://support.weixin.qq.com/security/readtemplate", FETCH_DIRECT, "微信安全提示"),
+    ("https://support.weixin.qq.com/cgi-bin/help", FETCH_DIRECT, ""),
+    ("https://mp.weixin.qq.com/mp/waerrpage?appid=1", FETCH_DIRECT, "小程序"),
+    (WECHAT, FETCH_DIRECT, ""),
+    ("https://www.zhihu.com/question/1", FETCH_DIRECT, ""),
+    ("https://www.toutiao.com/article/1/", FETCH_DIRECT, ""),
+    ("https://x.com/user/status/1", FETCH_JINA, ""),
+    ("https://mobile.twitter.com/user/status/1", FETCH_JINA, ""),
+    ("https://weibo.com/1/abc", FETCH_JINA, ""),
+    ("https://m.weibo.cn/status/1", FETCH_JINA, ""),
+    ("https://example.com/a", FETCH_DIRECT, ""),
+    ("http://[::1", FETCH_DIRECT, "无法解析的链接"),
+])
+def test_route(url, fetch, unsupported):
+    target = route(url)
+    assert target.fetch == fetch
+    assert target.unsupported == unsupported
+
+
+def test_every_host_rule_is_covered():
+    hosts = {route(url).host for url, _ in CANONICAL_CASES}
+    hosts |= {route(url).host for url in ("https://finder.video.qq.com/", "https://channels.weixin.qq.com/",
+                                           "https://twitter.com/", "https://weibo.com/", "https://m.weibo.cn/")}
+    for host in HOST_RULES:
+        assert any(h == host or h.endswith("." + host) for h in hosts), host
+
+
+def test_route_fetches_original_url():
+    url = "https://www.zhihu.com/question/1?utm_psn=1&page=2#answer"
+    target = route(url)
+    assert target.url == url
+    assert target.key == "https://www.zhihu.com/question/1?page=2"
+    assert target.host == "www.zhihu.com"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("https://example.com/a 这篇不错", "https://example.com/a"),
+    ("http://example.com/a?b=1\n第二行", "http://example.com/a?b=1"),
+    ("看看 https://example.com/a", None),
+    ("普通文本", None),
+    ("https://", None),
+])
+def test_leading_url(text, expected):
+    assert leading_url(text) == expected
+
+
+def test_extract_urls():
+    text = ("第一篇https://example.com/a?utm_source=wx，第二篇 https://Example.com/a 和"
+            "(https://example.com/b). 还有https://example.com/c。")
+    assert extract_urls(text) == ["https://example.com/a?utm_source=wx", "https://example.com/b", "https://example.com/c"]
+    assert extract_urls(text, limit=2) == ["https://example.com/a?utm_source=wx", "https://example.com/b"]
+    assert extract_urls("没有链接") == []
@@ -0,0 +1,150 @@
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+# 消息开头的链接
+LEADING_URL_RE = re.compile(r'https?://(?:[-\w.]|(?:%[\da-fA-F]{2}))+[^\s]*')
+# 消息中的链接：遇到空白、中文字符或中文标点即结束，便于从"链接+中文说明"混排的消息中逐个提取
+URL_RE = re.compile(r'https?://[^\s<>"\'\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]+')
+URL_TRAILING = '.,;:!?)]}\''
+
+# 抓取方式：direct为直接下载并提取正文，失败时回退到jina；jina为直接使用jina（需要执行脚本才能显示正文的站点）
+FETCH_DIRECT = "direct"
+FETCH_JINA = "jina"
+
+# 所有站点都去掉的跟踪参数前缀
+TRACKING_PREFIXES = ("utm_",)
+# 微信文章链接中与内容无关的参数，保留__biz、mid、idx、sn即可定位文章
+WECHAT_TRACKING = frozenset((
+    "chksm", "scene", "subscene", "sessionid", "clicktime", "enterid", "ascene", "devicetype", "version",
+    "nettype", "lang", "exportkey", "pass_ticket", "wx_header", "key", "poc_token", "sharer_shareid",
+    "sharer_sharetime", "srcid", "from", "isappinstalled", "realreporttime", "mpshare", "share_token",
+))
+
+
+class HostRule:
+    """站点规则：不支持的原因、不支持的路径前缀、需要去掉的参数和抓取方式"""
+
+    __slots__ = ("unsupported", "unsupported_paths", "strip", "fetch")
+
+    def __init__(self, unsupported="", unsupported_paths=(), strip=(), fetch=FETCH_DIRECT):
+        self.unsupported = unsupported
+        self.unsupported_paths = unsupported_paths
+        self.strip = frozenset(strip)
+        self.fetch = fetch
+
+
+DEFAULT_RULE = HostRule()
+
+# 按域名索引的规则表，子域名未单独列出时使用上级域名的规则
+HOST_RULES = {
+    "finder.video.qq.com": HostRule(unsupported="视频号"),
+    "channels.weixin.qq.com": HostRule(unsupported="视频号"),
+    "support.weixin.qq.com": HostRule(unsupported_paths=(("/update", "微信更新提示"), ("/security", "微信安全提示"))),
+    "mp.weixin.qq.com": HostRule(unsupported_paths=(("/mp/waerrpage", "小程序"),), strip=WECHAT_TRACKING),
+    "zhihu.com": HostRule(strip=("share_code",)),
+    "toutiao.com": HostRule(strip=("app", "timestamp", "share_token", "tt_from", "use_new_style", "upstream_biz")),
+    "x.com": HostRule(fetch=FETCH_JINA),
+    "twitter.com": HostRule(fetch=FETCH_JINA),
+    "weibo.com": HostRule(fetch=FETCH_JINA),
+    "m.weibo.cn": HostRule(fetch=FETCH_JINA),
+}
+
+
+class Route:
+    """
+    链接的处理方式：用于抓取的原始URL、用作缓存和去重键的规范化URL、域名、抓取方式，以及不支持时的原因；
+    部分站点需要被规范化去掉的参数才能返回正确的页面，因此抓取时使用原始URL
+    """
+
+    __slots__ = ("url", "key", "host", "fetch", "unsupported")
+
+    def __init__(self, url, key, host, fetch=FETCH_DIRECT, unsupported=""):
+        self.url = url
+        self.key = key
+        self.host = host
+        self.fetch = fetch
+        self.unsupported = unsupported
+
+
+def host_rule(host):
+    """查找域名规则，依次尝试完整域名和各级上级域名"""
+    rule = HOST_RULES.get(host)
+    while rule is None and "." in host:
+        host = host.split(".", 1)[1]
+        rule = HOST_RULES.get(host)
+    return rule or DEFAULT_RULE
+
+
+def _split(url):
+    """返回(协议, 小写域名含端口, 路径, 查询串)，无法解析时返回None"""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme == "http" and netloc.endswith(":80")) or (scheme == "https" and netloc.endswith(":443")):
+        netloc = netloc.rsplit(":", 1)[0]
+    return scheme, netloc, parts.path or "/", parts.query
+
+
+def _canonical(scheme, netloc, path, query, rule):
+    if query:
+        # 按原样保留其余参数的编码和顺序
+        params = []
+        for param in query.split("&"):
+            name = param.split("=", 1)[0]
+            if name and name not in rule.strip and not name.startswith(TRACKING_PREFIXES):
+                params.append(param)
+        query = "&".join(params)
+    return urlunsplit((scheme, netloc, path, query, ""))
+
+
+def canonicalize(url):
+    """规范化URL：统一协议和域名大小写，去掉默认端口、片段和跟踪参数，用作缓存和会话的键"""
+    parts = _split(url or "")
+    if parts is None:
+        return (url or "").strip()
+    scheme, netloc, path, query = parts
+    return _canonical(scheme, netloc, path, query, host_rule(netloc.split(":", 1)[0]))
+
+
+def route(url):
+    """返回链接的Route"""
+    parts = _split(url)
+    if parts is None:
+        return Route(url.strip(), url.strip(), "", unsupported="无法解析的链接")
+    scheme, netloc, path, query = parts
+    host = netloc.split(":", 1)[0]
+    rule = host_rule(host)
+    unsupported = rule.unsupported
+    for prefix, reason in rule.unsupported_paths:
+        if path.startswith(prefix):
+            unsupported = reason
+            break
+    return Route(url.strip(), _canonical(scheme, netloc, path, query, rule), host, rule.fetch, unsupported)
+
+
+def leading_url(text):
+    """消息以链接开头时返回该链接，否则返回None；不含链接的普通文本不执行正则"""
+    if not text.startswith(("http://", "https://")):
+        return None
+    match = LEADING_URL_RE.match(text)
+    return match.group(0) if match else None
+
+
+def extract_urls(text, limit=None):
+    """按出现顺序提取消息中的所有链接，规范化后相同的链接只保留第一个，返回原始链接"""
+    if "://" not in text:
+        return []
+    urls = []
+    seen = set()
+    for match in URL_RE.finditer(text):
+        url = match.group(0).rstrip(URL_TRAILING)
+        key = canonicalize(url)
+        if key not in seen:
+            seen.add(key)
+            urls.append(url)
+            if limit and len(urls) >= limit:
+                break
+    return urls
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+from common.log import logger
+
+
+class WorkerPool:
+    """
+    有界工作线程池
+
+    固定数量的工作线程从有界队列中取任务执行，队列已满时submit立即返回False，
+    由调用方决定拒绝还是同步处理。任务按key（如群聊ID）分组排队，工作线程在各组之间轮流取任务，
+    避免一个群的大量任务拖慢其他群。
+    """
+
+    def __init__(self, max_workers=4, queue_size=20, name="ReadBrief"):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self._queues = OrderedDict()
+        self._pending = 0
+        self._active = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._wait_count = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._threads = []
+        for i in range(max_workers):
+            thread = threading.Thread(target=self._worker, name=f"{name}-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, key="", **kwargs):
+        """提交任务，队列已满时返回False"""
+        with self._cond:
+            if self._closed or self._pending >= self.queue_size:
+                return False
+            queue = self._queues.get(key)
+            if queue is None:
+                queue = self._queues[key] = deque()
+            queue.append((time.monotonic(), fn, args, kwargs))
+            self._pending += 1
+            self._cond.notify()
+            return True
+
+    def stats(self):
+        """返回排队深度和排队等待时间统计"""
+        with self._cond:
+            return {
+                "pending": self._pending,
+                "active": self._active,
+                "groups": len(self._queues),
+                "avg_wait": round(self._wait_total / self._wait_count, 3) if self._wait_count else 0.0,
+                "max_wait": round(self._wait_max, 3),
+            }
+
+    def _next(self):
+        """轮询各组，取出下一个任务；取完的组移除，未取完的组移到队尾"""
+        key, queue = next(iter(self._queues.items()))
+        task = queue.popleft()
+        if queue:
+            self._queues.move_to_end(key)
+        else:
+            del self._queues[key]
+        self._pending -= 1
+        return task
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._pending and not self._closed:
+                    self._cond.wait()
+                if not self._pending:
+                    return
+                enqueued_at, fn, args, kwargs = self._next()
+                wait = time.monotonic() - enqueued_at
+                self._wait_count += 1
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._active += 1
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                logger.error(f"[ReadBrief] 后台任务执行失败: {e}")
+            finally:
+                with self._cond:
+                    self._active -= 1
+
+    def shutdown(self):
+        """通知所有工作线程在处理完已排队任务后退出"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()